@@ -0,0 +1,103 @@
+"""
+渐进式（anytime）二阶段求解
+
+twophase.solver.solve 会在搜索过程中不断找到更短的解，但只在全部线程结束后
+返回最后一个。本模块复用 twophase 的 SolverThread，把共享的解列表换成
+带回调的列表：每当出现更短的解，就立即写入进度队列，调用方可以边搜索边推送。
+
+进度队列中的每一项形如:
+  {"raw_solution": "R1 U3 ... (21f)", "length": 21, "elapsed": 0.0123}
+"""
+
+import threading
+import time
+
+from twophase_tables import load_twophase
+
+
+class _ReportingList(list):
+    """twophase 各搜索线程共享的解列表，追加新解时触发回调。"""
+
+    def __init__(self, on_solution):
+        super().__init__()
+        self._on_solution = on_solution
+
+    def append(self, moves):
+        super().append(moves)
+        self._on_solution(moves)
+
+
+def format_moves(moves) -> str:
+    """按 twophase 的格式拼接 Move 列表，如 'R1 U3 (2f)'"""
+    return ''.join(m.name + ' ' for m in moves) + f'({len(moves)}f)'
+
+
+def run_twophase_search_progressive(kociemba_code, max_length, timeout, progress):
+    """执行二阶段搜索，每找到更短的解就写入 progress 队列。
+
+    搜索参数与 twophase.solver.solve 相同：找到不超过 max_length 步的解，
+    或超过 timeout 秒（且已有解）时停止。
+
+    Args:
+        kociemba_code: 54 字符 Kociemba 编码
+        max_length: 目标步数
+        timeout: 搜索时间预算（秒）
+        progress: 支持 put() 的队列（进程池中为 Manager 队列）
+
+    Returns:
+        str: 最终（最短）解法字符串
+
+    Raises:
+        RuntimeError: 状态非法
+    """
+    sv = load_twophase()
+    import twophase.cubie as cubie
+    import twophase.face as face
+
+    fc = face.FaceCube()
+    status = fc.from_string(kociemba_code)
+    if status != cubie.CUBE_OK:
+        raise RuntimeError(status)
+    cc = fc.to_cubie_cube()
+    status = cc.verify()
+    if status != cubie.CUBE_OK:
+        raise RuntimeError(status)
+
+    start_time = time.monotonic()
+    lock = threading.Lock()
+    best = {"length": None, "raw_solution": None}
+
+    def report(moves):
+        with lock:
+            if best["length"] is not None and len(moves) >= best["length"]:
+                return
+            best["length"] = len(moves)
+            best["raw_solution"] = format_moves(moves)
+            progress.put({
+                "raw_solution": best["raw_solution"],
+                "length": best["length"],
+                "elapsed": round(time.monotonic() - start_time, 4),
+            })
+
+    # 以下线程编排与 twophase.solver.solve 一致
+    solutions = _ReportingList(report)
+    terminated = threading.Event()
+    shortest_length = [999]
+    syms = cc.symmetries()
+    if len({16, 20, 24, 28} & set(syms)) > 0:
+        directions = [0, 3]
+    else:
+        directions = range(6)
+    if len(set(range(48, 96)) & set(syms)) > 0:
+        directions = [d for d in directions if d < 3]
+
+    threads = [
+        sv.SolverThread(cc, d % 3, d // 3, max_length, timeout, start_time, solutions, terminated, shortest_length)
+        for d in directions
+    ]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+
+    return best["raw_solution"] or format_moves([])
@@ -10,23 +10,37 @@ CubeMaster FastAPI 后端应用
 - 基于会话的文件隔离，支持多用户并发访问
 
 API 文档: /docs
-健康检查: /api/health
+健康检查: /api/health（存活 /api/health/live，就绪 /api/health/ready）
 """
 
 import sys
 import uuid
 import time
-from fastapi import FastAPI, Body
+import json
+from fastapi import FastAPI, Body, BackgroundTasks, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from cube_service import solve_cube
+from fastapi.responses import StreamingResponse, Response, JSONResponse
+from cube_service import solve_cube_async
+from cube_service import solve_cube_state, persist_solve_result
+from cube_service import solve_cube_stream
+from cube_service import solve_batch, SOLVE_BATCH_MAX_ITEMS
 from cube_service import save_cube_state
-from cube_service import recognize_cube
+from cube_service import recognize_cube, recognize_images, recognize_cube_stream, get_loaded_detector
 from session_manager import (
     get_session_dir,
     delete_session,
     cleanup_expired_sessions,
     has_session,
 )
+from solver_pool import get_solver_pool, shutdown_solver_pool, get_solver_profile, SOLVER_PROFILES
+from solution_cache import get_solution_cache
+from cube_validation import InvalidCubeStateError
+from inference_scheduler import get_inference_stats, shutdown_inference_scheduler
+from debug_overlay import get_debug_recorder, shutdown_debug_recorder
+from detection_cache import get_detection_cache
+from warmup import get_readiness, start_background_warmup
+from upload_stream import read_face_uploads, UploadTooLargeError, UploadFormatError
 
 app = FastAPI(
     title="魔方求解API服务",
@@ -50,6 +64,30 @@ def startup_cleanup():
         print(f"🧹 启动清理：删除了 {count} 个过期会话目录")
 
 
+@app.on_event("startup")
+def startup_warmup():
+    """服务启动时在后台加载并预热检测模型与求解进程池，首个请求不再承担加载时间"""
+    start_background_warmup()
+
+
+@app.on_event("shutdown")
+def shutdown_solver():
+    """服务关闭时回收求解进程池"""
+    shutdown_solver_pool()
+
+
+@app.on_event("shutdown")
+def shutdown_inference():
+    """服务关闭时停止推理调度线程"""
+    shutdown_inference_scheduler()
+
+
+@app.on_event("shutdown")
+def shutdown_debug_writer():
+    """服务关闭时等待调试图后台写线程完成"""
+    shutdown_debug_recorder()
+
+
 @app.middleware("http")
 async def add_process_time_header(request, call_next):
     """性能监控中间件，记录请求处理时间并添加到响应头。"""
@@ -94,6 +132,7 @@ def close_session(session_id: str):
     if not has_session(session_id):
         return {"success": False, "error": "会话不存在"}
 
+    get_debug_recorder().drop(session_id)
     removed = delete_session(session_id)
     if removed:
         return {"success": True, "message": "会话已销毁"}
@@ -145,25 +184,169 @@ def load_session(session_id: str):
         return {"success": False, "error": str(e)}
 
 
+@app.get("/api/session/{session_id}/debug")
+def list_debug_faces(session_id: str):
+    """列出会话中可按需渲染调试图的面（on_demand 模式）。
+
+    Args:
+        session_id: 会话唯一标识
+
+    Returns:
+        dict: 包含调试图模式与已记录的面
+    """
+    recorder = get_debug_recorder()
+    return {"success": True, "mode": recorder.mode, "faces": recorder.faces(session_id)}
+
+
+@app.get("/api/session/{session_id}/debug/{face}")
+def get_debug_overlay(session_id: str, face: str):
+    """按需渲染某个面的检测框调试图（JPEG）。
+
+    只在 CUBE_DEBUG_OVERLAY=on_demand 时可用，渲染使用识别时保留的原图与检测结果，
+    不占用识别请求的时间。
+
+    Args:
+        session_id: 会话唯一标识
+        face: 面标识（U/R/F/D/L/B）或文件名（white/red/...）
+
+    Returns:
+        Response: image/jpeg；没有记录时返回 404
+    """
+    content = get_debug_recorder().render(session_id, face)
+    if content is None:
+        return JSONResponse(status_code=404, content={"success": False, "error": "没有该面的调试记录"})
+    return Response(content=content, media_type="image/jpeg")
+
+
 @app.post("/api/solve")
-def solve(payload: dict = Body(...)):
+async def solve(background_tasks: BackgroundTasks, payload: dict = Body(...)):
     """求解魔方接口。
 
-    读取之前保存的魔方状态，使用 Kociemba 二阶段算法计算最优解。
+    两种模式：
+    - 请求体带 state 字段时直接求解该状态（无状态模式，无需先调用 /api/save_state），
+      persist 为 true 且带 session_id 时，在响应返回后把状态和解法写入会话目录
+    - 否则读取之前保存的魔方状态求解
+
+    求解均在求解进程池中使用 Kociemba 二阶段算法完成，profile 字段选择求解档位
+    （fast / balanced / short，见 GET /api/solve/profiles），返回数据中的
+    search_time 和 step_count 为工作进程内的搜索耗时和解法步数，queue_wait 为在求解进程池中的排队耗时。
+
+    返回前服务端会在输入状态上回放解法并确认魔方还原。include_states 为 true 时
+    另返回 states 字段: {"initial": 初始编码, "deltas": 每步 [变化的贴纸下标, 新颜色]}，
+    3D 视图可据此直接跳转到任意步骤。
 
     Args:
-        payload: 可选包含 session_id 的请求体，用于会话隔离
+        payload: 可选包含 state、persist、session_id、profile、include_states 的请求体
 
     Returns:
-        dict: 包含 success 字段和 data(成功)或 error(失败)字段
+        dict: 包含 success 字段和 data(成功)或 error(失败)字段；
+              状态非法时另含 reason 字段，如 {"code": "corner_twist", "cubie": "URF", ...}
     """
     try:
         session_id = payload.get("session_id") if payload else None
-        return {"success": True, "data": solve_cube(session_id=session_id)}
+        state = payload.get("state") if payload else None
+        profile = payload.get("profile") if payload else None
+        include_states = bool(payload.get("include_states")) if payload else False
+
+        if state is None:
+            data = await solve_cube_async(session_id=session_id, profile=profile, include_states=include_states)
+            return {"success": True, "data": data}
+
+        data = await solve_cube_state(state, profile=profile, include_states=include_states)
+        if payload.get("persist") and session_id:
+            background_tasks.add_task(persist_solve_result, data, session_id)
+        return {"success": True, "data": data}
+    except InvalidCubeStateError as e:
+        return {"success": False, "error": str(e), "reason": e.reason}
     except Exception as e:
         return {"success": False, "error": str(e)}
 
 
+@app.get("/api/solve/profiles")
+def solver_profiles():
+    """列出服务端配置的求解档位。"""
+    return {"success": True, "data": SOLVER_PROFILES, "default": get_solver_profile()[0]}
+
+
+@app.post("/api/solve/batch")
+async def solve_batch_states(payload: dict = Body(...)):
+    """批量求解接口。
+
+    一次请求提交多个魔方状态，在求解进程池中并行求解，
+    结果以 NDJSON（每行一个 JSON 对象）流式返回，单个状态失败不会中断整个批次。
+
+    Args:
+        payload: 包含 states 列表（54 字符串或六面颜色字典）和可选 order、profile 字段的请求体，
+                 order 为 "input"（默认，按输入顺序）或 "completion"（按完成顺序），
+                 profile 为整个批次的求解档位
+
+    Returns:
+        StreamingResponse: 每行形如 {"index": 0, "success": true, "data": {...}}，
+                           非法状态的行另含 reason 字段
+    """
+    states = payload.get("states")
+    if not isinstance(states, list) or not states:
+        return {"success": False, "error": "states 必须是非空列表"}
+    if len(states) > SOLVE_BATCH_MAX_ITEMS:
+        return {"success": False, "error": f"单次最多求解 {SOLVE_BATCH_MAX_ITEMS} 个状态"}
+
+    try:
+        profile, _ = get_solver_profile(payload.get("profile"))
+    except ValueError as e:
+        return {"success": False, "error": str(e)}
+
+    ordered = payload.get("order", "input") != "completion"
+    results = solve_batch(states, ordered=ordered, profile=profile)
+
+    async def ndjson_lines():
+        async for item in results:
+            yield json.dumps(item, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+
+@app.post("/api/solve/stream")
+async def solve_stream(payload: dict = Body(...)):
+    """渐进式求解接口（Server-Sent Events）。
+
+    搜索到第一个可行解后立即推送，之后每找到更短的解推送一次，
+    前端可以先开始播放动画，同时服务端继续优化。
+
+    事件格式:
+        event: solution  data: {"raw_solution", "length", "elapsed"}
+        event: done      data: 与 /api/solve 的 data 相同
+        event: error     data: {"error": "...", "reason": {...}}（reason 仅在状态非法时出现）
+
+    Args:
+        payload: 可选包含 state、persist、session_id、profile、max_length、timeout 的请求体，
+                 max_length / timeout 只能在所选档位的范围内收紧（不能超过档位的时间预算）
+    """
+    # 参数在生成器内校验（见 resolve_search_params），错误以 error 事件返回
+    events = solve_cube_stream(
+        state=payload.get("state"),
+        session_id=payload.get("session_id"),
+        persist=bool(payload.get("persist")),
+        profile=payload.get("profile"),
+        max_length=payload.get("max_length"),
+        timeout=payload.get("timeout"),
+    )
+
+    async def sse_lines():
+        try:
+            async for item in events:
+                event = item.pop("event")
+                body = item["data"] if event == "done" else item
+                yield f"event: {event}\ndata: {json.dumps(body, ensure_ascii=False)}\n\n"
+        except Exception as e:
+            body = {"error": str(e)}
+            if isinstance(e, InvalidCubeStateError):
+                body["reason"] = e.reason
+            yield f"event: error\ndata: {json.dumps(body, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(sse_lines(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
+
+
 @app.post("/api/recognize")
 def recognize_cube_images(payload: dict = Body(...)):
     """识别魔方状态接口。
@@ -174,25 +357,95 @@ def recognize_cube_images(payload: dict = Body(...)):
         payload: 包含 images 字段和可选 session_id 字段的请求体
 
     Returns:
-        dict: 包含 success 字段和 data(6面颜色数组)或 error 字段
+        dict: 包含 success 字段和 data(6面颜色数组)或 error 字段；
+              detection 字段给出各面结果的来源（推理尺寸 320 / 640 或 cache）
     """
     try:
         session_id = payload.get("session_id")
-        cube_state = recognize_cube(payload.get("images", {}), session_id=session_id)
-
-        if len(cube_state) == 6:
-            return {"success": True, "data": cube_state}
-        else:
-            return {
-                "success": False,
-                "data": cube_state,
-                "error": f"识别不完整 ({len(cube_state)}/6)"
-            }
+        telemetry = {}
+        cube_state = recognize_cube(payload.get("images", {}), session_id=session_id, telemetry=telemetry)
+        return _recognition_response(cube_state, telemetry)
+
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+
+@app.post("/api/recognize/stream")
+async def recognize_stream(payload: dict = Body(...)):
+    """渐进式识别接口（Server-Sent Events）。
+
+    请求体与 /api/recognize 相同；每识别完一面立即推送该面的结果，
+    前端可以逐面显示，并在其余面还在处理时重拍识别不好的面。
+
+    事件格式:
+        event: face   data: {"face", "matrix", "confidence"(3x3), "stage", "count", "total", "elapsed"}
+        event: done   data: 与 /api/recognize 的响应相同
+        event: error  data: {"error": "..."}
+
+    Args:
+        payload: 包含 images 字段和可选 session_id 字段的请求体
+    """
+    events = recognize_cube_stream(payload.get("images", {}), session_id=payload.get("session_id"))
+
+    async def sse_lines():
+        try:
+            async for item in events:
+                event = item.pop("event")
+                body = _recognition_response(item["data"], item["detection"]) if event == "done" else item
+                yield f"event: {event}\ndata: {json.dumps(body, ensure_ascii=False)}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'error': str(e)}, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(sse_lines(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
+
+
+@app.post("/api/recognize/upload")
+async def recognize_cube_upload(request: Request):
+    """识别魔方状态接口（二进制上传）。
+
+    与 /api/recognize 相同，但请求体为 multipart/form-data：每个面一个二进制部分，
+    字段名为 U / R / F / D / L / B，可选文本字段 session_id。请求体流式解析，
+    每个面接收完后立即解码，超过 CUBE_MAX_UPLOAD_BYTES 时返回 413，格式错误返回 400。
 
+    Returns:
+        dict: 与 /api/recognize 相同
+    """
+    content_length = request.headers.get("content-length", "")
+    try:
+        images, fields = await read_face_uploads(
+            request.headers.get("content-type"),
+            request.stream(),
+            content_length=int(content_length) if content_length.isdigit() else None,
+        )
+    except UploadTooLargeError as e:
+        return JSONResponse({"success": False, "error": str(e)}, status_code=413)
+    except UploadFormatError as e:
+        return JSONResponse({"success": False, "error": str(e)}, status_code=400)
+
+    try:
+        if not images:
+            raise ValueError("未接收到图片数据")
+        telemetry = {}
+        cube_state = await run_in_threadpool(recognize_images, images, session_id=fields.get("session_id"),
+                                             telemetry=telemetry)
+        return _recognition_response(cube_state, telemetry)
     except Exception as e:
         return {"success": False, "error": str(e)}
 
 
+def _recognition_response(cube_state: dict, telemetry: dict) -> dict:
+    """识别结果 -> 接口响应；不足六个面时 success 为 False"""
+    if len(cube_state) == 6:
+        return {"success": True, "data": cube_state, "detection": telemetry}
+    return {
+        "success": False,
+        "data": cube_state,
+        "detection": telemetry,
+        "error": f"识别不完整 ({len(cube_state)}/6)"
+    }
+
+
 @app.post("/api/save_state")
 def save_state(payload: dict = Body(...)):
     """保存魔方状态接口。
@@ -227,19 +480,13 @@ def root():
 
 @app.get("/api/health")
 def health_check():
-    """健康检查端点。"""
+    """健康检查端点（只读取缓存的加载状态，不会触发模型加载）。"""
     try:
-        model_loaded = False
-        model_error = None
-
-        try:
-            from cube_service import get_detector
-            detector = get_detector()
-            model_loaded = detector.model is not None
-        except ImportError as e:
-            model_error = f"模型依赖未安装: {str(e)}"
-        except Exception as e:
-            model_error = f"模型加载失败: {str(e)}"
+        detector_state = get_readiness().get("detector")
+        model_loaded = detector_state["loaded"]
+        model_error = detector_state["error"]
+        detector = get_loaded_detector()
+        detector_pool = detector.backend.stats() if detector is not None else None
 
         return {
             "status": "healthy",
@@ -248,6 +495,12 @@ def health_check():
             "fastapi_version": "0.104.1",
             "model_loaded": model_loaded,
             "model_error": model_error,
+            "solver_pool": get_solver_pool().stats(),
+            "solution_cache": get_solution_cache().stats(),
+            "inference": get_inference_stats(),
+            "detector_pool": detector_pool,
+            "detection_cache": get_detection_cache().stats(),
+            "debug_overlay": get_debug_recorder().stats(),
             "timestamp": __import__("datetime").datetime.now().isoformat()
         }
     except Exception as e:
@@ -261,6 +514,20 @@ def health_check():
         return {"success": False, "error": str(e)}
 
 
+@app.get("/api/health/live")
+def health_live():
+    """存活探针：进程能响应请求即返回，不访问模型与求解进程池。"""
+    return {"status": "alive", "timestamp": __import__("datetime").datetime.now().isoformat()}
+
+
+@app.get("/api/health/ready")
+def health_ready():
+    """就绪探针：返回缓存的加载 / 预热状态与耗时，检测模型与求解进程池预热完成前返回 503。"""
+    readiness = get_readiness().snapshot()
+    readiness["timestamp"] = __import__("datetime").datetime.now().isoformat()
+    return JSONResponse(readiness, status_code=200 if readiness["ready"] else 503)
+
+
 @app.post("/api/save_state")
 def save_state(payload: dict = Body(...)):
     """保存魔方状态接口。
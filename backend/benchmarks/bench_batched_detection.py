@@ -0,0 +1,90 @@
+"""
+六面识别延迟对比：逐面 predict vs 单次批量 predict
+
+每轮对同一组六面图片分别执行:
+  - sequential: 每面单独调用一次 model.predict（原 detect_all_faces 的做法）
+  - batched:    六面合并为一次 model.predict（CubeDetector._predict_batch）
+  - cascade:    先以 --cascade-imgsz 推理，不可信的面再以 640 重跑（CubeDetector.infer_faces）
+
+需要已安装 ultralytics 且 models/best.pt 存在。未指定图片目录时使用随机噪声图，
+只衡量推理开销，不代表识别效果。
+
+用法（在 backend 目录下）:
+  python benchmarks/bench_batched_detection.py --images images --rounds 20
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2  # noqa: E402
+import numpy as np  # noqa: E402
+
+from cube_image_detection import CubeDetector  # noqa: E402
+
+FACE_FILENAMES = ["white", "yellow", "red", "orange", "blue", "green"]
+
+
+def load_images(images_dir):
+    if not images_dir:
+        rng = np.random.default_rng(0)
+        return [rng.integers(0, 256, size=(640, 480, 3), dtype=np.uint8) for _ in FACE_FILENAMES]
+
+    images = []
+    for name in FACE_FILENAMES:
+        img = cv2.imread(os.path.join(images_dir, f"{name}.png"))
+        if img is None:
+            raise FileNotFoundError(f"缺少图片: {name}.png")
+        images.append(img)
+    return images
+
+
+def measure(fn, rounds):
+    fn()  # 预热
+    samples = []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="六面识别批量推理延迟对比")
+    parser.add_argument("--images", default="", help="包含 white.png 等六面图片的目录")
+    parser.add_argument("--rounds", type=int, default=20, help="每种方式的测量轮数")
+    parser.add_argument("--cascade-imgsz", type=int, default=320, help="级联第一阶段的推理尺寸")
+    args = parser.parse_args()
+
+    detector = CubeDetector()
+    detector.cascade_imgsz = args.cascade_imgsz
+    images = load_images(args.images)
+
+    def cascade():
+        detector.cascade = True
+        try:
+            return detector.infer_faces(images)
+        finally:
+            detector.cascade = False
+
+    modes = {
+        "sequential": lambda: [detector._predict_batch([img]) for img in images],
+        "batched": lambda: detector._predict_batch(images),
+        "cascade": cascade,
+    }
+
+    print(f"{'mode':<12} {'mean ms':>10} {'p50 ms':>10} {'min ms':>10}")
+    for name, fn in modes.items():
+        samples = measure(fn, args.rounds)
+        print(f"{name:<12} {statistics.mean(samples):>10.1f} {statistics.median(samples):>10.1f} {min(samples):>10.1f}")
+
+    stats = detector.cascade_stats()
+    print(f"cascade: {stats['first_stage_rate']:.0%} 的面在 {args.cascade_imgsz} 给出结果，重跑 {stats['reruns']} 面")
+
+
+if __name__ == "__main__":
+    main()
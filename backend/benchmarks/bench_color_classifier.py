@@ -0,0 +1,84 @@
+"""
+颜色采样快速路径延迟测试
+
+对合成的六面图片测量:
+  - sample:    3x3 网格采样
+  - vectorized: 采样 + 向量化 CIEDE2000 分类（ColorClassifier.recognize）
+  - pyciede2000: 同样的采样，逐对调用 pyciede2000 计算 9 x 6 个色差（参考实现）
+
+用法（在 backend 目录下）:
+  python benchmarks/bench_color_classifier.py --rounds 200
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from color_classifier import ColorClassifier, sample_grid, bgr_to_lab, DEFAULT_CENTROIDS  # noqa: E402
+
+
+def synthetic_faces(size):
+    rng = np.random.default_rng(0)
+    faces = {}
+    for code in "URFDLB":
+        img = np.zeros((size, size, 3), np.uint8)
+        cell = size // 3
+        for i in range(9):
+            row, col = divmod(i, 3)
+            img[row * cell + 6:(row + 1) * cell - 6, col * cell + 6:(col + 1) * cell - 6] = rng.integers(0, 256, 3)
+        faces[code] = img
+    return faces
+
+
+def measure(fn, rounds):
+    fn()  # 预热
+    samples = []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.mean(samples), statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="颜色采样快速路径延迟测试")
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--size", type=int, default=640, help="图片边长（前端裁剪为 640）")
+    args = parser.parse_args()
+
+    faces = synthetic_faces(args.size)
+    classifier = ColorClassifier()
+
+    modes = {
+        "sample": lambda: [sample_grid(img) for img in faces.values()],
+        "vectorized": lambda: classifier.recognize(faces, session_id="bench"),
+    }
+    try:
+        from pyciede2000 import ciede2000 as reference
+
+        def pyciede():
+            for img in faces.values():
+                lab = bgr_to_lab(sample_grid(img)[0])
+                for cell in lab:
+                    distances = {c: reference(tuple(cell), tuple(ref))['delta_E_00']
+                                 for c, ref in DEFAULT_CENTROIDS.items()}
+                    min(distances, key=distances.get)
+
+        modes["pyciede2000"] = pyciede
+    except ImportError:
+        print("pyciede2000 未安装，跳过参考实现")
+
+    print(f"{'mode':<12} {'6-face mean':>12} {'6-face p50':>11} {'per face':>10}")
+    for name, fn in modes.items():
+        mean, p50 = measure(fn, args.rounds)
+        print(f"{name:<12} {mean:>10.3f}ms {p50:>9.3f}ms {mean / 6:>8.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
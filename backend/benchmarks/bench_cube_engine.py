@@ -0,0 +1,78 @@
+"""
+NumPy 魔方引擎吞吐量测试
+
+对比三种方式执行转动的速度（单位：每秒转动次数 = 状态数 × 步数 / 耗时）:
+  - reference: cube_geometry.apply_moves，逐个状态、逐步拼接字符串
+  - per-move:  cube_engine.apply_move_batch，整批状态每步一次 take_along_axis
+  - composed:  cube_engine.apply_sequence，序列先复合为单个置换，整批只索引一次
+
+用法（在 backend 目录下）:
+  python benchmarks/bench_cube_engine.py --states 100000 --length 20
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from cube_engine import (  # noqa: E402
+    MOVE_TABLE, compose_moves, apply_permutation, apply_move_batch, random_states, decode_state,
+)
+from cube_geometry import MOVE_NAMES, apply_moves  # noqa: E402
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NumPy 魔方引擎吞吐量测试")
+    parser.add_argument("--states", type=int, default=100000, help="批量状态数")
+    parser.add_argument("--length", type=int, default=20, help="转动序列长度")
+    parser.add_argument("--repeat", type=int, default=5, help="重复次数（取最快一次）")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    states = random_states(args.states, length=25, rng=rng)
+    sequence = [MOVE_NAMES[i] for i in rng.integers(0, len(MOVE_NAMES), size=args.length)]
+    indices = rng.integers(0, len(MOVE_TABLE), size=(args.length, args.states))
+    total_moves = args.states * args.length
+
+    ref_count = min(args.states, 2000)
+    ref_states = [decode_state(row) for row in states[:ref_count]]
+
+    def reference():
+        for state in ref_states:
+            apply_moves(state, sequence)
+
+    def per_move():
+        batch = states
+        for step in indices:
+            batch = apply_move_batch(batch, step)
+
+    def composed():
+        apply_permutation(states, compose_moves(sequence))
+
+    rows = [
+        ("reference", ref_count * args.length, timed(reference, 1)),
+        ("per-move", total_moves, timed(per_move, args.repeat)),
+        ("composed", total_moves, timed(composed, args.repeat)),
+    ]
+
+    print(f"states={args.states}  length={args.length}")
+    print(f"{'mode':<10} {'moves':>12} {'seconds':>10} {'moves/s':>14}")
+    for name, moves, seconds in rows:
+        print(f"{name:<10} {moves:>12} {seconds:>10.4f} {moves / seconds:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
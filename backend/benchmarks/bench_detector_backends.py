@@ -0,0 +1,70 @@
+"""
+检测后端 CPU 延迟对比
+
+对 models/ 下已存在的各后端模型（best.pt / best.onnx / best_openvino_model，
+以及 --extra 指定的其他 onnx 文件，如 INT8 量化模型）分别测量:
+  - 单张图片推理延迟
+  - 六面一次批量推理延迟
+
+运行时未安装或模型文件不存在的后端会被跳过。
+
+用法（在 backend 目录下）:
+  python benchmarks/bench_detector_backends.py --images ../yolo_train/raw_images --rounds 20
+  python benchmarks/bench_detector_backends.py --extra best_int8.onnx
+
+INT8 模型的精度（mAP / 颜色混淆）评估见 quantize_detector.py report。
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from detector_backends import create_backend, DEFAULT_MODEL_FILES  # noqa: E402
+from export_detector import MODELS_DIR, load_images  # noqa: E402
+
+
+def measure(fn, rounds):
+    fn()  # 预热
+    samples = []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.mean(samples), statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="检测后端 CPU 延迟对比")
+    parser.add_argument("--images", default="", help="测试图片目录，默认使用随机噪声图")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--extra", nargs="*", default=[], help="额外参与对比的 onnx 模型文件名")
+    args = parser.parse_args()
+
+    images = load_images(args.images, limit=6)
+    while len(images) < 6:
+        images = images + images
+    images = images[:6]
+
+    candidates = [(name, name, "") for name in DEFAULT_MODEL_FILES]
+    candidates += [(model, "onnx", model) for model in args.extra]
+
+    print(f"{'model':<24} {'single mean':>12} {'single p50':>11} {'6-face mean':>12} {'6-face p50':>11}")
+    for label, backend_name, model in candidates:
+        try:
+            backend = create_backend(MODELS_DIR, backend=backend_name, model=model, precision="fp32")
+        except (FileNotFoundError, ImportError) as e:
+            print(f"{label:<24} 跳过: {e}")
+            continue
+
+        single = measure(lambda: backend.predict([images[0]], imgsz=args.imgsz), args.rounds)
+        batch = measure(lambda: backend.predict(images, imgsz=args.imgsz), args.rounds)
+        print(f"{label:<24} {single[0]:>10.1f}ms {single[1]:>9.1f}ms {batch[0]:>10.1f}ms {batch[1]:>9.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
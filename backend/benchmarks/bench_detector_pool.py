@@ -0,0 +1,84 @@
+"""
+检测模型副本池吞吐量测试
+
+C 个并发客户端各自循环提交六面图片，对每个副本数 R（每个副本 CPU 核数 / R 个推理线程）测量:
+  - req/s:  每秒完成的识别请求数（每个请求一次六张图片的前向推理）
+  - p50/p95: 请求延迟（毫秒，含等待副本的时间）
+
+对比 R=1（单个共享模型，请求排队）与 R>1 时吞吐量随核数的增长；
+同时报告副本池的平均/最长等待时间。需要 models/ 下对应后端的模型文件。
+
+用法（在 backend 目录下）:
+  python benchmarks/bench_detector_pool.py --backend onnx --replicas 1 2 4 --clients 8 --seconds 10
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from detector_backends import create_backend  # noqa: E402
+from detector_pool import DetectorPool, replica_threads  # noqa: E402
+
+MODELS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models")
+
+
+def run_clients(pool, clients, seconds, images, imgsz):
+    latencies = [[] for _ in range(clients)]
+    stop = time.perf_counter() + seconds
+
+    def client(i):
+        while time.perf_counter() < stop:
+            t0 = time.perf_counter()
+            pool.predict(images, imgsz=imgsz)
+            latencies[i].append(time.perf_counter() - t0)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    samples = sorted(x for row in latencies for x in row)
+    p50 = samples[len(samples) // 2] * 1000 if samples else 0.0
+    p95 = samples[min(int(len(samples) * 0.95), len(samples) - 1)] * 1000 if samples else 0.0
+    return len(samples) / elapsed, p50, p95
+
+
+def main():
+    parser = argparse.ArgumentParser(description="检测模型副本池吞吐量测试")
+    parser.add_argument("--backend", default="onnx", choices=["pytorch", "onnx", "openvino"])
+    parser.add_argument("--model", default="", help="models/ 下的模型文件名，默认按后端选择")
+    parser.add_argument("--replicas", type=int, nargs="+", default=[1, 2, 4], help="副本数")
+    parser.add_argument("--clients", type=int, default=8, help="并发客户端数")
+    parser.add_argument("--seconds", type=float, default=10, help="每组测量时长")
+    parser.add_argument("--imgsz", type=int, default=640)
+    args = parser.parse_args()
+
+    images = [np.random.default_rng(i).integers(0, 256, (640, 480, 3), dtype=np.uint8) for i in range(6)]
+    print(f"CPU 核数: {os.cpu_count()}，并发客户端: {args.clients}")
+    print(f"{'replicas':>8} {'threads':>8} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'wait avg':>9} {'wait max':>9}")
+
+    for replicas in args.replicas:
+        threads = replica_threads(replicas, threads=0) or os.cpu_count()
+        pool = DetectorPool(
+            lambda t: create_backend(MODELS_DIR, backend=args.backend, model=args.model, threads=t),
+            size=replicas, threads=threads,
+        )
+        pool.predict(images, imgsz=args.imgsz)  # 预热
+        rps, p50, p95 = run_clients(pool, args.clients, args.seconds, images, args.imgsz)
+        wait = pool.stats()["wait_ms"]
+        print(f"{replicas:>8} {threads:>8} {rps:>8.2f} {p50:>8.1f} {p95:>8.1f} "
+              f"{wait['avg']:>7.1f}ms {wait['max']:>7.1f}ms")
+        del pool
+
+
+if __name__ == "__main__":
+    main()
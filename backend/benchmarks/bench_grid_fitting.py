@@ -0,0 +1,134 @@
+"""
+贴纸网格拟合测试：吞吐量与填充正确率
+
+对合成的贴纸布局比较:
+  - legacy:    旧的 _smart_grid_fill（按检测点包围盒等分 3x3），逐面处理
+  - per-face:  grid_fitting.fill_matrices 逐面调用
+  - batched:   grid_fitting.fill_matrices 一次处理所有面
+
+合成布局（每种 --layouts 个，格距 60-120px，贴纸中心加 5% 格距的高斯噪声，点的顺序打乱）:
+  - clean:         正对的 3x3
+  - rotated:       旋转 ±25°
+  - perspective:   旋转 + 透视变形
+  - missing_cells: 正对，随机缺 1-3 个格子
+  - missing_row:   旋转 + 透视变形，缺一整行（中心所在行保留）
+
+用法（在 backend 目录下）:
+  python benchmarks/bench_grid_fitting.py --layouts 300 --rounds 20
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from grid_fitting import CELL_COORDS, fill_matrices  # noqa: E402
+
+LAYOUTS = ("clean", "rotated", "perspective", "missing_cells", "missing_row")
+COLORS = ("white", "yellow", "red", "orange", "blue", "green", "white", "red", "blue")
+IMAGE_SIZE = (640, 640)
+
+
+def legacy_fill(stickers):
+    """旧算法：按检测点包围盒等分 3x3（原 CubeDetector._smart_grid_fill）"""
+    matrix = [['black'] * 3 for _ in range(3)]
+    if not stickers:
+        return matrix
+    xs = [s['x'] for s in stickers]
+    ys = [s['y'] for s in stickers]
+    min_x, min_y = min(xs), min(ys)
+    width = max(xs) - min_x + 1
+    height = max(ys) - min_y + 1
+    for s in stickers:
+        col = min(max(int((s['x'] - min_x) / width * 3), 0), 2)
+        row = min(max(int((s['y'] - min_y) / height * 3), 0), 2)
+        matrix[row][col] = s['color']
+    return matrix
+
+
+def synthetic_face(kind, rng):
+    """生成一面的贴纸列表与期望的 3x3 矩阵"""
+    pitch = rng.uniform(60, 120)
+    angle = np.radians(rng.uniform(-25, 25)) if kind in ("rotated", "perspective", "missing_row") else 0.0
+    persp = np.eye(3)
+    if kind in ("perspective", "missing_row"):
+        persp = np.array([[1, rng.uniform(-.15, .15), 0],
+                          [rng.uniform(-.15, .15), 1, 0],
+                          [rng.uniform(-.08, .08), rng.uniform(-.08, .08), 1]])
+
+    pts = np.c_[CELL_COORDS - 1, np.ones(9)] @ persp.T
+    pts = pts[:, :2] / pts[:, 2:3]
+    cos, sin = np.cos(angle), np.sin(angle)
+    pts = pts @ np.array([[cos, -sin], [sin, cos]]).T * pitch + np.array(IMAGE_SIZE[::-1]) / 2
+    pts += rng.normal(0, pitch * 0.05, pts.shape)
+
+    keep = np.ones(9, dtype=bool)
+    if kind == "missing_row":
+        row = rng.choice([0, 2])
+        keep[row * 3:row * 3 + 3] = False
+    elif kind == "missing_cells":
+        keep[rng.choice(9, rng.integers(1, 4), replace=False)] = False
+
+    colors = list(rng.permutation(COLORS))
+    expected = [['black'] * 3 for _ in range(3)]
+    stickers = []
+    half = pitch * 0.4
+    for i in rng.permutation(np.flatnonzero(keep)):
+        x, y = pts[i]
+        expected[i // 3][i % 3] = colors[i]
+        stickers.append({'x': float(x), 'y': float(y), 'color': colors[i], 'conf': 0.9,
+                         'box': (int(x - half), int(y - half), int(x + half), int(y + half))})
+    return stickers, expected
+
+
+def measure(fn, rounds):
+    fn()  # 预热
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - start) / rounds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="贴纸网格拟合吞吐量与填充正确率")
+    parser.add_argument("--layouts", type=int, default=300, help="每种布局生成的面数")
+    parser.add_argument("--rounds", type=int, default=20, help="吞吐量测试轮数")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    faces = {kind: [synthetic_face(kind, rng) for _ in range(args.layouts)] for kind in LAYOUTS}
+
+    print("📐 填充正确率（整面 9 格全部正确的比例）")
+    print(f"{'layout':<14} {'legacy':>8} {'fitted':>8}")
+    for kind, items in faces.items():
+        stickers_list = [stickers for stickers, _ in items]
+        fitted = fill_matrices(stickers_list, [IMAGE_SIZE] * len(items))
+        legacy_ok = sum(legacy_fill(stickers) == expected for stickers, expected in items)
+        fitted_ok = sum(matrix == expected for matrix, (_, expected) in zip(fitted, items))
+        print(f"{kind:<14} {legacy_ok / len(items):>8.3f} {fitted_ok / len(items):>8.3f}")
+
+    all_faces = [stickers for items in faces.values() for stickers, _ in items]
+    sizes = [IMAGE_SIZE] * len(all_faces)
+    request = all_faces[:6]
+    modes = {
+        "legacy": (lambda: [legacy_fill(s) for s in all_faces], len(all_faces)),
+        "per-face": (lambda: [fill_matrices([s], [IMAGE_SIZE]) for s in all_faces], len(all_faces)),
+        "batched": (lambda: fill_matrices(all_faces, sizes), len(all_faces)),
+        "batched x6": (lambda: fill_matrices(request, sizes[:6]), 6),
+    }
+
+    print(f"\n⚡ 吞吐量（{args.rounds} 轮）")
+    print(f"{'mode':<12} {'faces':>6} {'per call':>11} {'per face':>11} {'faces/s':>10}")
+    for name, (fn, count) in modes.items():
+        elapsed = measure(fn, args.rounds)
+        print(f"{name:<12} {count:>6} {elapsed * 1000:>9.2f}ms {elapsed / count * 1e6:>9.1f}µs "
+              f"{count / elapsed:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+上传图片解码测试：完整解码 vs 读文件头 + 缩小解码
+
+对一组大尺寸 JPEG（默认合成 12MP 手机照片，也可用 --images 指定目录）比较:
+  - full:    cv2.imdecode(IMREAD_COLOR) 完整解码后 _resize_keep_ratio 到 640（原实现）
+  - reduced: image_utils.decode_image_bytes（Pillow 读文件头，IMREAD_REDUCED_COLOR_2/4/8 解码后再缩放）
+
+报告每张图片的解码耗时（p50 / 平均）与 NumPy 分配峰值（tracemalloc，
+OpenCV 返回的图像数组经由 NumPy 分配；libjpeg 内部的行缓冲不计入）。
+
+用法（在 backend 目录下）:
+  python benchmarks/bench_image_decode.py --count 12 --rounds 5
+  python benchmarks/bench_image_decode.py --images ~/Pictures/cube_photos
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2  # noqa: E402
+import numpy as np  # noqa: E402
+
+from image_utils import decode_image_bytes, _resize_keep_ratio, MAX_IMAGE_SIZE  # noqa: E402
+
+
+def synthetic_photo(rng, width, height):
+    """模拟手机照片：平滑渐变背景 + 3x3 色块 + 传感器噪声（噪声使 JPEG 体积接近真实照片）"""
+    x = np.linspace(0, 1, width, dtype=np.float32)
+    y = np.linspace(0, 1, height, dtype=np.float32)[:, None]
+    img = np.empty((height, width, 3), np.float32)
+    for c in range(3):
+        img[..., c] = 60 + 80 * (x * rng.uniform(0.2, 1) + y * rng.uniform(0.2, 1))
+    side = min(width, height) // 4
+    x0, y0 = (width - 3 * side) // 2, (height - 3 * side) // 2
+    for i in range(9):
+        row, col = divmod(i, 3)
+        img[y0 + row * side + 20:y0 + (row + 1) * side - 20, x0 + col * side + 20:x0 + (col + 1) * side - 20] = \
+            rng.integers(0, 256, 3)
+    img += rng.normal(0, 6, img.shape).astype(np.float32)
+    return np.clip(img, 0, 255).astype(np.uint8)
+
+
+def load_corpus(args):
+    if args.images:
+        corpus = []
+        for name in sorted(os.listdir(args.images)):
+            if name.lower().endswith((".jpg", ".jpeg")):
+                with open(os.path.join(args.images, name), "rb") as f:
+                    corpus.append(f.read())
+        return corpus
+
+    rng = np.random.default_rng(0)
+    return [cv2.imencode(".jpg", synthetic_photo(rng, args.width, args.height),
+                         [cv2.IMWRITE_JPEG_QUALITY, 92])[1].tobytes() for _ in range(args.count)]
+
+
+def full_decode(data):
+    img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    return _resize_keep_ratio(img, MAX_IMAGE_SIZE)
+
+
+def measure(decode, corpus, rounds):
+    decode(corpus[0])  # 预热
+    times = []
+    for _ in range(rounds):
+        for data in corpus:
+            t0 = time.perf_counter()
+            decode(data)
+            times.append((time.perf_counter() - t0) * 1000)
+
+    peaks = []
+    for data in corpus:
+        tracemalloc.start()
+        decode(data)
+        peaks.append(tracemalloc.get_traced_memory()[1] / 2 ** 20)
+        tracemalloc.stop()
+    return statistics.median(times), statistics.mean(times), max(peaks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="上传图片解码耗时与内存峰值")
+    parser.add_argument("--images", default="", help="JPEG 照片目录；为空时合成照片")
+    parser.add_argument("--count", type=int, default=12, help="合成照片数")
+    parser.add_argument("--width", type=int, default=4032)
+    parser.add_argument("--height", type=int, default=3024)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args)
+    if not corpus:
+        print("❌ 没有可用的 JPEG 图片")
+        return
+    sizes = [len(data) / 2 ** 20 for data in corpus]
+    print(f"📷 {len(corpus)} 张图片，平均 {statistics.mean(sizes):.2f}MB")
+
+    shapes = {full_decode(corpus[0]).shape, decode_image_bytes(corpus[0]).shape}
+    print(f"输出尺寸: {shapes}")
+
+    print(f"{'mode':<8} {'p50':>9} {'mean':>9} {'peak alloc':>11}")
+    results = {}
+    for name, decode in (("full", full_decode), ("reduced", decode_image_bytes)):
+        results[name] = measure(decode, corpus, args.rounds)
+        p50, mean, peak = results[name]
+        print(f"{name:<8} {p50:>7.2f}ms {mean:>7.2f}ms {peak:>9.1f}MB")
+
+    full, reduced = results["full"], results["reduced"]
+    print(f"\n⚡ 解码耗时 {full[0] / reduced[0]:.1f}x，内存峰值 {full[2] / max(reduced[2], 1e-6):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
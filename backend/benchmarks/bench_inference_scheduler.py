@@ -0,0 +1,103 @@
+"""
+推理微批调度吞吐量测试
+
+C 个并发客户端各自循环提交六面图片，对比:
+  - direct:    每个请求自己调用一次批量推理（共享模型，推理互斥）
+  - scheduler: 请求提交到 InferenceScheduler，跨请求组批
+
+默认使用模拟模型：每次前向耗时 = 固定开销 + 每张图片开销，
+近似 CPU 上 YOLO 的批量推理特性；加 --real 时使用 CubeDetector（需要 best.pt）。
+
+用法（在 backend 目录下）:
+  python benchmarks/bench_inference_scheduler.py --clients 1 4 16 --seconds 3
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from inference_scheduler import InferenceScheduler  # noqa: E402
+
+
+class SimulatedModel:
+    """每次前向推理耗时 fixed_ms + per_image_ms × 图片数"""
+
+    def __init__(self, fixed_ms, per_image_ms):
+        self.fixed = fixed_ms / 1000
+        self.per_image = per_image_ms / 1000
+
+    def __call__(self, images):
+        time.sleep(self.fixed + self.per_image * len(images))
+        return [None] * len(images)
+
+
+def run_clients(request_fn, clients, seconds, images):
+    counts = [0] * clients
+    latencies = [[] for _ in range(clients)]
+    start = time.perf_counter()
+    stop = start + seconds
+
+    def client(i):
+        while time.perf_counter() < stop:
+            t0 = time.perf_counter()
+            request_fn(images)
+            latencies[i].append(time.perf_counter() - t0)
+            counts[i] += 1
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    all_latencies = sorted(x for row in latencies for x in row)
+    p50 = all_latencies[len(all_latencies) // 2] * 1000 if all_latencies else 0.0
+    return sum(counts) / elapsed, p50
+
+
+def main():
+    parser = argparse.ArgumentParser(description="推理微批调度吞吐量测试")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 4, 16], help="并发客户端数")
+    parser.add_argument("--seconds", type=float, default=3, help="每组测量时长")
+    parser.add_argument("--max-batch", type=int, default=24)
+    parser.add_argument("--max-wait-ms", type=float, default=10)
+    parser.add_argument("--fixed-ms", type=float, default=30, help="模拟模型的单次固定开销")
+    parser.add_argument("--per-image-ms", type=float, default=8, help="模拟模型的每张图片开销")
+    parser.add_argument("--real", action="store_true", help="使用 CubeDetector 的真实模型")
+    args = parser.parse_args()
+
+    if args.real:
+        from cube_image_detection import CubeDetector
+        infer = CubeDetector()._predict_batch
+        images = [np.random.default_rng(i).integers(0, 256, (640, 480, 3), dtype=np.uint8) for i in range(6)]
+    else:
+        infer = SimulatedModel(args.fixed_ms, args.per_image_ms)
+        images = [None] * 6
+
+    model_lock = threading.Lock()
+
+    def direct(batch):
+        with model_lock:
+            return infer(batch)
+
+    print(f"{'clients':>8} {'mode':<10} {'req/s':>8} {'p50 ms':>8}  batch histogram")
+    for clients in args.clients:
+        rps, p50 = run_clients(direct, clients, args.seconds, images)
+        print(f"{clients:>8} {'direct':<10} {rps:>8.1f} {p50:>8.1f}")
+
+        scheduler = InferenceScheduler(infer, max_batch_size=args.max_batch, max_wait_ms=args.max_wait_ms)
+        rps, p50 = run_clients(scheduler.run, clients, args.seconds, images)
+        histogram = scheduler.stats()["batch_size_histogram"]
+        scheduler.shutdown()
+        print(f"{clients:>8} {'scheduler':<10} {rps:>8.1f} {p50:>8.1f}  {histogram}")
+
+
+if __name__ == "__main__":
+    main()
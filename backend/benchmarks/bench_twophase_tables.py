@@ -0,0 +1,82 @@
+"""
+twophase 表加载方式对比：原始 array.fromfile vs 内存映射
+
+同时启动 N 个进程（模拟 N 个 uvicorn worker / 求解进程）分别加载全部表，
+统计每个进程的导入耗时与内存占用:
+  - RSS: 常驻内存（共享页也计入，mmap 时会偏大）
+  - PSS: 按共享进程数均摊后的内存
+  - USS: 进程独占内存，即多开一个进程真正增加的内存
+
+用法（在 backend 目录下）:
+  python benchmarks/bench_twophase_tables.py --workers 4
+  python benchmarks/bench_twophase_tables.py --tables-dir /path/to/twophase
+
+注意：表目录中须已包含 phase1_prun / phase2_prun，否则 twophase 会先花较长时间生成。
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import psutil  # noqa: E402
+
+from twophase_tables import TABLES_DIR, load_twophase  # noqa: E402
+
+
+def _worker(tables_dir, use_mmap, results, measure, done):
+    t0 = time.perf_counter()
+    load_twophase(tables_dir=tables_dir, use_mmap=use_mmap)
+    elapsed = time.perf_counter() - t0
+
+    # 所有进程加载完毕后再统计内存，PSS 才能反映共享情况
+    results.put(("loaded", elapsed))
+    measure.wait()
+    mem = psutil.Process().memory_full_info()
+    results.put(("memory", elapsed, mem.rss, getattr(mem, "pss", 0), mem.uss))
+    done.wait()
+
+
+def run_mode(tables_dir, use_mmap, workers):
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    measure, done = ctx.Event(), ctx.Event()
+    procs = [ctx.Process(target=_worker, args=(tables_dir, use_mmap, results, measure, done))
+             for _ in range(workers)]
+    for p in procs:
+        p.start()
+
+    for _ in procs:
+        results.get()
+    measure.set()
+    rows = [results.get()[1:] for _ in procs]
+    done.set()
+
+    for p in procs:
+        p.join()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--tables-dir", default=TABLES_DIR)
+    args = parser.parse_args()
+
+    mb = 1024 * 1024
+    print(f"表目录: {args.tables_dir}，进程数: {args.workers}")
+    print(f"{'模式':<8}{'导入耗时(ms)':>14}{'RSS(MB)':>10}{'PSS(MB)':>10}{'USS(MB)':>10}{'总USS(MB)':>12}")
+    for label, use_mmap in (("fromfile", False), ("mmap", True)):
+        rows = run_mode(args.tables_dir, use_mmap, args.workers)
+        n = len(rows)
+        avg = [sum(r[i] for r in rows) / n for i in range(4)]
+        total_uss = sum(r[3] for r in rows)
+        print(f"{label:<8}{avg[0] * 1000:>14.1f}{avg[1] / mb:>10.1f}{avg[2] / mb:>10.1f}"
+              f"{avg[3] / mb:>10.1f}{total_uss / mb:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+识别接口上传方式对比：base64 JSON（/api/recognize）vs 二进制 multipart（/api/recognize/upload）
+
+每种方式在独立的子进程中运行（RSS 峰值是进程级的历史峰值），通过 TestClient 在进程内
+发送请求，测量:
+  - p50 / mean: 单个请求（六面图片）的延迟，含请求体解析、解码与识别
+  - peak RSS:   请求期间进程 RSS 峰值相对请求前的增量（请求体由父进程预先编码，客户端一侧各持有一份）
+检测器默认替换为立即返回的桩（--detector real 使用 models/ 下的真实模型），
+这样两种方式的差别只来自请求体的传输与解码。
+
+用法（在 backend 目录下）:
+  python benchmarks/bench_upload.py --rounds 10
+  python benchmarks/bench_upload.py --images ~/Pictures/cube_photos --detector real
+"""
+
+import argparse
+import base64
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2  # noqa: E402
+import numpy as np  # noqa: E402
+
+from bench_image_decode import synthetic_photo  # noqa: E402
+
+FACES = "URFDLB"
+MODES = ("base64", "multipart")
+BOUNDARY = "cubemasterbench"
+
+
+def load_corpus(args):
+    if args.images:
+        names = sorted(n for n in os.listdir(args.images) if n.lower().endswith((".jpg", ".jpeg")))[:6]
+        corpus = []
+        for name in names:
+            with open(os.path.join(args.images, name), "rb") as f:
+                corpus.append(f.read())
+        return dict(zip(FACES, corpus))
+
+    rng = np.random.default_rng(0)
+    return {face: cv2.imencode(".jpg", synthetic_photo(rng, args.width, args.height),
+                               [cv2.IMWRITE_JPEG_QUALITY, 92])[1].tobytes() for face in FACES}
+
+
+def encode_body(mode, data):
+    """六面图片 -> (url, Content-Type, 请求体)"""
+    if mode == "base64":
+        body = json.dumps({"images": {face: "data:image/jpeg;base64," + base64.b64encode(raw).decode()
+                                      for face, raw in data.items()}}).encode()
+        return "/api/recognize", "application/json", body
+
+    body = b"".join(f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="{face}"; filename="{face}.jpg"\r\n'
+                    f"Content-Type: image/jpeg\r\n\r\n".encode() + raw + b"\r\n"
+                    for face, raw in data.items()) + f"--{BOUNDARY}--\r\n".encode()
+    return "/api/recognize/upload", f"multipart/form-data; boundary={BOUNDARY}", body
+
+
+def peak_rss_mb():
+    """进程 RSS 峰值：优先读 /proc 的 VmHWM（exec 后重新计数；ru_maxrss 会继承父进程的峰值）"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_mode(mode, body_path, rounds, detector):
+    """子进程入口：发送 rounds 个请求，返回延迟与 RSS 峰值增量
+
+    请求体由父进程编码后写入文件，子进程只读入一份，编码过程的内存不计入子进程
+    """
+    from fastapi.testclient import TestClient
+    import app
+
+    url, content_type, _ = encode_body(mode, {})
+    with open(body_path, "rb") as f:
+        body = f.read()
+
+    stub = MagicMock()
+    stub.detect_images.side_effect = lambda images, **kwargs: {face: [["white"] * 3] * 3 for face in images}
+    patches = [patch("cube_service.SAVE_UPLOADED_IMAGES", False)]
+    if detector == "stub":
+        patches += [patch("cube_service.get_detector", return_value=stub),
+                    patch("cube_service.INFER_BATCHING", False)]
+    else:
+        import cube_service
+        cube_service.get_detector().warm_up()
+    for p in patches:
+        p.start()
+
+    client = TestClient(app.app)
+    client.get("/api/health/live")
+
+    def send():
+        response = client.post(url, content=body, headers={"Content-Type": content_type}).json()
+        if not response.get("success"):
+            raise RuntimeError(f"{mode} 请求失败: {response}")
+
+    baseline = peak_rss_mb()
+    times = []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        send()
+        times.append((time.perf_counter() - t0) * 1000)
+    return {"p50": statistics.median(times), "mean": statistics.mean(times),
+            "peak_rss": peak_rss_mb() - baseline, "body_mb": len(body) / 2 ** 20}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="识别接口上传方式的延迟与内存峰值")
+    parser.add_argument("--images", default="", help="JPEG 照片目录（取前 6 张）；为空时合成照片")
+    parser.add_argument("--width", type=int, default=4032)
+    parser.add_argument("--height", type=int, default=3024)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--detector", choices=("stub", "real"), default="stub")
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--body", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, args.body, args.rounds, args.detector)))
+        return
+
+    corpus = load_corpus(args)
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for mode in MODES:
+            body_path = os.path.join(directory, f"{mode}.body")
+            with open(body_path, "wb") as f:
+                f.write(encode_body(mode, corpus)[2])
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--mode", mode, "--body", body_path,
+                 "--rounds", str(args.rounds), "--detector", args.detector],
+                capture_output=True, text=True, check=True,
+            ).stdout
+            results[mode] = json.loads(output.strip().splitlines()[-1])
+
+    print(f"📷 6 张图片，请求体 base64 {results['base64']['body_mb']:.1f}MB / "
+          f"multipart {results['multipart']['body_mb']:.1f}MB，检测器: {args.detector}")
+    print(f"{'mode':<10} {'p50':>9} {'mean':>9} {'peak RSS':>10}")
+    for mode in MODES:
+        r = results[mode]
+        print(f"{mode:<10} {r['p50']:>7.1f}ms {r['mean']:>7.1f}ms {r['peak_rss']:>8.1f}MB")
+
+    b64, mp = results["base64"], results["multipart"]
+    print(f"\n⚡ 延迟 {b64['p50'] / mp['p50']:.2f}x，RSS 峰值增量 {b64['peak_rss']:.1f}MB -> {mp['peak_rss']:.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
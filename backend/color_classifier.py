@@ -0,0 +1,212 @@
+"""
+基于颜色采样的贴纸识别（非神经网络快速路径）
+
+前端 CubeScanner 按取景框裁剪出正方形图片，魔方一面恰好占满画面，
+因此可以直接把图片等分为 3x3 网格，在每格中心区域取颜色中位数，
+转换到 CIELAB 后用 CIEDE2000 色差与各颜色的质心比较，最近者即为该格颜色。
+
+颜色质心取自中心块（中心块颜色固定: U 白、R 红、F 绿、D 黄、L 橙、B 蓝），
+按会话保存，只重拍一面时沿用同一会话之前的质心；缺少的颜色使用标准配色的默认值。
+
+每格置信度 = (次近色差 - 最近色差) / 次近色差，最近色差超过 CLASSIC_MAX_DELTA 时为 0。
+一面的置信度取 9 格最小值，低于 CLASSIC_MIN_CONF 时由 CubeDetector 回退到 YOLO。
+
+CIEDE2000 在本模块用 NumPy 向量化实现（所有面的 9 格 x 6 色一次计算），
+与 pyciede2000 的逐对实现结果一致（见 tests/test_color_classifier.py）。
+
+配置（环境变量）:
+  CUBE_CLASSIC_FAST_PATH     是否启用颜色采样快速路径，默认 0
+  CUBE_CLASSIC_MIN_CONF      一面被接受的最低置信度，默认 0.3
+  CUBE_CLASSIC_MAX_DELTA     最近色差上限，默认 25
+  CUBE_CLASSIC_CELL_FRACTION 每格中心采样区域占格子边长的比例，默认 0.4
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+# ================= 配置区 =================
+
+CLASSIC_FAST_PATH = os.environ.get("CUBE_CLASSIC_FAST_PATH", "0") == "1"
+CLASSIC_MIN_CONF = float(os.environ.get("CUBE_CLASSIC_MIN_CONF", 0.3))
+CLASSIC_MAX_DELTA = float(os.environ.get("CUBE_CLASSIC_MAX_DELTA", 25))
+CLASSIC_CELL_FRACTION = float(os.environ.get("CUBE_CLASSIC_CELL_FRACTION", 0.4))
+
+# 最多保存质心的会话数
+_MAX_SESSIONS = 256
+
+# 每格中心区域每边抽取的像素数
+_SAMPLES_PER_SIDE = 8
+
+# 面标识 -> 中心块颜色
+FACE_COLORS = {'U': 'white', 'R': 'red', 'F': 'green', 'D': 'yellow', 'L': 'orange', 'B': 'blue'}
+
+# 标准配色 (RGB)，作为会话中缺少某色中心块时的默认质心
+_DEFAULT_RGB = {
+    'white': (255, 255, 255),
+    'yellow': (255, 213, 0),
+    'red': (196, 30, 58),
+    'orange': (255, 88, 0),
+    'blue': (0, 81, 186),
+    'green': (0, 158, 96),
+}
+
+
+# ================= 颜色计算 =================
+
+def bgr_to_lab(bgr) -> np.ndarray:
+    """BGR (0-255) -> CIELAB (L: 0-100)，输入形状 (..., 3)"""
+    bgr = np.asarray(bgr, dtype=np.float32)
+    lab = cv2.cvtColor(bgr.reshape(-1, 1, 3) / 255.0, cv2.COLOR_BGR2LAB)
+    return lab.reshape(bgr.shape).astype(np.float64)
+
+
+def ciede2000(lab1, lab2) -> np.ndarray:
+    """CIEDE2000 色差（kL = kC = kH = 1），lab1 / lab2 形状 (..., 3) 可广播"""
+    lab1 = np.asarray(lab1, dtype=np.float64)
+    lab2 = np.asarray(lab2, dtype=np.float64)
+    L1, a1, b1 = lab1[..., 0], lab1[..., 1], lab1[..., 2]
+    L2, a2, b2 = lab2[..., 0], lab2[..., 1], lab2[..., 2]
+
+    c_bar = (np.hypot(a1, b1) + np.hypot(a2, b2)) / 2
+    c_bar7 = c_bar ** 7
+    g = 0.5 * (1 - np.sqrt(c_bar7 / (c_bar7 + 25.0 ** 7)))
+    a1p, a2p = (1 + g) * a1, (1 + g) * a2
+    c1p, c2p = np.hypot(a1p, b1), np.hypot(a2p, b2)
+    h1p = np.degrees(np.arctan2(b1, a1p)) % 360
+    h2p = np.degrees(np.arctan2(b2, a2p)) % 360
+
+    dLp = L2 - L1
+    dCp = c2p - c1p
+    chroma_zero = (c1p * c2p) == 0
+    dhp = h2p - h1p
+    dhp = np.where(dhp > 180, dhp - 360, np.where(dhp < -180, dhp + 360, dhp))
+    dhp = np.where(chroma_zero, 0.0, dhp)
+    dHp = 2 * np.sqrt(c1p * c2p) * np.sin(np.radians(dhp) / 2)
+
+    l_bar = (L1 + L2) / 2
+    c_bar_p = (c1p + c2p) / 2
+    h_sum = h1p + h2p
+    h_bar = np.where(np.abs(h1p - h2p) > 180,
+                     np.where(h_sum < 360, (h_sum + 360) / 2, (h_sum - 360) / 2),
+                     h_sum / 2)
+    h_bar = np.where(chroma_zero, h_sum, h_bar)
+
+    t = (1 - 0.17 * np.cos(np.radians(h_bar - 30)) + 0.24 * np.cos(np.radians(2 * h_bar))
+         + 0.32 * np.cos(np.radians(3 * h_bar + 6)) - 0.20 * np.cos(np.radians(4 * h_bar - 63)))
+    d_theta = 30 * np.exp(-(((h_bar - 275) / 25) ** 2))
+    c_bar_p7 = c_bar_p ** 7
+    r_c = 2 * np.sqrt(c_bar_p7 / (c_bar_p7 + 25.0 ** 7))
+    s_l = 1 + 0.015 * (l_bar - 50) ** 2 / np.sqrt(20 + (l_bar - 50) ** 2)
+    s_c = 1 + 0.045 * c_bar_p
+    s_h = 1 + 0.015 * c_bar_p * t
+    r_t = -np.sin(np.radians(2 * d_theta)) * r_c
+
+    return np.sqrt((dLp / s_l) ** 2 + (dCp / s_c) ** 2 + (dHp / s_h) ** 2
+                   + r_t * (dCp / s_c) * (dHp / s_h))
+
+
+DEFAULT_CENTROIDS = {
+    color: bgr_to_lab(np.array(rgb[::-1], dtype=np.float32)) for color, rgb in _DEFAULT_RGB.items()
+}
+
+
+def sample_grid(img: np.ndarray, fraction: float = CLASSIC_CELL_FRACTION):
+    """把图片等分为 3x3，取每格中心区域的 BGR 中位数。
+
+    中心区域按步长抽取约 _SAMPLES_PER_SIDE x _SAMPLES_PER_SIDE 个像素（切片视图，不复制整图），
+    取中位数以抑制反光和贴纸边缘的影响。
+
+    Returns:
+        tuple: ((9, 3) BGR 颜色, 9 个采样框 (x1, y1, x2, y2)，原图坐标)，行优先
+    """
+    h, w = img.shape[:2]
+    size_w, size_h = max(1, int(fraction * w / 3)), max(1, int(fraction * h / 3))
+    step_x, step_y = max(1, size_w // _SAMPLES_PER_SIDE), max(1, size_h // _SAMPLES_PER_SIDE)
+
+    patches, boxes = [], []
+    for i in range(9):
+        row, col = divmod(i, 3)
+        x1 = int((col + 0.5) * w / 3 - size_w / 2)
+        y1 = int((row + 0.5) * h / 3 - size_h / 2)
+        patches.append(img[y1:y1 + size_h:step_y, x1:x1 + size_w:step_x].reshape(-1, 3))
+        boxes.append((x1, y1, x1 + size_w, y1 + size_h))
+    colors = np.median(np.stack(patches), axis=1).astype(np.float32)
+    return colors, boxes
+
+
+class ColorClassifier:
+    """CIEDE2000 最近质心分类器，按会话保存颜色质心（线程安全）。"""
+
+    def __init__(self, max_delta: float = CLASSIC_MAX_DELTA, cell_fraction: float = CLASSIC_CELL_FRACTION):
+        self.max_delta = max_delta
+        self.cell_fraction = cell_fraction
+
+        self._sessions = OrderedDict()  # session_id -> {color: lab}
+        self._lock = threading.Lock()
+
+    def centroids(self, samples: dict, session_id: str = None) -> dict:
+        """合并本次各面中心块、会话已有质心与默认质心，本次采样优先。
+
+        Args:
+            samples: { 'U': (9, 3) Lab 采样, ... }
+            session_id: 会话唯一标识；提供时保存本次的中心块质心
+        """
+        current = {FACE_COLORS[code]: lab[4] for code, lab in samples.items() if code in FACE_COLORS}
+        with self._lock:
+            stored = self._sessions.pop(session_id, {}) if session_id else {}
+            if session_id:
+                self._sessions[session_id] = {**stored, **current}
+                while len(self._sessions) > _MAX_SESSIONS:
+                    self._sessions.popitem(last=False)
+        return {**DEFAULT_CENTROIDS, **stored, **current}
+
+    def classify(self, lab: np.ndarray, centroids: dict):
+        """按最近质心分类一组 Lab 采样 (N, 3)。
+
+        Returns:
+            tuple: (N 个颜色名, (N,) 置信度)
+        """
+        names = list(centroids)
+        distances = ciede2000(lab[:, None, :], np.stack([centroids[n] for n in names])[None, :, :])
+        order = np.argsort(distances, axis=1)
+        nearest = distances[np.arange(len(lab)), order[:, 0]]
+        second = distances[np.arange(len(lab)), order[:, 1]]
+        confidence = np.where(nearest <= self.max_delta, (second - nearest) / np.maximum(second, 1e-9), 0.0)
+        return [names[i] for i in order[:, 0]], confidence
+
+    def recognize(self, images: dict, session_id: str = None) -> dict:
+        """识别多面图片。
+
+        Args:
+            images: { 'U': ndarray, ... } 按取景框裁剪的 BGR 图像
+            session_id: 会话唯一标识，用于保存和沿用颜色质心
+
+        Returns:
+            dict: { 'U': (3x3 颜色矩阵, 贴纸列表, 一面的置信度), ... }，
+                  贴纸列表格式与 CubeDetector._parse_detections 相同（box 为采样框，cell 为所在格子）
+        """
+        samples, boxes = {}, {}
+        for code, img in images.items():
+            bgr, boxes[code] = sample_grid(img, self.cell_fraction)
+            samples[code] = bgr_to_lab(bgr)
+        if not samples:
+            return {}
+
+        centroids = self.centroids(samples, session_id)
+        codes = list(samples)
+        colors, confidence = self.classify(np.concatenate([samples[code] for code in codes]), centroids)
+
+        results = {}
+        for n, code in enumerate(codes):
+            face_colors, face_conf = colors[n * 9:n * 9 + 9], confidence[n * 9:n * 9 + 9]
+            stickers = [{
+                'x': (x1 + x2) / 2, 'y': (y1 + y2) / 2, 'color': color, 'conf': float(conf),
+                'box': (x1, y1, x2, y2), 'cell': divmod(i, 3),
+            } for i, (color, conf, (x1, y1, x2, y2)) in enumerate(zip(face_colors, face_conf, boxes[code]))]
+            matrix = [face_colors[row * 3:row * 3 + 3] for row in range(3)]
+            results[code] = (matrix, stickers, float(face_conf.min()))
+        return results
@@ -1,7 +1,16 @@
-import twophase.solver as sv
 import os
 import json
 import re
+import time
+
+from cube_validation import check_cube_state, validate_cube_state
+from cube_engine import (
+    encode_states, compose_moves, apply_permutation, is_solved, replay_states, state_deltas,
+)
+
+# 默认搜索参数：找到不超过 20 步的解即返回，最多搜索 2 秒
+DEFAULT_MAX_LENGTH = 20
+DEFAULT_TIMEOUT = 2
 
 # =========================
 # 通用工具函数
@@ -63,6 +72,11 @@ def parse_cube_state_from_file(filename=None, session_id=None):
     with open(filepath, 'r', encoding='utf-8') as f:
         raw_data = json.load(f)
 
+    return flatten_cube_state(raw_data)
+
+
+def flatten_cube_state(raw_data):
+    """把 {面: 3x3 颜色矩阵} 展平为 {面: 颜色列表}"""
     cube_state = {}
     for face, matrix in raw_data.items():
         flat = [c for row in matrix for c in row]
@@ -71,12 +85,15 @@ def parse_cube_state_from_file(filename=None, session_id=None):
     return cube_state
 
 
+COLOR_TO_FACE = {
+    'white': 'U', 'yellow': 'D', 'red': 'R',
+    'orange': 'L', 'green': 'F', 'blue': 'B'
+}
+
+
 def convert_to_kociemba_format(cube_state):
     """将魔方状态转换为 Kociemba 54 字符串"""
-    color_mapping = {
-        'white': 'U', 'yellow': 'D', 'red': 'R',
-        'orange': 'L', 'green': 'F', 'blue': 'B'
-    }
+    color_mapping = COLOR_TO_FACE
     order = ['U', 'R', 'F', 'D', 'L', 'B']
     result = ''
 
@@ -96,26 +113,64 @@ def convert_to_kociemba_format(cube_state):
 
 
 def validate_kociemba_state(kociemba_string):
-    """验证 Kociemba 状态合法性"""
-    if len(kociemba_string) != 54:
-        return False, f"长度错误: {len(kociemba_string)} / 54"
-
-    centers = {
-        'U': kociemba_string[4],
-        'R': kociemba_string[13],
-        'F': kociemba_string[22],
-        'D': kociemba_string[31],
-        'L': kociemba_string[40],
-        'B': kociemba_string[49]
-    }
-
-    for face, val in centers.items():
-        if face != val:
-            return False, f"{face} 面中心错误，应为 {face}，检测为 {val}"
+    """验证 Kociemba 状态合法性（长度、中心、颜色数量及小块级检查，见 cube_validation）"""
+    reason = check_cube_state(kociemba_string)
+    if reason is not None:
+        return False, reason["message"]
 
     return True, '状态有效'
 
 
+def kociemba_to_cube_state(kociemba_code):
+    """将 Kociemba 54 字符串还原为 {面: 3x3 颜色矩阵}（与 cube_state.json 格式一致）"""
+    face_to_color = {face: color for color, face in COLOR_TO_FACE.items()}
+    cube_state = {}
+    for i, face in enumerate(['U', 'R', 'F', 'D', 'L', 'B']):
+        colors = [face_to_color.get(c, 'black') for c in kociemba_code[i * 9:(i + 1) * 9]]
+        cube_state[face] = [colors[r * 3:(r + 1) * 3] for r in range(3)]
+    return cube_state
+
+
+def save_cube_state_file(cube_state, session_id=None, output_dir=None):
+    """保存魔方状态到 cube_state.json（与 CubeDetector.save_cube_state_json 格式一致，但不依赖检测模型）
+
+    Args:
+        cube_state: {面: 3x3 颜色矩阵}
+        session_id: 会话唯一标识，用于会话隔离
+        output_dir: 自定义输出目录。当 session_id 存在时此参数被忽略。
+    """
+    if session_id:
+        from session_manager import get_session_dir
+        dirs = get_session_dir(session_id)
+        save_dir = dirs["results_dir"]
+    else:
+        save_dir = output_dir or "cube_results"
+
+    os.makedirs(save_dir, exist_ok=True)
+    with open(os.path.join(save_dir, "cube_state.json"), "w", encoding="utf-8") as f:
+        json.dump(cube_state, f, indent=2)
+
+
+def state_to_kociemba(state):
+    """把请求中的魔方状态转换为经过校验的 Kociemba 编码
+
+    Args:
+        state: 54 字符 Kociemba 字符串，或 {面: 颜色矩阵/颜色列表} 字典
+
+    Raises:
+        ValueError: 格式不支持
+        InvalidCubeStateError: 状态校验失败（ValueError 子类，reason 指明问题小块）
+    """
+    if isinstance(state, str):
+        kociemba_code = state.strip().upper()
+    elif isinstance(state, dict):
+        kociemba_code = convert_to_kociemba_format(flatten_cube_state(state))
+    else:
+        raise ValueError(f"不支持的状态格式: {type(state).__name__}")
+
+    return validate_cube_state(kociemba_code)
+
+
 # =========================
 # 解法解析与保存
 # =========================
@@ -164,15 +219,53 @@ def parse_raw_solution(raw_solution):
     return result
 
 
+class SolutionVerificationError(RuntimeError):
+    """解法回放后魔方未还原"""
+
+
+def verify_solution(solution, kociemba_code):
+    """在输入状态上回放解法，确认魔方最终还原。
+
+    整段解法先复合为单个置换再作用一次（见 cube_engine），每次求解都可以执行。
+
+    Args:
+        solution: Kociemba 原始解法字符串
+        kociemba_code: 求解前的 Kociemba 编码
+
+    Raises:
+        SolutionVerificationError: 回放后魔方未还原
+    """
+    moves = parse_solution_moves(solution)
+    final = apply_permutation(encode_states(kociemba_code), compose_moves(moves))
+    if not is_solved(final):
+        raise SolutionVerificationError(f"解法校验失败: 执行 {len(moves)} 步后魔方未还原")
+
+
+def solution_state_deltas(solution, kociemba_code):
+    """导出解法每一步之后的魔方状态（差分编码），前端可直接跳转到任意步骤。
+
+    Returns:
+        dict: {"initial": 初始 Kociemba 编码,
+               "deltas": 每步一项 [变化的贴纸下标列表, 对应的新颜色字符串]}
+    """
+    states = replay_states(encode_states(kociemba_code), parse_solution_moves(solution))
+    return {"initial": kociemba_code, "deltas": state_deltas(states)}
+
+
 def save_solution_results(solution, kociemba_code, output_dir=None, session_id=None):
-    """保存求解结果到 JSON 文件
+    """保存求解结果到 JSON 文件（写入前先回放校验解法）
 
     Args:
         solution: Kociemba 原始解法字符串
         kociemba_code: Kociemba 编码
         output_dir: 自定义输出目录。当 session_id 存在时此参数被忽略。
         session_id: 会话唯一标识，用于会话隔离
+
+    Raises:
+        SolutionVerificationError: 解法无法还原该状态，不写入文件
     """
+    verify_solution(solution, kociemba_code)
+
     if session_id:
         from session_manager import get_session_dir
         dirs = get_session_dir(session_id)
@@ -202,15 +295,62 @@ def save_solution_results(solution, kociemba_code, output_dir=None, session_id=N
 # 求解主流程（供 API 调用）
 # =========================
 
-def solve_cube_pipeline(session_id=None):
+def load_kociemba_code(session_id=None):
+    """读取已保存的魔方状态，转换并校验为 Kociemba 编码
+
+    Raises:
+        FileNotFoundError: 状态文件不存在
+        InvalidCubeStateError: 状态校验失败
+    """
     cube_state = parse_cube_state_from_file(session_id=session_id)
     kociemba_code = convert_to_kociemba_format(cube_state)
 
-    valid, msg = validate_kociemba_state(kociemba_code)
-    if not valid:
-        raise RuntimeError(msg)
+    return validate_cube_state(kociemba_code)
+
+
+def run_twophase_search(kociemba_code, max_length=DEFAULT_MAX_LENGTH, timeout=DEFAULT_TIMEOUT):
+    """执行二阶段搜索，返回 twophase 原始解法字符串
+
+    twophase 在首次导入时加载全部移动表与剪枝表，因此延迟到真正求解时才导入，
+    只负责转发请求的 Web 进程不必持有这些表。表以内存映射方式加载，见 twophase_tables。
+    """
+    return run_twophase_search_timed(kociemba_code, max_length, timeout)[0]
+
 
-    solution = sv.solve(kociemba_code, 20, 2).replace('\n', '').strip()
+def run_twophase_search_timed(kociemba_code, max_length=DEFAULT_MAX_LENGTH, timeout=DEFAULT_TIMEOUT):
+    """与 run_twophase_search 相同，另返回搜索本身的耗时
+
+    耗时在执行搜索的进程内测量，不含进程池排队和表加载。
+
+    Returns:
+        tuple: (twophase 原始解法字符串, 搜索耗时（秒）)
+    """
+    from twophase_tables import load_twophase
+    sv = load_twophase()
+
+    start = time.perf_counter()
+    solution = sv.solve(kociemba_code, max_length, timeout).replace('\n', '').strip()
+    elapsed = time.perf_counter() - start
+    if solution.startswith('Error'):
+        raise RuntimeError(solution)
+    return solution, elapsed
+
+
+def summarize_solution(solution, kociemba_code):
+    """组装接口返回的解法数据（不写文件）"""
+    moves = parse_raw_solution(solution)
+
+    return {
+        'kociemba_code': kociemba_code,
+        'raw_solution': solution,
+        'moves': moves,
+        'readable_solution': convert_to_readable(solution),
+        'step_count': len(moves)
+    }
+
+
+def build_solution_result(solution, kociemba_code, session_id=None):
+    """保存解法并组装接口返回的数据"""
     readable, moves = save_solution_results(solution, kociemba_code, session_id=session_id)
 
     return {
@@ -222,6 +362,12 @@ def solve_cube_pipeline(session_id=None):
     }
 
 
+def solve_cube_pipeline(session_id=None):
+    kociemba_code = load_kociemba_code(session_id=session_id)
+    solution = run_twophase_search(kociemba_code)
+    return build_solution_result(solution, kociemba_code, session_id=session_id)
+
+
 # =========================
 # CLI 调试入口（可选）
 # =========================
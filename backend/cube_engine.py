@@ -0,0 +1,150 @@
+"""
+NumPy 魔方引擎
+
+把魔方状态表示为长度 54 的 uint8 数组（0-5 依次对应 U R F D L B），
+每种面转动是一个 54 元素的置换数组（由 cube_geometry 推导）。
+一段转动序列可以预先复合成单个置换，再用一次花式索引作用到 (N, 54)
+的整批状态上，供解法校验、打乱生成和批量统计使用。
+
+置换约定与 cube_geometry 相同: new_state[..., i] = old_state[..., perm[i]]。
+"""
+
+import re
+
+import numpy as np
+
+from cube_geometry import FACES, MOVE_NAMES, MOVE_PERMS
+
+# 18 种转动的置换表，行号与 MOVE_NAMES 一致（U1 U2 U3 R1 ...）
+MOVE_TABLE = np.array([MOVE_PERMS[name] for name in MOVE_NAMES], dtype=np.intp)
+MOVE_INDEX = {name: i for i, name in enumerate(MOVE_NAMES)}
+
+IDENTITY = np.arange(54, dtype=np.intp)
+SOLVED = np.repeat(np.arange(6, dtype=np.uint8), 9)
+
+_CENTERS = np.array([9 * i + 4 for i in range(6)], dtype=np.intp)
+_FACE_CODES = np.frombuffer(FACES.encode(), dtype=np.uint8)
+_DECODE = np.zeros(256, dtype=np.uint8)
+_DECODE[_FACE_CODES] = np.arange(6, dtype=np.uint8)
+
+_MOVE_PATTERN = re.compile(r"^([URFDLB])([123'])?$")
+
+
+def normalize_move(move: str) -> str:
+    """把单步转动统一为 twophase 记法：R -> R1，R' -> R3，R2 -> R2
+
+    Raises:
+        ValueError: 无法识别的转动
+    """
+    match = _MOVE_PATTERN.match(move.strip())
+    if not match:
+        raise ValueError(f"无法识别的转动: {move}")
+    face, suffix = match.groups()
+    return face + {None: '1', "'": '3'}.get(suffix, suffix)
+
+
+def move_indices(moves) -> np.ndarray:
+    """把转动序列（列表或空格分隔的字符串，两种记法均可）转换为 MOVE_TABLE 行号数组"""
+    if isinstance(moves, str):
+        moves = moves.split()
+    return np.array([MOVE_INDEX.get(m) if m in MOVE_INDEX else MOVE_INDEX[normalize_move(m)] for m in moves],
+                    dtype=np.intp)
+
+
+def encode_states(states) -> np.ndarray:
+    """把 Kociemba 字符串（或字符串列表）编码为 uint8 数组，形状 (54,) 或 (N, 54)"""
+    if isinstance(states, str):
+        return _DECODE[np.frombuffer(states.encode(), dtype=np.uint8)]
+    raw = np.frombuffer(''.join(states).encode(), dtype=np.uint8).reshape(len(states), 54)
+    return _DECODE[raw]
+
+
+def decode_state(state: np.ndarray) -> str:
+    """把单个 (54,) 状态数组还原为 Kociemba 字符串"""
+    return _FACE_CODES[state].tobytes().decode()
+
+
+def compose_moves(moves) -> np.ndarray:
+    """把一段转动序列复合为单个 54 元素置换。
+
+    依次执行 p1、p2 等价于执行 p1[p2]，因此按顺序逐个索引即可。
+
+    Args:
+        moves: 转动序列（列表或空格分隔的字符串）
+
+    Returns:
+        np.ndarray: 复合后的置换
+    """
+    perm = IDENTITY
+    for index in move_indices(moves):
+        perm = perm[MOVE_TABLE[index]]
+    return perm
+
+
+def apply_permutation(states: np.ndarray, perm: np.ndarray) -> np.ndarray:
+    """对单个 (54,) 状态或 (N, 54) 批量状态应用置换"""
+    return states[..., perm]
+
+
+def apply_sequence(states: np.ndarray, moves) -> np.ndarray:
+    """对整批状态执行同一段转动序列（先复合成单个置换，只做一次索引）"""
+    return apply_permutation(states, compose_moves(moves))
+
+
+def apply_move_batch(states: np.ndarray, indices: np.ndarray) -> np.ndarray:
+    """对 (N, 54) 批量状态逐个执行各自的一步转动。
+
+    Args:
+        states: (N, 54) 状态数组
+        indices: (N,) MOVE_TABLE 行号数组
+
+    Returns:
+        np.ndarray: 转动后的 (N, 54) 状态数组
+    """
+    return np.take_along_axis(states, MOVE_TABLE[indices], axis=1)
+
+
+def random_states(count: int, length: int = 25, rng=None) -> np.ndarray:
+    """生成 count 个随机打乱状态（每个状态独立地随机转 length 步）。
+
+    Returns:
+        np.ndarray: (count, 54) 状态数组
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    perms = np.broadcast_to(IDENTITY, (count, 54))
+    for indices in rng.integers(0, len(MOVE_NAMES), size=(length, count)):
+        perms = np.take_along_axis(perms, MOVE_TABLE[indices], axis=1)
+    return SOLVED[perms]
+
+
+def is_solved(states: np.ndarray):
+    """判断状态是否已还原（每个面的贴纸颜色都与中心相同），批量时返回布尔数组"""
+    faces = states.reshape(states.shape[:-1] + (6, 9))
+    return np.all(faces == states[..., _CENTERS, None], axis=(-2, -1))
+
+
+def replay_states(state: np.ndarray, moves) -> np.ndarray:
+    """逐步执行转动序列，返回包含初始状态在内的全部中间状态，形状 (步数 + 1, 54)"""
+    indices = move_indices(moves)
+    states = np.empty((len(indices) + 1, 54), dtype=state.dtype)
+    states[0] = state
+    for step, index in enumerate(indices):
+        states[step + 1] = states[step][MOVE_TABLE[index]]
+    return states
+
+
+def state_deltas(states: np.ndarray) -> list:
+    """把连续的中间状态差分编码为每步变化的贴纸。
+
+    Args:
+        states: replay_states 的返回值
+
+    Returns:
+        list: 每步一项 [变化的贴纸下标列表, 对应的新颜色字符串]，
+              如 [[2, 5, 8], "FFF"]
+    """
+    deltas = []
+    for prev, curr in zip(states[:-1], states[1:]):
+        changed = np.flatnonzero(prev != curr)
+        deltas.append([changed.tolist(), _FACE_CODES[curr[changed]].tobytes().decode()])
+    return deltas
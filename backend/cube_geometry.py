@@ -0,0 +1,208 @@
+"""
+魔方贴纸几何模型
+
+用三维坐标描述 Kociemba 54 贴纸编码中每个贴纸的位置，从而推导出:
+  - 18 种面转动（U1/U2/U3 ...）对应的贴纸置换
+  - 48 种整体对称变换（24 种旋转 × 镜像）
+  - 状态的对称共轭、求逆，以及解法步骤的相应变换
+
+坐标约定: x 指向 R 面，y 指向 U 面，z 指向 F 面；每个贴纸由
+(所在小块的位置, 朝外法向) 唯一确定。
+
+置换约定: perm[i] 表示变换后位置 i 上的贴纸来自变换前的哪个位置，
+即 new_state[i] = old_state[perm[i]]。
+"""
+
+from itertools import permutations, product
+
+FACES = "URFDLB"
+
+FACE_NORMALS = {
+    'U': (0, 1, 0), 'R': (1, 0, 0), 'F': (0, 0, 1),
+    'D': (0, -1, 0), 'L': (-1, 0, 0), 'B': (0, 0, -1),
+}
+
+SOLVED_STATE = ''.join(face * 9 for face in FACES)
+
+# 每个面上第 r 行第 c 列贴纸的小块位置（按展开图中该面的朝向）
+_FACE_POSITIONS = {
+    'U': lambda r, c: (c - 1, 1, r - 1),
+    'R': lambda r, c: (1, 1 - r, 1 - c),
+    'F': lambda r, c: (c - 1, 1 - r, 1),
+    'D': lambda r, c: (c - 1, -1, 1 - r),
+    'L': lambda r, c: (-1, 1 - r, c - 1),
+    'B': lambda r, c: (1 - c, 1 - r, -1),
+}
+
+# 54 个贴纸 (位置, 法向)，顺序与 Kociemba 字符串一致
+STICKERS = [
+    (_FACE_POSITIONS[face](r, c), FACE_NORMALS[face])
+    for face in FACES for r in range(3) for c in range(3)
+]
+
+_STICKER_INDEX = {sticker: i for i, sticker in enumerate(STICKERS)}
+_NORMAL_TO_FACE = {normal: face for face, normal in FACE_NORMALS.items()}
+
+
+def _mat_vec(m, v):
+    return tuple(sum(m[i][k] * v[k] for k in range(3)) for i in range(3))
+
+
+def _det(m):
+    return (m[0][0] * (m[1][1] * m[2][2] - m[1][2] * m[2][1])
+            - m[0][1] * (m[1][0] * m[2][2] - m[1][2] * m[2][0])
+            + m[0][2] * (m[1][0] * m[2][1] - m[1][1] * m[2][0]))
+
+
+def _transpose(m):
+    return tuple(tuple(m[j][i] for j in range(3)) for i in range(3))
+
+
+def _quarter_turn(axis):
+    """绕单位轴 axis 顺时针（从轴的正方向看）旋转 90° 的整数矩阵"""
+    x, y, z = axis
+    # 罗德里格斯公式，角度 -90°：R = a·aᵀ - [a]ₓ
+    return (
+        (x * x, x * y + z, x * z - y),
+        (y * x - z, y * y, y * z + x),
+        (z * x + y, z * y - x, z * z),
+    )
+
+
+def _matrix_power(m, k):
+    result = ((1, 0, 0), (0, 1, 0), (0, 0, 1))
+    for _ in range(k):
+        result = tuple(tuple(sum(m[i][t] * result[t][j] for t in range(3)) for j in range(3)) for i in range(3))
+    return result
+
+
+def sticker_permutation(matrix, layer=None):
+    """计算空间变换对应的贴纸置换。
+
+    Args:
+        matrix: 3x3 整数正交矩阵
+        layer: 可选，(轴法向, 1) 形式的层选择；为空时整个魔方一起变换
+
+    Returns:
+        tuple: 长度 54 的置换，new_state[i] = old_state[perm[i]]
+    """
+    perm = list(range(54))
+    for i, (pos, normal) in enumerate(STICKERS):
+        if layer is not None and sum(p * a for p, a in zip(pos, layer)) != 1:
+            continue
+        target = _STICKER_INDEX[(_mat_vec(matrix, pos), _mat_vec(matrix, normal))]
+        perm[target] = i
+    return tuple(perm)
+
+
+# ================= 面转动 =================
+
+MOVE_NAMES = [face + str(power) for face in FACES for power in (1, 2, 3)]
+
+MOVE_PERMS = {
+    face + str(power): sticker_permutation(_matrix_power(_quarter_turn(FACE_NORMALS[face]), power),
+                                           layer=FACE_NORMALS[face])
+    for face in FACES for power in (1, 2, 3)
+}
+
+
+def apply_permutation(state: str, perm) -> str:
+    """对 54 字符状态应用贴纸置换"""
+    return ''.join(state[j] for j in perm)
+
+
+def apply_moves(state: str, moves) -> str:
+    """按顺序对状态执行一组 twophase 记法的转动（如 ['R1', 'U3']）"""
+    for move in moves:
+        state = apply_permutation(state, MOVE_PERMS[move])
+    return state
+
+
+def invert_moves(moves) -> list:
+    """求转动序列的逆：倒序，且每步方向取反（R1 <-> R3，R2 不变）"""
+    return [m[0] + str(4 - int(m[1])) for m in reversed(moves)]
+
+
+# ================= 整体对称 =================
+
+# 48 个带符号置换矩阵；下标 0 为恒等变换，行列式为 -1 的是镜像
+SYMMETRIES = [
+    tuple(tuple(signs[i] if axes[i] == j else 0 for j in range(3)) for i in range(3))
+    for axes in permutations(range(3))
+    for signs in product((1, -1), repeat=3)
+]
+
+SYMMETRY_INVERSE = [SYMMETRIES.index(_transpose(m)) for m in SYMMETRIES]
+
+_SYMMETRY_PERMS = [sticker_permutation(m) for m in SYMMETRIES]
+_SYMMETRY_FACE_MAPS = [
+    {face: _NORMAL_TO_FACE[_mat_vec(m, FACE_NORMALS[face])] for face in FACES}
+    for m in SYMMETRIES
+]
+_SYMMETRY_COLOR_TABLES = [str.maketrans(face_map) for face_map in _SYMMETRY_FACE_MAPS]
+_SYMMETRY_MIRRORED = [_det(m) < 0 for m in SYMMETRIES]
+
+
+def conjugate_state(state: str, sym: int) -> str:
+    """把整个魔方（连同颜色定义）做对称变换 sym，结果仍是标准中心的合法编码。
+
+    满足：若 state 执行转动 m 得到 t，则 conjugate_state(state) 执行
+    conjugate_moves([m]) 得到 conjugate_state(t)。
+    """
+    return apply_permutation(state, _SYMMETRY_PERMS[sym]).translate(_SYMMETRY_COLOR_TABLES[sym])
+
+
+def conjugate_moves(moves, sym: int) -> list:
+    """把转动序列映射到对称变换 sym 后的坐标系（镜像时方向取反）"""
+    face_map = _SYMMETRY_FACE_MAPS[sym]
+    mirrored = _SYMMETRY_MIRRORED[sym]
+    return [face_map[m[0]] + (str(4 - int(m[1])) if mirrored else m[1]) for m in moves]
+
+
+# ================= 状态求逆 =================
+
+# 按小块分组的贴纸下标（角块 3 个、棱块 2 个、中心 1 个）
+_CUBIE_SLOTS = {}
+for _i, (_pos, _normal) in enumerate(STICKERS):
+    _CUBIE_SLOTS.setdefault(_pos, []).append(_i)
+CUBIE_SLOTS = list(_CUBIE_SLOTS.values())
+
+_HOME_SLOT = {frozenset(SOLVED_STATE[i] for i in slot): slot for slot in CUBIE_SLOTS}
+
+
+def state_permutation(state: str):
+    """把颜色状态还原为贴纸置换 p，使 state[i] == SOLVED_STATE[p[i]]。
+
+    Returns:
+        list | None: 置换；若存在不存在的小块或重复小块则返回 None
+    """
+    if len(state) != 54:
+        return None
+
+    perm = [0] * 54
+    used = set()
+    for slot in CUBIE_SLOTS:
+        colors = [state[i] for i in slot]
+        home = _HOME_SLOT.get(frozenset(colors))
+        if home is None or len(set(colors)) != len(colors) or home[0] in used:
+            return None
+        used.add(home[0])
+        home_by_color = {SOLVED_STATE[j]: j for j in home}
+        for i, color in zip(slot, colors):
+            perm[i] = home_by_color[color]
+    return perm
+
+
+def invert_state(state: str):
+    """求状态的逆：若 state 由打乱序列 A 得到，返回由 A⁻¹ 得到的状态。
+
+    Returns:
+        str | None: 逆状态；状态无法分解为小块时返回 None
+    """
+    perm = state_permutation(state)
+    if perm is None:
+        return None
+    inverse = [0] * 54
+    for i, j in enumerate(perm):
+        inverse[j] = i
+    return apply_permutation(SOLVED_STATE, inverse)
@@ -1,7 +1,23 @@
 import cv2
 import os
 import json
-from ultralytics import YOLO
+import threading
+
+import numpy as np
+
+from detector_backends import create_backend
+from detector_pool import DetectorPool
+from debug_overlay import get_debug_recorder, draw_debug_boxes
+from detection_cache import get_detection_cache, image_key, model_fingerprint
+from color_classifier import ColorClassifier, CLASSIC_FAST_PATH, CLASSIC_MIN_CONF
+from grid_fitting import fill_matrices
+
+# ================= 配置区 =================
+
+# 分辨率级联：先用低分辨率推理，贴纸不足 9 个或第 9 高的置信度低于阈值时再用 640 重跑
+DETECT_CASCADE = os.environ.get("CUBE_DETECT_CASCADE", "0") == "1"
+CASCADE_IMGSZ = int(os.environ.get("CUBE_CASCADE_IMGSZ", 320))
+CASCADE_MIN_CONF = float(os.environ.get("CUBE_CASCADE_MIN_CONF", 0.5))
 
 
 class CubeDetector:
@@ -17,15 +33,31 @@ class CubeDetector:
         self.models_dir = os.path.join(base_dir, "models")
 
         os.makedirs(self.results_dir, exist_ok=True)
-        os.makedirs(self.debug_dir, exist_ok=True)
 
-        # ---------- 加载 YOLO 模型 ----------
-        model_path = os.path.join(self.models_dir, "best.pt")
-        if not os.path.exists(model_path):
-            raise FileNotFoundError(f"❌ 关键缺失：请将训练好的 best.pt 放入 {self.models_dir}")
+        # ---------- 调试图 (模式与写盘见 debug_overlay) ----------
+        self.debug = get_debug_recorder(self.debug_dir)
+
+        # ---------- 加载检测模型 (后端见 detector_backends，并发请求各自租用一个副本，见 detector_pool) ----------
+        self.backend = DetectorPool(lambda threads: create_backend(self.models_dir, threads=threads))
+
+        # ---------- 推理参数 ----------
+        self.imgsz = 640
+        self.conf = 0.25
+        self.iou = 0.6
+        self.cascade = DETECT_CASCADE
+        self.cascade_imgsz = CASCADE_IMGSZ
+        self.cascade_min_conf = CASCADE_MIN_CONF
+        self._cascade_lock = threading.Lock()
+        self._cascade_counts = {"images": 0, "first_stage": 0, "reruns": 0}
 
-        print(f"🚀 加载 YOLO 模型: {model_path}")
-        self.model = YOLO(model_path)
+        # ---------- 颜色采样快速路径 (取景框内的规整照片不经过 YOLO，见 color_classifier) ----------
+        self.classic = CLASSIC_FAST_PATH
+        self.classic_min_conf = CLASSIC_MIN_CONF
+        self.classifier = ColorClassifier()
+
+        # ---------- 检测结果缓存 (键含模型版本，替换模型后自动失效) ----------
+        self.cache = get_detection_cache()
+        self.model_version = f"{self.backend.name}:{model_fingerprint(self.backend.model_path)}"
 
         # ---------- 类别映射 ----------
         self.id_to_color = {
@@ -40,6 +72,10 @@ class CubeDetector:
         }
         self.target_filenames = ["white", "yellow", "red", "orange", "blue", "green"]
 
+    @property
+    def model(self):
+        return self.backend.model
+
     def detect_face_colors(self, image_path):
         """
         使用 YOLO 识别单张图片，返回 3x3 颜色矩阵 (支持部分识别)
@@ -50,106 +86,209 @@ class CubeDetector:
             return [['black'] * 3 for _ in range(3)], None
 
         face_name = os.path.splitext(os.path.basename(image_path))[0]
+        detections, _ = self.infer_faces([img])[0]
+        matrix, stickers = self._build_face_matrix(face_name, img, self._parse_detections(detections))
+        return matrix, self._draw_debug_boxes(img, stickers)
 
-        # 1. YOLO 推理 (开启半精度和尺寸限制，防止显存溢出)
-        results = self.model.predict(
-            img,
-            conf=0.25,
-            iou=0.6,
-            agnostic_nms=True,
-            verbose=False,
-            imgsz=640,
-            half=True
-        )[0]
-
-        stickers = []
-
-        # 2. 解析结果
-        for box in results.boxes:
-            x1, y1, x2, y2 = box.xyxy[0].tolist()
-            cls_id = int(box.cls[0])
-            conf = float(box.conf[0])
-            color = self.id_to_color.get(cls_id, 'unknown')
-            cx, cy = (x1 + x2) / 2, (y1 + y2) / 2
+    def _predict_batch(self, images, imgsz=None):
+        """
+        一次前向推理多张图片 (所有图片 letterbox 到同一尺寸后拼成一个 batch)
+        返回每张图片的检测结果数组 (K, 6): x1, y1, x2, y2, conf, cls
+        """
+        if not images:
+            return []
 
-            stickers.append({
-                'x': cx, 'y': cy, 'color': color, 'conf': conf,
-                'box': (int(x1), int(y1), int(x2), int(y2))
-            })
+        return self.backend.predict(list(images), imgsz=imgsz or self.imgsz, conf=self.conf, iou=self.iou)
 
-        # 3. 智能筛选 (Top 9)
-        if len(stickers) > 9:
-            print(f"⚠️ {face_name} 检测到 {len(stickers)} 个框，选取 Top 9")
-            stickers.sort(key=lambda s: s['conf'], reverse=True)
-            stickers = stickers[:9]
+    def warm_up(self):
+        """
+        用一张灰色图片让每个模型副本按实际使用的推理尺寸各推理一次
 
-        # 4. 智能网格填充 (核心修改)
-        # 即使数量 != 9，也尝试把现有的填进去
-        matrix = self._smart_grid_fill(stickers)
+        Returns:
+            dict: { 推理尺寸: [每个副本的耗时 (毫秒)] }
+        """
+        dummy = [np.full((640, 480, 3), 114, np.uint8)]
+        sizes = [self.cascade_imgsz, self.imgsz] if self.cascade else [self.imgsz]
+        return {size: self.backend.warm_up(dummy, imgsz=size, conf=self.conf, iou=self.iou) for size in sizes}
 
-        # 5. 保存调试图
-        debug_img = self._draw_debug_boxes(img, stickers)
-        # 如果数量不对，标记为 fail 图，方便查看，但不影响程序运行
-        suffix = "_partial" if len(stickers) != 9 else "_ok"
-        cv2.imwrite(os.path.join(self.debug_dir, f"{face_name}{suffix}.jpg"), debug_img)
+    def _cascade_accepts(self, detections):
+        """
+        低分辨率结果是否可信：至少 9 个框，且置信度第 9 高的框不低于阈值
+        """
+        if len(detections) < 9:
+            return False
+        return float(np.sort(detections[:, 4])[-9]) >= self.cascade_min_conf
 
-        if len(stickers) != 9:
-            print(f"⚠️ {face_name} 面仅识别 {len(stickers)}/9 个，已自动填充灰色")
+    def infer_faces(self, images):
+        """
+        批量推理多张图片，启用级联时先以 cascade_imgsz 推理，不可信的图片再以 imgsz 合批重跑
 
-        return matrix, debug_img
+        Returns:
+            list: 每张图片一个 (检测结果数组, 给出结果的推理尺寸)
+        """
+        if not images:
+            return []
+        if not self.cascade:
+            return [(det, self.imgsz) for det in self._predict_batch(images)]
+
+        results = [(det, self.cascade_imgsz) for det in self._predict_batch(images, imgsz=self.cascade_imgsz)]
+        retry = [i for i, (det, _) in enumerate(results) if not self._cascade_accepts(det)]
+        if retry:
+            for i, det in zip(retry, self._predict_batch([images[i] for i in retry])):
+                results[i] = (det, self.imgsz)
+
+        with self._cascade_lock:
+            self._cascade_counts["images"] += len(images)
+            self._cascade_counts["first_stage"] += len(images) - len(retry)
+            self._cascade_counts["reruns"] += len(retry)
+        return results
+
+    def cascade_stats(self):
+        """
+        级联的累计统计：低分辨率直接给出结果的比例
+        """
+        with self._cascade_lock:
+            counts = dict(self._cascade_counts)
+        counts["enabled"] = self.cascade
+        counts["first_stage_rate"] = round(counts["first_stage"] / counts["images"], 4) if counts["images"] else 0.0
+        return counts
 
-    @staticmethod
-    def _smart_grid_fill(stickers):
+    def _parse_detections(self, detections):
         """
-        智能网格映射算法：
-        根据检测到的所有点的边界，划分 3x3 区域，将点落入对应的格子。
+        把检测结果数组转换为贴纸列表
         """
-        # 初始化全灰矩阵
-        matrix = [['black'] * 3 for _ in range(3)]
+        stickers = []
+        for x1, y1, x2, y2, conf, cls_id in detections.tolist():
+            color = self.id_to_color.get(int(cls_id), 'unknown')
+            cx, cy = (x1 + x2) / 2, (y1 + y2) / 2
 
-        if not stickers:
-            return matrix
+            stickers.append({
+                'x': cx, 'y': cy, 'color': color, 'conf': float(conf),
+                'box': (int(x1), int(y1), int(x2), int(y2))
+            })
+        return stickers
 
-        # 1. 计算所有点的边界范围
-        xs = [s['x'] for s in stickers]
-        ys = [s['y'] for s in stickers]
-        min_x, max_x = min(xs), max(xs)
-        min_y, max_y = min(ys), max(ys)
+    def _build_face_matrices(self, faces, session_id=None):
+        """
+        筛选贴纸、批量网格拟合并记录调试信息
 
-        # 2. 计算每个格子的理论宽高
-        # 加一点点 buffer 防止除以 0
-        width = (max_x - min_x) + 1
-        height = (max_y - min_y) + 1
+        Args:
+            faces: [(face_name, img, stickers), ...]
 
-        # 3. 映射每个点到 (row, col)
-        for s in stickers:
-            # 计算相对位置 (0.0 ~ 1.0)
-            rel_x = (s['x'] - min_x) / width
-            rel_y = (s['y'] - min_y) / height
+        Returns:
+            list: 每面一个 (3x3 颜色矩阵, 保留的贴纸列表)
+        """
+        # 1. 智能筛选 (Top 9)
+        selected = []
+        for face_name, _, stickers in faces:
+            if len(stickers) > 9:
+                print(f"⚠️ {face_name} 检测到 {len(stickers)} 个框，选取 Top 9")
+                stickers = sorted(stickers, key=lambda s: s['conf'], reverse=True)[:9]
+            selected.append(stickers)
+
+        # 2. 网格拟合 (所有面一次完成，透视变形 / 缺整行时仍能正确对应，见 grid_fitting)
+        matrices = fill_matrices(selected, [img.shape[:2] for _, img, _ in faces])
+
+        # 3. 记录调试信息 (按模式抽样写盘或留待按需渲染，不在此处画框)
+        results = []
+        for (face_name, img, _), stickers, matrix in zip(faces, selected, matrices):
+            self.debug.record(session_id, face_name, img, stickers)
+            if len(stickers) != 9:
+                print(f"⚠️ {face_name} 面仅识别 {len(stickers)}/9 个，已自动填充灰色")
+            results.append((matrix, stickers))
+        return results
+
+    def _build_face_matrix(self, face_name, img, stickers, session_id=None):
+        """
+        单面版本的 _build_face_matrices，返回 (3x3 颜色矩阵, 保留的贴纸列表)
+        """
+        return self._build_face_matrices([(face_name, img, stickers)], session_id)[0]
 
-            # 映射到 0, 1, 2
-            # 理想情况下：0-0.33 -> 0, 0.33-0.66 -> 1, 0.66-1.0 -> 2
-            col = int(rel_x * 3)
-            row = int(rel_y * 3)
+    _draw_debug_boxes = staticmethod(draw_debug_boxes)
 
-            # 边界保护 (防止算出来是 3)
-            col = min(max(col, 0), 2)
-            row = min(max(row, 0), 2)
+    def detect_images(self, images, infer=None, session_id=None, telemetry=None):
+        """
+        批量识别多面图片：所有面合并为一次前向推理，再按面拆分结果
+        启用颜色采样快速路径时，置信度足够的面直接采用 CIEDE2000 分类结果；
+        与之前提交过的图片内容完全相同的面直接使用缓存结果，不参与推理
+
+        Args:
+            images: { 'U': ndarray, 'F': ndarray, ... } (BGR 图像)
+            infer: 可选，批量推理函数 (默认 self.infer_faces，返回值格式与其相同)，
+                   例如跨请求组批的 InferenceScheduler.run
+            session_id: 会话唯一标识，调试图按会话记录
+            telemetry: 可选 dict，写入本次请求各面的结果来源:
+                       { 'stages': { 'U': 'classic' / 'cache' / 320 / 640 }, 'reruns': 重跑面数 }
+
+        Returns:
+            dict: { 'U': 3x3 颜色矩阵, ... }，只包含传入的面
+        """
+        matrices, stages = {}, {}
+        for code, matrix, _, stage in self.iter_detect_images(images, infer, session_id, per_face=False):
+            matrices[code], stages[code] = matrix, stage
 
-            matrix[row][col] = s['color']
+        if telemetry is not None:
+            telemetry.update(self.detection_telemetry(stages, order=images))
+        return {code: matrices[code] for code in images}
 
-        return matrix
+    def iter_detect_images(self, images, infer=None, session_id=None, per_face=True):
+        """
+        逐面产出识别结果（生成器）：颜色采样快速路径与缓存命中的面最先产出，
+        其余的面 per_face=True 时逐面推理、每推理完一面就产出一面（首个结果只需等一面的推理），
+        per_face=False 时合并为一次前向推理（detect_images 使用）
 
-    @staticmethod
-    def _draw_debug_boxes(img, stickers):
-        debug_img = img.copy()
-        for s in stickers:
-            x1, y1, x2, y2 = s['box']
-            color = s['color']
-            cv2.rectangle(debug_img, (x1, y1), (x2, y2), (0, 255, 0), 2)
-            cv2.putText(debug_img, color, (x1, y1 - 5),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
-        return debug_img
+        Yields:
+            tuple: (面标识, 3x3 颜色矩阵, 贴纸列表, 结果来源 'classic' / 'cache' / 推理尺寸)
+        """
+        face_to_filename = {code: name for name, code in self.filename_to_face.items()}
+        codes = list(images)
+
+        done = set()
+        if self.classic:
+            for code, (matrix, stickers, confidence) in self.classifier.recognize(images, session_id).items():
+                if confidence >= self.classic_min_conf:
+                    done.add(code)
+                    self.debug.record(session_id, face_to_filename.get(code, code), images[code], stickers)
+                    yield code, matrix, stickers, "classic"
+
+        keys = {}
+        if self.cache.enabled:
+            params = (self.imgsz, self.conf, self.iou,
+                      (self.cascade_imgsz, self.cascade_min_conf) if self.cascade else None)
+            keys = {code: image_key(images[code], self.model_version, params)
+                    for code in codes if code not in done}
+
+        pending = []
+        for code in codes:
+            if code in done:
+                continue
+            cached = self.cache.get(keys[code]) if keys else None
+            if cached is None:
+                pending.append(code)
+                continue
+            stickers, matrix = cached
+            self.debug.record(session_id, face_to_filename.get(code, code), images[code], stickers)
+            yield code, matrix, stickers, "cache"
+
+        groups = [[code] for code in pending] if per_face else [pending]
+        for group in filter(None, groups):
+            results = (infer or self.infer_faces)([images[code] for code in group])
+            faces = [(face_to_filename.get(code, code), images[code], self._parse_detections(det))
+                     for code, (det, _) in zip(group, results)]
+            built = self._build_face_matrices(faces, session_id=session_id)
+            for code, (_, stage), (matrix, stickers) in zip(group, results, built):
+                if keys:
+                    self.cache.put(keys[code], stickers, matrix)
+                yield code, matrix, stickers, stage
+
+    def detection_telemetry(self, stages, order=None):
+        """
+        各面结果来源 -> { 'stages': {...}, 'reruns': 级联中以 imgsz 重跑的面数 }
+        """
+        return {
+            "stages": {code: stages[code] for code in (order or stages)},
+            "reruns": sum(1 for stage in stages.values() if self.cascade and stage == self.imgsz),
+        }
 
     def detect_all_faces(self, session_id: str = None):
         if session_id:
@@ -165,17 +304,28 @@ class CubeDetector:
 
         print(f"🔍 开始 YOLO 识别流程...")
 
+        images = {}
         for filename in self.target_filenames:
-            path = os.path.join(images_dir, f"{filename}.png")
-            face_code = self.filename_to_face[filename]
+            # 同步保存为 png，后台保存默认为 jpg / webp (见 image_utils)；
+            # 切换过保存格式时目录中会留下旧扩展名的文件，取最近写入的一个
+            candidates = [os.path.join(images_dir, f"{filename}.{ext}") for ext in ("png", "jpg", "webp")]
+            existing = [p for p in candidates if os.path.exists(p)]
+            path = max(existing, key=os.path.getmtime) if existing else candidates[0]
 
             if not os.path.exists(path):
                 print(f"⚠️ 文件缺失: {path}")
                 continue
 
-            matrix, _ = self.detect_face_colors(path)
+            img = cv2.imread(path)
+            if img is None:
+                print(f"❌ 无法读取图片: {path}")
+                continue
+            images[self.filename_to_face[filename]] = img
+
+        face_to_filename = {code: name for name, code in self.filename_to_face.items()}
+        for face_code, matrix in self.detect_images(images, session_id=session_id).items():
             cube_state[face_code] = matrix
-            print(f"✅ {filename} -> {face_code} 处理完毕")
+            print(f"✅ {face_to_filename[face_code]} -> {face_code} 处理完毕")
 
         return cube_state
 
@@ -2,46 +2,93 @@
 CubeMaster 业务服务层
 
 提供魔方识别、状态保存和求解的高级业务逻辑封装。
-使用单例模式管理 YOLO 检测器实例，避免重复加载模型。
+使用单例模式管理 YOLO 检测器实例，并发识别由检测器内部的模型副本池承担。
+求解任务交给独立的求解进程池执行，不占用 Web 进程的线程池。
 支持基于 session_id 的会话隔离，解决并发文件覆盖问题。
 """
 
+import asyncio
+import os
+import threading
+import time
+
 from cube_image_detection import CubeDetector
-from image_utils import save_base64_images
-from convert_cube_state import solve_cube_pipeline
-from session_manager import get_session_dir
+from grid_fitting import confidence_matrix
+from image_utils import decode_base64_images, persist_images_async, SAVE_UPLOADED_IMAGES
+from anytime_solver import run_twophase_search_progressive
+from convert_cube_state import (
+    solve_cube_pipeline,
+    load_kociemba_code,
+    build_solution_result,
+    state_to_kociemba,
+    summarize_solution,
+    kociemba_to_cube_state,
+    save_cube_state_file,
+    save_solution_results,
+    parse_raw_solution,
+    verify_solution,
+    solution_state_deltas,
+)
+from solver_pool import get_solver_pool, get_solver_profile, resolve_search_params
+from solution_cache import get_solution_cache
+from inference_scheduler import get_inference_scheduler, INFER_BATCHING
+from cube_validation import InvalidCubeStateError
+from warmup import get_readiness
+
+# 单次批量求解允许的最大状态数
+SOLVE_BATCH_MAX_ITEMS = 10000
+
+# 没有 session_id 时状态文件的保存目录（与 CubeDetector.results_dir 相同）
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cube_results")
 
 _detector_instance = None
+_detector_lock = threading.Lock()
 
 
 def get_detector():
     """获取全局唯一的 YOLO 检测器实例（延迟初始化）。
 
-    使用单例模式确保整个应用生命周期内只有一个检测器实例，
-    避免重复加载模型到显存。
+    使用单例模式确保整个应用生命周期内只有一个检测器实例；
+    检测器内部持有模型副本池（CUBE_DETECTOR_REPLICAS），并发请求各自租用一个副本推理。
 
     Returns:
         CubeDetector: YOLO 魔方检测器实例
     """
     global _detector_instance
-    if _detector_instance is None:
-        print("[System] 初始化全局 YOLO 检测器单例...")
-        _detector_instance = CubeDetector()
+    with _detector_lock:
+        if _detector_instance is None:
+            print("[System] 初始化全局 YOLO 检测器单例...")
+            readiness = get_readiness()
+            start = time.perf_counter()
+            try:
+                _detector_instance = CubeDetector()
+            except Exception as e:
+                readiness.update("detector", error=f"{type(e).__name__}: {e}")
+                raise
+            readiness.update("detector", loaded=True, load_s=round(time.perf_counter() - start, 3), error=None)
+        return _detector_instance
+
+
+def get_loaded_detector():
+    """返回已加载的检测器；尚未加载时返回 None（不会触发模型加载）"""
     return _detector_instance
 
 
-def recognize_cube(images_data: dict, session_id: str = None) -> list:
+def recognize_cube(images_data: dict, session_id: str = None, telemetry: dict = None) -> dict:
     """识别魔方状态。
 
-    将六面图片保存到本地，然后使用 YOLO 模型识别每面的颜色状态。
+    在内存中解码六面图片后直接交给 YOLO 模型识别，不经过磁盘；
+    启用 INFER_BATCHING 时各面图片进入推理调度器，与其他并发请求的图片合批推理。
+    上传图片的保存（SAVE_UPLOADED_IMAGES）在后台线程中完成，不占用请求时间。
 
     Args:
         images_data: 字典，键为面名（如 'U', 'D', 'F' 等），
                      值为对应面的 base64 编码图片数据
         session_id: 会话唯一标识，用于会话隔离
+        telemetry: 可选 dict，写入各面结果的来源（推理尺寸或缓存），见 CubeDetector.detect_images
 
     Returns:
-        list: 6个元素的列表，每个元素是对应面的颜色状态数组
+        dict: 六个面的 3x3 颜色矩阵，未上传或解码失败的面为 black
 
     Raises:
         ValueError: 如果 images_data 为空
@@ -49,24 +96,85 @@ def recognize_cube(images_data: dict, session_id: str = None) -> list:
     if not images_data:
         raise ValueError("未接收到图片数据")
 
-    if session_id:
-        dirs = get_session_dir(session_id)
-        output_dir = dirs["images_dir"]
-    else:
-        output_dir = "images"
+    return recognize_images(decode_base64_images(images_data), session_id=session_id, telemetry=telemetry)
 
-    save_base64_images(images_data, output_dir=output_dir, session_id=session_id)
 
-    detector = get_detector()
-    cube_state = detector.detect_all_faces(session_id=session_id)
+def recognize_images(images: dict, session_id: str = None, telemetry: dict = None) -> dict:
+    """识别已解码的六面图片（base64 接口与二进制上传接口共用）。
+
+    Args:
+        images: { 'U': ndarray, ... }，已等比缩放的 BGR 图像，可以少于六个面
+        session_id: 会话唯一标识，用于会话隔离
+        telemetry: 可选 dict，写入各面结果的来源，见 CubeDetector.detect_images
+
+    Returns:
+        dict: 六个面的 3x3 颜色矩阵，缺少的面为 black
+    """
+    if SAVE_UPLOADED_IMAGES and images:
+        persist_images_async(images, output_dir="images", session_id=session_id)
+
+    cube_state = {face: [['black'] * 3 for _ in range(3)] for face in "URFDLB"}
+    if images:
+        detector = get_detector()
+        infer = get_inference_scheduler(detector.infer_faces).run if INFER_BATCHING else None
+        cube_state.update(detector.detect_images(images, infer=infer, session_id=session_id, telemetry=telemetry))
 
     return cube_state
 
 
+async def recognize_cube_stream(images_data: dict, session_id: str = None):
+    """渐进式识别（异步生成器）。
+
+    与 recognize_cube 相同，但需要推理的面逐面推理，每识别完一面就产出一面，
+    前端可以先显示已识别的面、在其余面还在处理时重拍识别不好的面；
+    颜色采样快速路径与缓存命中的面最先产出。
+
+    Args:
+        images_data: 同 recognize_cube
+        session_id: 会话唯一标识，用于会话隔离
+
+    Yields:
+        dict: {"event": "face", "face", "matrix", "confidence", "stage", "count", "total", "elapsed"}
+              每面一次（confidence 为 3x3 置信度，未检测到的格子为 0），
+              最后一次为 {"event": "done", "data": 六面颜色矩阵, "detection": 各面结果来源}
+
+    Raises:
+        ValueError: 如果 images_data 为空
+    """
+    if not images_data:
+        raise ValueError("未接收到图片数据")
+
+    start = time.perf_counter()
+    images = await asyncio.to_thread(decode_base64_images, images_data)
+    if SAVE_UPLOADED_IMAGES and images:
+        persist_images_async(images, output_dir="images", session_id=session_id)
+
+    cube_state = {face: [['black'] * 3 for _ in range(3)] for face in "URFDLB"}
+    stages = {}
+    detector = None
+    if images:
+        detector = await asyncio.to_thread(get_detector)
+        infer = get_inference_scheduler(detector.infer_faces).run if INFER_BATCHING else None
+        faces = detector.iter_detect_images(images, infer=infer, session_id=session_id)
+        # 生成器在线程池中逐步推进，每一步至多推理一面
+        while True:
+            item = await asyncio.to_thread(next, faces, None)
+            if item is None:
+                break
+            code, matrix, stickers, stage = item
+            cube_state[code], stages[code] = matrix, stage
+            yield {"event": "face", "face": code, "matrix": matrix, "confidence": confidence_matrix(stickers),
+                   "stage": stage, "count": len(stages), "total": len(images),
+                   "elapsed": round(time.perf_counter() - start, 4)}
+
+    detection = detector.detection_telemetry(stages, order=images) if detector else {}
+    yield {"event": "done", "data": cube_state, "detection": detection}
+
+
 def save_cube_state(state: dict, session_id: str = None) -> None:
     """保存魔方状态到 JSON 文件。
 
-    将魔方状态持久化存储，供后续求解使用。
+    将魔方状态持久化存储，供后续求解使用（只写文件，不需要加载检测模型）。
 
     Args:
         state: 包含六面颜色数据的字典
@@ -78,8 +186,7 @@ def save_cube_state(state: dict, session_id: str = None) -> None:
     if not state:
         raise ValueError("状态数据为空")
 
-    detector = get_detector()
-    detector.save_cube_state_json(state, session_id=session_id)
+    save_cube_state_file(state, session_id=session_id, output_dir=RESULTS_DIR)
 
 
 def solve_cube(session_id: str = None) -> dict:
@@ -93,4 +200,212 @@ def solve_cube(session_id: str = None) -> dict:
     Returns:
         dict: 包含 readable_solution（可读步数）和 moves（内部表示）的字典
     """
-    return solve_cube_pipeline(session_id=session_id)
\ No newline at end of file
+    return solve_cube_pipeline(session_id=session_id)
+
+
+async def solve_cube_async(session_id: str = None, profile: str = None, include_states: bool = False) -> dict:
+    """异步求解魔方。
+
+    读取之前保存的魔方状态，先查询解法缓存；未命中时将二阶段搜索提交到
+    求解进程池，等待期间不阻塞事件循环和线程池，求得的解法写回缓存。
+
+    Args:
+        session_id: 会话唯一标识，用于会话隔离
+        profile: 求解档位（fast / balanced / short），为空时使用默认档位
+        include_states: 是否附带每一步之后的中间状态（见 solution_state_deltas）
+
+    Returns:
+        dict: 与 solve_cube 相同结构的求解结果，另含 profile、search_time、queue_wait、cached，
+              include_states 时另含 states
+
+    Raises:
+        ValueError: 档位不存在
+        SolverBusyError: 求解队列已满
+        SolverTimeoutError: 求解超时
+    """
+    kociemba_code = load_kociemba_code(session_id=session_id)
+    solution, search_info = await _solve_kociemba_code(kociemba_code, profile)
+    result = build_solution_result(solution, kociemba_code, session_id=session_id)
+    result.update(search_info)
+    if include_states:
+        result["states"] = solution_state_deltas(solution, kociemba_code)
+    return result
+
+
+async def solve_cube_state(state, profile: str = None, include_states: bool = False) -> dict:
+    """无状态求解：直接求解请求体中的魔方状态。
+
+    不读写任何文件，也不依赖识别模型；需要保存到会话时由调用方
+    在响应返回后调用 persist_solve_result。
+
+    Args:
+        state: 54 字符 Kociemba 字符串或六面颜色字典
+        profile: 求解档位，为空时使用默认档位
+        include_states: 是否附带每一步之后的中间状态
+
+    Returns:
+        dict: 与 solve_cube_async 相同结构的求解结果
+
+    Raises:
+        ValueError: 状态格式错误或档位不存在
+        InvalidCubeStateError: 状态校验失败
+    """
+    kociemba_code = state_to_kociemba(state)
+    solution, search_info = await _solve_kociemba_code(kociemba_code, profile)
+    result = summarize_solution(solution, kociemba_code)
+    result.update(search_info)
+    if include_states:
+        result["states"] = solution_state_deltas(solution, kociemba_code)
+    return result
+
+
+def persist_solve_result(result: dict, session_id: str) -> None:
+    """把无状态求解的输入状态和解法写入会话目录（cube_state.json / solution.json）。
+
+    Args:
+        result: solve_cube_state 的返回值
+        session_id: 会话唯一标识
+    """
+    kociemba_code = result["kociemba_code"]
+    save_cube_state_file(kociemba_to_cube_state(kociemba_code), session_id=session_id)
+    save_solution_results(result["raw_solution"], kociemba_code, session_id=session_id)
+
+
+async def solve_cube_stream(state=None, session_id: str = None, persist: bool = False, profile: str = None,
+                            max_length: int = None, timeout: float = None):
+    """渐进式求解（异步生成器）。
+
+    先产出搜索到的第一个可行解，此后每找到更短的解再产出一次，
+    直到达到目标步数或时间预算。缓存命中时直接产出缓存的解。
+
+    Args:
+        state: 54 字符 Kociemba 字符串或六面颜色字典；为空时读取会话中保存的状态
+        session_id: 会话唯一标识
+        persist: 无状态模式下是否在求解结束后写入会话目录
+        profile: 求解档位，决定默认的目标步数和时间预算
+        max_length: 可选，目标步数，找到不超过该步数的解即停止（不小于档位的目标步数）
+        timeout: 可选，搜索时间预算（秒，不超过档位的时间预算），见 resolve_search_params
+
+    Yields:
+        dict: {"event": "solution", "raw_solution", "length", "elapsed"} 若干次，
+              最后一次为 {"event": "done", "data": 求解结果}
+    """
+    profile, max_length, timeout = resolve_search_params(profile, max_length, timeout)
+
+    if state is None:
+        kociemba_code = await asyncio.to_thread(load_kociemba_code, session_id=session_id)
+    else:
+        kociemba_code = state_to_kociemba(state)
+
+    start = time.perf_counter()
+    cache = get_solution_cache()
+    # 查询与写入都要做 96 种对称规约，开启磁盘层时还有 SQLite 读写，不在事件循环中执行
+    solution = await asyncio.to_thread(cache.lookup, kociemba_code, max_length=max_length, timeout=timeout)
+    cached = solution is not None
+
+    if cached:
+        verify_solution(solution, kociemba_code)
+        yield {"event": "solution", "raw_solution": solution, "length": len(parse_raw_solution(solution)),
+               "elapsed": round(time.perf_counter() - start, 4), "cached": True}
+    else:
+        async for kind, value in get_solver_pool().run_with_progress(
+                run_twophase_search_progressive, kociemba_code, max_length, timeout):
+            if kind == "progress":
+                verify_solution(value["raw_solution"], kociemba_code)
+                yield {"event": "solution", **value}
+            else:
+                solution = value
+        verify_solution(solution, kociemba_code)
+        await asyncio.to_thread(cache.store, kociemba_code, solution, max_length=max_length, timeout=timeout)
+
+    if state is None:
+        # 会写入会话目录中的解法文件
+        data = await asyncio.to_thread(build_solution_result, solution, kociemba_code, session_id=session_id)
+    else:
+        data = summarize_solution(solution, kociemba_code)
+    data.update({"profile": profile, "search_time": round(time.perf_counter() - start, 4), "cached": cached})
+    yield {"event": "done", "data": data}
+
+    if state is not None and persist and session_id:
+        await asyncio.to_thread(persist_solve_result, data, session_id)
+
+
+async def _solve_kociemba_code(kociemba_code: str, profile: str = None) -> tuple:
+    """先查解法缓存，未命中再按档位参数交给求解进程池，并把结果写回缓存。
+
+    无论解法来自缓存还是搜索，都先在输入状态上回放校验，未通过校验的解法不会写入缓存。
+
+    Returns:
+        tuple: (原始解法字符串, {"profile", "search_time", "queue_wait", "cached"})，
+               search_time 为工作进程内的搜索耗时（秒），queue_wait 为在求解进程池中
+               排队与传输的耗时（秒）；命中缓存时两者均为 0
+    """
+    profile, params = get_solver_profile(profile)
+    max_length, timeout = params["max_length"], params["timeout"]
+
+    cache = get_solution_cache()
+    solution = await asyncio.to_thread(cache.lookup, kociemba_code, max_length=max_length, timeout=timeout)
+    cached = solution is not None
+    search_time = queue_wait = 0.0
+    if not cached:
+        start = time.perf_counter()
+        solution, search_time = await get_solver_pool().solve(kociemba_code, max_length, timeout)
+        queue_wait = max(time.perf_counter() - start - search_time, 0.0)
+    verify_solution(solution, kociemba_code)
+    if not cached:
+        await asyncio.to_thread(cache.store, kociemba_code, solution, max_length=max_length, timeout=timeout)
+
+    return solution, {"profile": profile, "search_time": round(search_time, 4),
+                      "queue_wait": round(queue_wait, 4), "cached": cached}
+
+
+async def solve_batch(states: list, ordered: bool = True, profile: str = None):
+    """批量求解魔方状态（异步生成器）。
+
+    所有状态并行提交到求解进程池，单个状态失败不影响其余状态。
+    同时在途的任务数限制为进程数的两倍，避免一个批次占满求解队列。
+
+    Args:
+        states: 状态列表，每项为 54 字符 Kociemba 字符串或六面颜色字典
+        ordered: True 按输入顺序产出结果，False 按完成顺序产出
+        profile: 整个批次使用的求解档位，为空时使用默认档位
+
+    Yields:
+        dict: {"index", "success", "data"} 或 {"index", "success", "error"}，
+              状态非法时另含 reason（见 cube_validation.check_cube_state）
+
+    Raises:
+        ValueError: 状态列表为空、超过 SOLVE_BATCH_MAX_ITEMS 或档位不存在
+    """
+    get_solver_profile(profile)
+    if not states:
+        raise ValueError("状态列表为空")
+    if len(states) > SOLVE_BATCH_MAX_ITEMS:
+        raise ValueError(f"单次最多求解 {SOLVE_BATCH_MAX_ITEMS} 个状态")
+
+    limit = asyncio.Semaphore(max(get_solver_pool().size, 1) * 2)
+
+    async def solve_one(index, state):
+        try:
+            kociemba_code = state_to_kociemba(state)
+            async with limit:
+                solution, search_info = await _solve_kociemba_code(kociemba_code, profile)
+            data = summarize_solution(solution, kociemba_code)
+            data.update(search_info)
+            return {"index": index, "success": True, "data": data}
+        except InvalidCubeStateError as e:
+            return {"index": index, "success": False, "error": str(e), "reason": e.reason}
+        except Exception as e:
+            return {"index": index, "success": False, "error": str(e)}
+
+    tasks = [asyncio.ensure_future(solve_one(i, state)) for i, state in enumerate(states)]
+    try:
+        if ordered:
+            for task in tasks:
+                yield await task
+        else:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,169 @@
+"""
+魔方状态的小块级校验
+
+识别错误产生的不可能状态（颜色数量不对、角块被拧、棱块被翻、奇偶性错误、
+重复小块等）如果直接交给 twophase，会耗尽整个搜索时间后才报错。
+本模块把 54 贴纸编码分解为 8 个角块和 12 个棱块，在几十微秒内完成全部检查，
+并返回指明问题小块的结构化原因，非法状态不会进入求解进程池。
+
+小块与贴纸的对应关系、方向定义与 twophase（Kociemba）一致:
+  - 角块方向 = U/D 色贴纸在该位置三个贴纸中的序号，合法状态下总和为 3 的倍数
+  - 棱块方向 = 颜色顺序是否与参考顺序相反，合法状态下总和为偶数
+  - 角块排列与棱块排列的奇偶性必须相同
+"""
+
+FACES = "URFDLB"
+
+# 角块位置名及其三个贴纸下标（第一个为 U/D 面贴纸，其余按顺时针）
+CORNER_NAMES = ["URF", "UFL", "ULB", "UBR", "DFR", "DLF", "DBL", "DRB"]
+CORNER_FACELETS = [
+    (8, 9, 20), (6, 18, 38), (0, 36, 47), (2, 45, 11),
+    (29, 26, 15), (27, 44, 24), (33, 53, 42), (35, 17, 51),
+]
+
+# 棱块位置名及其两个贴纸下标
+EDGE_NAMES = ["UR", "UF", "UL", "UB", "DR", "DF", "DL", "DB", "FR", "FL", "BL", "BR"]
+EDGE_FACELETS = [
+    (5, 10), (7, 19), (3, 37), (1, 46), (32, 16), (28, 25),
+    (30, 43), (34, 52), (23, 12), (21, 41), (50, 39), (48, 14),
+]
+
+CENTER_FACELETS = {face: 9 * i + 4 for i, face in enumerate(FACES)}
+
+# 颜色元组（从参考方向读取） -> 小块编号
+_CORNER_LOOKUP = {name: i for i, name in enumerate(CORNER_NAMES)}
+_EDGE_LOOKUP = {name: i for i, name in enumerate(EDGE_NAMES)}
+
+
+class InvalidCubeStateError(ValueError):
+    """魔方状态非法，reason 为结构化原因"""
+
+    def __init__(self, reason: dict):
+        super().__init__(reason["message"])
+        self.reason = reason
+
+
+def _reason(code, message, **details):
+    return {"code": code, "message": message, **details}
+
+
+def _permutation_parity(perm):
+    """置换奇偶性（逆序数模 2）"""
+    parity = 0
+    for i in range(len(perm)):
+        for j in range(i + 1, len(perm)):
+            if perm[i] > perm[j]:
+                parity ^= 1
+    return parity
+
+
+def _read_corner(state, slot):
+    """识别角块位置 slot 上的小块，返回 (小块编号, 方向)；不存在的小块返回 (None, 颜色)"""
+    colors = [state[i] for i in CORNER_FACELETS[slot]]
+    for ori in range(3):
+        if colors[ori] in "UD":
+            name = colors[ori] + colors[(ori + 1) % 3] + colors[(ori + 2) % 3]
+            piece = _CORNER_LOOKUP.get(name)
+            if piece is not None:
+                return piece, ori
+            break
+    return None, ''.join(colors)
+
+
+def _read_edge(state, slot):
+    """识别棱块位置 slot 上的小块，返回 (小块编号, 方向)；不存在的小块返回 (None, 颜色)"""
+    a, b = (state[i] for i in EDGE_FACELETS[slot])
+    if a + b in _EDGE_LOOKUP:
+        return _EDGE_LOOKUP[a + b], 0
+    if b + a in _EDGE_LOOKUP:
+        return _EDGE_LOOKUP[b + a], 1
+    return None, a + b
+
+
+def check_cube_state(kociemba_code: str):
+    """对 Kociemba 编码做完整的小块级校验。
+
+    Args:
+        kociemba_code: 54 字符 Kociemba 编码
+
+    Returns:
+        dict | None: 合法时返回 None；否则返回 {"code", "message", ...}，
+        code 取值: length / invalid_color / center / color_count / invalid_piece /
+        duplicate_piece / corner_twist / edge_flip / parity
+    """
+    if len(kociemba_code) != 54:
+        return _reason("length", f"长度错误: {len(kociemba_code)} / 54", length=len(kociemba_code))
+
+    for i, c in enumerate(kociemba_code):
+        if c not in FACES:
+            return _reason("invalid_color", f"第 {i} 个贴纸颜色无法识别: {c}", facelet=i)
+
+    for face, index in CENTER_FACELETS.items():
+        if kociemba_code[index] != face:
+            return _reason("center", f"{face} 面中心错误，应为 {face}，检测为 {kociemba_code[index]}",
+                           face=face, found=kociemba_code[index])
+
+    for face in FACES:
+        count = kociemba_code.count(face)
+        if count != 9:
+            return _reason("color_count", f"{face} 色贴纸数量为 {count}，应为 9", color=face, count=count)
+
+    corner_perm, corner_twist = [], []
+    seen = {}
+    for slot in range(8):
+        piece, ori = _read_corner(kociemba_code, slot)
+        if piece is None:
+            return _reason("invalid_piece", f"{CORNER_NAMES[slot]} 位置的角块颜色组合 {ori} 不存在",
+                           cubie=CORNER_NAMES[slot], colors=ori)
+        if piece in seen:
+            return _reason("duplicate_piece",
+                           f"角块 {CORNER_NAMES[piece]} 同时出现在 {seen[piece]} 和 {CORNER_NAMES[slot]}",
+                           cubie=CORNER_NAMES[slot], piece=CORNER_NAMES[piece])
+        seen[piece] = CORNER_NAMES[slot]
+        corner_perm.append(piece)
+        corner_twist.append(ori)
+
+    edge_perm, edge_flip = [], []
+    seen = {}
+    for slot in range(12):
+        piece, ori = _read_edge(kociemba_code, slot)
+        if piece is None:
+            return _reason("invalid_piece", f"{EDGE_NAMES[slot]} 位置的棱块颜色组合 {ori} 不存在",
+                           cubie=EDGE_NAMES[slot], colors=ori)
+        if piece in seen:
+            return _reason("duplicate_piece",
+                           f"棱块 {EDGE_NAMES[piece]} 同时出现在 {seen[piece]} 和 {EDGE_NAMES[slot]}",
+                           cubie=EDGE_NAMES[slot], piece=EDGE_NAMES[piece])
+        seen[piece] = EDGE_NAMES[slot]
+        edge_perm.append(piece)
+        edge_flip.append(ori)
+
+    if sum(corner_twist) % 3 != 0:
+        twisted = [CORNER_NAMES[i] for i, t in enumerate(corner_twist) if t]
+        return _reason("corner_twist", f"角块方向总和不为 3 的倍数（被拧的角块: {', '.join(twisted)}）",
+                       cubie=twisted[-1], cubies=twisted, twist_sum=sum(corner_twist))
+
+    if sum(edge_flip) % 2 != 0:
+        flipped = [EDGE_NAMES[i] for i, f in enumerate(edge_flip) if f]
+        return _reason("edge_flip", f"棱块方向总和为奇数（被翻的棱块: {', '.join(flipped)}）",
+                       cubie=flipped[-1], cubies=flipped, flip_sum=sum(edge_flip))
+
+    if _permutation_parity(corner_perm) != _permutation_parity(edge_perm):
+        return _reason("parity", "角块与棱块排列奇偶性不一致（相当于两个小块被对调）")
+
+    return None
+
+
+def validate_cube_state(kociemba_code: str) -> str:
+    """校验状态，非法时抛出 InvalidCubeStateError。
+
+    Returns:
+        str: 原样返回合法的编码，便于链式调用
+
+    Raises:
+        InvalidCubeStateError: 状态非法
+    """
+    reason = check_cube_state(kociemba_code)
+    if reason is not None:
+        raise InvalidCubeStateError(reason)
+    return kociemba_code
@@ -0,0 +1,226 @@
+"""
+识别调试图（检测框叠加图）管理
+
+识别热路径上不再为每个面复制图像、画框并同步写盘，调试图由模式控制:
+  - off:       不保留任何调试信息
+  - sampled:   按 CUBE_DEBUG_SAMPLE_RATE 抽样，抽中的面在后台线程画框并写入会话目录
+  - on_demand: 在内存中保留缩小后的图像副本（长边不超过 CUBE_DEBUG_MAX_SIDE）与检测结果，
+               按会话 LRU 淘汰，总字节数不超过 CUBE_DEBUG_MAX_BYTES，
+               由 GET /api/session/{session_id}/debug/{face} 请求时再渲染
+
+写盘统一经过后台写线程，文件放在各自会话的 cube_results/{session_id}/debug_steps/ 下，
+没有 session_id 的识别（命令行）写入 cube_results/debug_steps/，并发会话之间不会互相覆盖。
+
+配置（环境变量）:
+  CUBE_DEBUG_OVERLAY       off / sampled / on_demand，默认 on_demand
+  CUBE_DEBUG_SAMPLE_RATE   sampled 模式的抽样比例，默认 0.01
+  CUBE_DEBUG_MAX_SESSIONS  on_demand 模式最多保留的会话数，默认 16
+  CUBE_DEBUG_MAX_BYTES     on_demand 模式保留图像的总字节数上限，默认 64MB
+  CUBE_DEBUG_MAX_SIDE      on_demand 模式保留图像的长边上限（像素），默认 640
+
+命令行排查时可用 CUBE_DEBUG_OVERLAY=sampled CUBE_DEBUG_SAMPLE_RATE=1 保存每个面的调试图。
+"""
+
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+# ================= 配置区 =================
+
+DEBUG_OVERLAY_MODE = os.environ.get("CUBE_DEBUG_OVERLAY", "on_demand").lower()
+DEBUG_SAMPLE_RATE = float(os.environ.get("CUBE_DEBUG_SAMPLE_RATE", 0.01))
+DEBUG_MAX_SESSIONS = int(os.environ.get("CUBE_DEBUG_MAX_SESSIONS", 16))
+DEBUG_MAX_BYTES = int(os.environ.get("CUBE_DEBUG_MAX_BYTES", 64 * 2 ** 20))
+DEBUG_MAX_SIDE = int(os.environ.get("CUBE_DEBUG_MAX_SIDE", 640))
+
+DEBUG_MODES = ("off", "sampled", "on_demand")
+
+# 面标识 -> 文件名（与 image_utils.FACE_TO_FILENAME 一致）
+_FACE_TO_FILENAME = {'U': 'white', 'R': 'red', 'F': 'green', 'D': 'yellow', 'L': 'orange', 'B': 'blue'}
+
+# 没有 session_id 时使用的会话键
+_NO_SESSION = ""
+
+_recorder = None
+_recorder_lock = threading.Lock()
+
+
+def draw_debug_boxes(img, stickers):
+    """在图像副本上画出检测框与颜色标签"""
+    debug_img = img.copy()
+    for s in stickers:
+        x1, y1, x2, y2 = s['box']
+        color = s['color']
+        cv2.rectangle(debug_img, (x1, y1), (x2, y2), (0, 255, 0), 2)
+        cv2.putText(debug_img, color, (x1, y1 - 5),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+    return debug_img
+
+
+def _downscale(img, stickers, max_side: int):
+    """缩小到长边不超过 max_side 的图像副本（不引用调用方的数组），检测框按同样比例缩放"""
+    h, w = img.shape[:2]
+    scale = min(1.0, max_side / max(h, w))
+    if scale == 1.0:
+        return img.copy(), list(stickers)
+    small = cv2.resize(img, (max(1, round(w * scale)), max(1, round(h * scale))), interpolation=cv2.INTER_AREA)
+    scaled = [{**s, 'box': tuple(int(v * scale) for v in s['box'])} for s in stickers]
+    return small, scaled
+
+
+def debug_filename(face_name: str, sticker_count: int) -> str:
+    """调试图文件名；数量不对时标记为 partial，方便查看"""
+    suffix = "_partial" if sticker_count != 9 else "_ok"
+    return f"{face_name}{suffix}.jpg"
+
+
+class DebugOverlayRecorder:
+    """按模式记录识别调试信息，并负责调试图的延迟渲染与后台写盘"""
+
+    def __init__(self, mode: str = DEBUG_OVERLAY_MODE, sample_rate: float = DEBUG_SAMPLE_RATE,
+                 max_sessions: int = DEBUG_MAX_SESSIONS, default_dir: str = None,
+                 max_bytes: int = DEBUG_MAX_BYTES, max_side: int = DEBUG_MAX_SIDE):
+        if mode not in DEBUG_MODES:
+            raise ValueError(f"不支持的调试图模式: {mode}（可选: {', '.join(DEBUG_MODES)}）")
+        self.mode = mode
+        self.sample_rate = sample_rate
+        self.max_sessions = max_sessions
+        self.default_dir = default_dir
+        self.max_bytes = max_bytes
+        self.max_side = max_side
+
+        self._sessions = OrderedDict()  # session_id -> {face_name: record}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._writer = None
+        self._written = 0
+        self._write_errors = 0
+
+    # ---------- 记录 ----------
+
+    def record(self, session_id, face_name: str, img, stickers):
+        """识别完成一个面后调用；off 模式下无任何开销"""
+        if self.mode == "off":
+            return None
+        if self.mode == "sampled":
+            if random.random() < self.sample_rate:
+                return self.write_async(session_id, face_name, img, stickers)
+            return None
+
+        small, scaled = _downscale(img, stickers, self.max_side)
+        key = session_id or _NO_SESSION
+        with self._lock:
+            faces = self._sessions.pop(key, {})
+            replaced = faces.pop(face_name, None)
+            if replaced is not None:
+                self._bytes -= replaced["image"].nbytes
+            faces[face_name] = {"image": small, "stickers": scaled, "created_at": time.time()}
+            self._bytes += small.nbytes
+            self._sessions[key] = faces
+            # 先按会话数、再按总字节数淘汰最久未用的会话（当前会话至少保留最新的一面）
+            while len(self._sessions) > self.max_sessions or (self._bytes > self.max_bytes and len(self._sessions) > 1):
+                self._evict(self._sessions.popitem(last=False)[1])
+            while self._bytes > self.max_bytes and len(faces) > 1:
+                self._bytes -= faces.pop(next(iter(faces)))["image"].nbytes
+        return None
+
+    def _evict(self, faces: dict):
+        self._bytes -= sum(entry["image"].nbytes for entry in faces.values())
+
+    def get(self, session_id, face: str):
+        """取出某个面的记录（face 可以是面标识 U/R/... 或文件名 white/red/...）"""
+        face_name = _FACE_TO_FILENAME.get(face, face)
+        with self._lock:
+            faces = self._sessions.get(session_id or _NO_SESSION)
+            return faces.get(face_name) if faces else None
+
+    def faces(self, session_id) -> list:
+        """某个会话已记录的面（文件名）"""
+        with self._lock:
+            return list(self._sessions.get(session_id or _NO_SESSION, {}))
+
+    def drop(self, session_id) -> None:
+        """会话销毁时丢弃其调试记录"""
+        with self._lock:
+            self._evict(self._sessions.pop(session_id or _NO_SESSION, {}))
+
+    # ---------- 渲染与写盘 ----------
+
+    def render(self, session_id, face: str, quality: int = 90):
+        """渲染调试图为 JPEG 字节；没有记录时返回 None"""
+        entry = self.get(session_id, face)
+        if entry is None:
+            return None
+        ok, buf = cv2.imencode(".jpg", draw_debug_boxes(entry["image"], entry["stickers"]),
+                               [cv2.IMWRITE_JPEG_QUALITY, quality])
+        return buf.tobytes() if ok else None
+
+    def _output_dir(self, session_id):
+        if session_id:
+            from session_manager import get_session_dir
+            return os.path.join(get_session_dir(session_id)["results_dir"], "debug_steps")
+        return self.default_dir
+
+    def _write(self, session_id, face_name, img, stickers):
+        try:
+            output_dir = self._output_dir(session_id)
+            if not output_dir:
+                return None
+            os.makedirs(output_dir, exist_ok=True)
+            path = os.path.join(output_dir, debug_filename(face_name, len(stickers)))
+            cv2.imwrite(path, draw_debug_boxes(img, stickers))
+            self._written += 1
+            return path
+        except Exception as e:
+            self._write_errors += 1
+            print(f"⚠️ 调试图保存失败 {face_name}: {e}")
+            return None
+
+    def write_async(self, session_id, face_name: str, img, stickers):
+        """在后台写线程中画框并保存到会话目录，返回 Future（结果为文件路径）"""
+        with self._lock:
+            if self._writer is None:
+                self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="debug-writer")
+        return self._writer.submit(self._write, session_id, face_name, img, list(stickers))
+
+    def stats(self) -> dict:
+        with self._lock:
+            sessions, held = len(self._sessions), self._bytes
+        return {
+            "mode": self.mode,
+            "sample_rate": self.sample_rate,
+            "sessions": sessions,
+            "bytes": held,
+            "written": self._written,
+            "write_errors": self._write_errors,
+        }
+
+    def shutdown(self):
+        if self._writer is not None:
+            self._writer.shutdown(wait=True)
+            self._writer = None
+
+
+def get_debug_recorder(default_dir: str = None) -> DebugOverlayRecorder:
+    """获取全局调试图记录器（延迟初始化）"""
+    global _recorder
+    with _recorder_lock:
+        if _recorder is None:
+            _recorder = DebugOverlayRecorder(default_dir=default_dir)
+        elif default_dir and not _recorder.default_dir:
+            _recorder.default_dir = default_dir
+        return _recorder
+
+
+def shutdown_debug_recorder():
+    """服务关闭时等待后台写线程完成"""
+    global _recorder
+    with _recorder_lock:
+        if _recorder is not None:
+            _recorder.shutdown()
+            _recorder = None
@@ -0,0 +1,119 @@
+"""
+贴纸检测结果缓存
+
+用户经常重复提交同样的照片（网络抖动后的重试、只改了一面的重新扫描、前端重复提交），
+每次都会对六个面重新执行 YOLO。缓存以解码后图像像素的哈希为键，
+同时带上模型版本与推理参数（imgsz / conf / iou），保存筛选后的贴纸列表与 3x3 颜色矩阵，
+只有发生变化的面才需要推理。
+
+键使用 BLAKE2b（128 位），640x480 的图像约 1ms；内存层为条目数受限的 LRU。
+
+配置（环境变量）:
+  CUBE_DETECTION_CACHE_SIZE  最多缓存的面数，默认 1024；0 表示关闭缓存
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+# ================= 配置区 =================
+
+DETECTION_CACHE_SIZE = int(os.environ.get("CUBE_DETECTION_CACHE_SIZE", 1024))
+
+_cache_instance = None
+_cache_lock = threading.Lock()
+
+
+def model_fingerprint(model_path: str) -> str:
+    """模型版本标识：文件名 + 大小 + 修改时间（目录形式的模型取目录本身），替换模型文件后缓存自动失效"""
+    try:
+        st = os.stat(model_path)
+        return f"{os.path.basename(model_path)}:{st.st_size}:{int(st.st_mtime)}"
+    except OSError:
+        return os.path.basename(model_path or "")
+
+
+def image_key(img, model_version: str, params) -> str:
+    """图像内容 + 形状 + 模型版本 + 推理参数的哈希键"""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr((img.shape, str(img.dtype), model_version, tuple(params))).encode())
+    h.update(memoryview(img if img.flags.c_contiguous else img.copy()).cast("B"))
+    return h.hexdigest()
+
+
+class DetectionCache:
+    """检测结果的内存 LRU 缓存（线程安全）。"""
+
+    def __init__(self, max_size: int = DETECTION_CACHE_SIZE):
+        self.max_size = max_size
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def get(self, key: str):
+        """查询缓存。
+
+        Returns:
+            tuple | None: (贴纸列表, 3x3 颜色矩阵) 的副本；未命中返回 None
+        """
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+
+        stickers, matrix = entry
+        return [dict(s) for s in stickers], [row[:] for row in matrix]
+
+    def put(self, key: str, stickers, matrix):
+        """写入一个面的检测结果，超过容量时淘汰最久未使用的条目"""
+        if not self.enabled:
+            return
+
+        entry = ([dict(s) for s in stickers], [row[:] for row in matrix])
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """返回命中统计。"""
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "enabled": self.enabled,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "hit_rate": round(self._hits / total, 4) if total else 0.0,
+            }
+
+
+def get_detection_cache() -> DetectionCache:
+    """获取全局唯一的检测结果缓存（延迟初始化）。"""
+    global _cache_instance
+    with _cache_lock:
+        if _cache_instance is None:
+            _cache_instance = DetectionCache()
+        return _cache_instance
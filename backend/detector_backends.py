@@ -0,0 +1,287 @@
+"""
+贴纸检测模型的推理后端
+
+所有后端提供同一个接口:
+  predict(images, imgsz, conf, iou) -> 每张图片一个 (K, 6) 数组: x1, y1, x2, y2, conf, cls
+坐标为原图像素坐标，CubeDetector._parse_detections 直接消费该数组。
+
+可选后端:
+  - pytorch:  ultralytics YOLO 加载 best.pt（默认，开发环境 / GPU）
+  - onnx:     ONNX Runtime CPUExecutionProvider 加载导出的 best.onnx
+  - openvino: OpenVINO CPU 插件加载导出的 best_openvino_model/
+
+onnx / openvino 不依赖 torch，前后处理（letterbox、解码、NMS）在本模块用
+NumPy + OpenCV 实现，与 ultralytics 的 agnostic NMS 行为一致。
+模型导出与一致性校验见 export_detector.py。
+
+配置（环境变量）:
+  CUBE_DETECTOR_BACKEND  pytorch / onnx / openvino，默认 pytorch
+  CUBE_DETECTOR_MODEL    models/ 下的模型文件名，默认按后端取 best.pt / best.onnx / best_openvino_model
+  CUBE_DETECTOR_THREADS  每个模型副本的推理线程数，默认 0（由运行时决定；多副本时见 detector_pool）
+  CUBE_DETECTOR_PRECISION fp32 / int8，默认 fp32；int8 使用 quantize_detector.py 生成的量化模型（仅 onnx 后端）
+"""
+
+import os
+from abc import ABC, abstractmethod
+
+import cv2
+import numpy as np
+
+# ================= 配置区 =================
+
+DETECTOR_BACKEND = os.environ.get("CUBE_DETECTOR_BACKEND", "pytorch").lower()
+DETECTOR_MODEL = os.environ.get("CUBE_DETECTOR_MODEL", "")
+DETECTOR_THREADS = int(os.environ.get("CUBE_DETECTOR_THREADS", 0))
+DETECTOR_PRECISION = os.environ.get("CUBE_DETECTOR_PRECISION", "fp32").lower()
+
+DEFAULT_MODEL_FILES = {
+    "pytorch": "best.pt",
+    "onnx": "best.onnx",
+    "openvino": "best_openvino_model",
+}
+
+# INT8 量化模型（由 quantize_detector.py 生成）
+QUANTIZED_MODEL_FILES = {
+    "onnx": "best_int8.onnx",
+}
+
+PRECISIONS = ("fp32", "int8")
+
+# letterbox 填充色，与 ultralytics 一致
+_PAD_VALUE = 114
+# 单张图片最多保留的检测框数，与 ultralytics 的 max_det 默认值一致
+_MAX_DET = 300
+
+
+# ================= 前后处理 =================
+
+def letterbox(img: np.ndarray, size: int):
+    """等比缩放并居中填充到 size x size。
+
+    Returns:
+        tuple: (填充后的图像, 缩放比例, (左侧填充, 顶部填充))
+    """
+    h, w = img.shape[:2]
+    scale = min(size / h, size / w)
+    new_w, new_h = int(round(w * scale)), int(round(h * scale))
+    if (new_w, new_h) != (w, h):
+        img = cv2.resize(img, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+
+    dw, dh = (size - new_w) / 2, (size - new_h) / 2
+    top, bottom = int(round(dh - 0.1)), int(round(dh + 0.1))
+    left, right = int(round(dw - 0.1)), int(round(dw + 0.1))
+    padded = cv2.copyMakeBorder(img, top, bottom, left, right, cv2.BORDER_CONSTANT,
+                                value=(_PAD_VALUE, _PAD_VALUE, _PAD_VALUE))
+    return padded, scale, (left, top)
+
+
+def preprocess_batch(images, size: int):
+    """BGR 图像列表 -> (N, 3, size, size) float32 RGB 张量，以及每张图片的还原参数"""
+    batch = np.empty((len(images), 3, size, size), dtype=np.float32)
+    metas = []
+    for i, img in enumerate(images):
+        padded, scale, pad = letterbox(img, size)
+        batch[i] = padded[:, :, ::-1].transpose(2, 0, 1) / 255.0
+        metas.append((scale, pad, img.shape[:2]))
+    return batch, metas
+
+
+def postprocess(output: np.ndarray, metas, conf: float, iou: float) -> list:
+    """解码 YOLOv8 检测头输出并做类别无关的 NMS。
+
+    Args:
+        output: (N, 4 + 类别数, 候选框数)，前 4 行为 letterbox 坐标系下的 cx, cy, w, h
+        metas: preprocess_batch 返回的还原参数
+        conf: 置信度阈值
+        iou: NMS 的 IoU 阈值
+
+    Returns:
+        list: 每张图片一个 (K, 6) float32 数组: x1, y1, x2, y2, conf, cls（原图坐标）
+    """
+    results = []
+    for pred, (scale, (pad_x, pad_y), (h, w)) in zip(output, metas):
+        pred = pred.T
+        scores = pred[:, 4:]
+        cls = scores.argmax(axis=1)
+        best = scores[np.arange(len(scores)), cls]
+        keep = best > conf
+        if not keep.any():
+            results.append(np.zeros((0, 6), dtype=np.float32))
+            continue
+
+        boxes, best, cls = pred[keep, :4], best[keep], cls[keep]
+        xyxy = np.empty_like(boxes)
+        xyxy[:, 0] = boxes[:, 0] - boxes[:, 2] / 2
+        xyxy[:, 1] = boxes[:, 1] - boxes[:, 3] / 2
+        xyxy[:, 2] = boxes[:, 0] + boxes[:, 2] / 2
+        xyxy[:, 3] = boxes[:, 1] + boxes[:, 3] / 2
+
+        indices = cv2.dnn.NMSBoxes(
+            np.column_stack([xyxy[:, :2], boxes[:, 2:]]).tolist(), best.tolist(), conf, iou
+        )
+        indices = np.array(indices, dtype=np.intp).reshape(-1)[:_MAX_DET]
+
+        xyxy = xyxy[indices]
+        xyxy[:, [0, 2]] = ((xyxy[:, [0, 2]] - pad_x) / scale).clip(0, w)
+        xyxy[:, [1, 3]] = ((xyxy[:, [1, 3]] - pad_y) / scale).clip(0, h)
+        results.append(np.column_stack([xyxy, best[indices], cls[indices]]).astype(np.float32))
+    return results
+
+
+# ================= 后端实现 =================
+
+class UltralyticsBackend:
+    """ultralytics YOLO (PyTorch) 后端"""
+
+    name = "pytorch"
+
+    def __init__(self, model_path: str, threads: int = DETECTOR_THREADS):
+        from ultralytics import YOLO
+
+        # torch 的 intra-op 线程数对整个进程生效，无法按副本设置，由 detector_pool 在进程级设置一次；
+        # threads 参数只为与其他后端保持相同的构造接口
+        self.model_path = model_path
+        self.model = YOLO(model_path)
+
+    def predict(self, images, imgsz=640, conf=0.25, iou=0.6):
+        # ultralytics 会把所有图片 letterbox 到同一尺寸后拼成一个 batch
+        # 开启半精度和尺寸限制，防止显存溢出 (CPU 上 ultralytics 会自动忽略 half)
+        results = self.model.predict(
+            list(images),
+            conf=conf,
+            iou=iou,
+            agnostic_nms=True,
+            verbose=False,
+            imgsz=imgsz,
+            half=True
+        )
+        return [r.boxes.data.cpu().numpy() for r in results]
+
+
+class _TensorBackend(ABC):
+    """输入为 NCHW 张量的运行时的公共逻辑（固定尺寸 / 固定 batch 的模型自动适配）"""
+
+    fixed_size = None
+    fixed_batch = None
+
+    @abstractmethod
+    def _run(self, batch: np.ndarray) -> np.ndarray:
+        """对一个 NCHW float32 批次执行推理，返回模型原始输出"""
+
+    def predict(self, images, imgsz=640, conf=0.25, iou=0.6):
+        if not images:
+            return []
+        size = self.fixed_size or imgsz
+        batch, metas = preprocess_batch(images, size)
+
+        if self.fixed_batch and self.fixed_batch != len(images):
+            step = self.fixed_batch
+            chunks = []
+            for i in range(0, len(batch), step):
+                part = batch[i:i + step]
+                if len(part) < step:
+                    part = np.concatenate([part, np.zeros((step - len(part),) + part.shape[1:], part.dtype)])
+                chunks.append(self._run(part)[:len(batch[i:i + step])])
+            output = np.concatenate(chunks)
+        else:
+            output = self._run(batch)
+        return postprocess(output, metas, conf, iou)
+
+    @staticmethod
+    def _static_dim(value):
+        return value if isinstance(value, int) and value > 0 else None
+
+
+class OnnxBackend(_TensorBackend):
+    """ONNX Runtime CPU 后端"""
+
+    name = "onnx"
+
+    def __init__(self, model_path: str, threads: int = DETECTOR_THREADS):
+        import onnxruntime as ort
+
+        self.model_path = model_path
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads > 0:
+            options.intra_op_num_threads = threads
+        self.model = ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+
+        model_input = self.model.get_inputs()[0]
+        self.input_name = model_input.name
+        batch, _, height, _ = model_input.shape
+        self.fixed_batch = self._static_dim(batch)
+        self.fixed_size = self._static_dim(height)
+
+    def _run(self, batch):
+        return self.model.run(None, {self.input_name: batch})[0]
+
+
+class OpenVinoBackend(_TensorBackend):
+    """OpenVINO CPU 后端"""
+
+    name = "openvino"
+
+    def __init__(self, model_path: str, threads: int = DETECTOR_THREADS):
+        import openvino as ov
+
+        self.model_path = model_path
+        if os.path.isdir(model_path):
+            xml_files = [f for f in os.listdir(model_path) if f.endswith(".xml")]
+            if not xml_files:
+                raise FileNotFoundError(f"❌ {model_path} 中没有 OpenVINO 模型 (.xml)")
+            model_path = os.path.join(model_path, xml_files[0])
+
+        core = ov.Core()
+        config = {"PERFORMANCE_HINT": "LATENCY"}
+        if threads > 0:
+            config["INFERENCE_NUM_THREADS"] = threads
+        network = core.read_model(model_path)
+        self.model = core.compile_model(network, "CPU", config)
+
+        shape = network.input(0).get_partial_shape()
+        self.fixed_batch = shape[0].get_length() if shape[0].is_static else None
+        self.fixed_size = shape[2].get_length() if shape[2].is_static else None
+
+    def _run(self, batch):
+        return self.model(batch)[self.model.output(0)]
+
+
+BACKENDS = {
+    "pytorch": UltralyticsBackend,
+    "onnx": OnnxBackend,
+    "openvino": OpenVinoBackend,
+}
+
+
+def resolve_model_path(models_dir: str, backend: str = DETECTOR_BACKEND, model: str = DETECTOR_MODEL,
+                       precision: str = DETECTOR_PRECISION) -> str:
+    """按后端、精度与配置得到模型文件的完整路径（显式指定的 model 优先）"""
+    if backend not in BACKENDS:
+        raise ValueError(f"不支持的检测后端: {backend}（可选: {', '.join(BACKENDS)}）")
+    if precision not in PRECISIONS:
+        raise ValueError(f"不支持的检测精度: {precision}（可选: {', '.join(PRECISIONS)}）")
+    if model:
+        return os.path.join(models_dir, model)
+    if precision == "int8":
+        if backend not in QUANTIZED_MODEL_FILES:
+            raise ValueError(f"后端 {backend} 没有 INT8 模型（可选: {', '.join(QUANTIZED_MODEL_FILES)}）")
+        return os.path.join(models_dir, QUANTIZED_MODEL_FILES[backend])
+    return os.path.join(models_dir, DEFAULT_MODEL_FILES[backend])
+
+
+def create_backend(models_dir: str, backend: str = DETECTOR_BACKEND, model: str = DETECTOR_MODEL,
+                   precision: str = DETECTOR_PRECISION, threads: int = DETECTOR_THREADS):
+    """创建检测后端
+
+    Raises:
+        ValueError: 后端名称或精度不支持
+        FileNotFoundError: 模型文件不存在
+        ImportError: 对应的运行时未安装
+    """
+    model_path = resolve_model_path(models_dir, backend, model, precision)
+    if not os.path.exists(model_path):
+        raise FileNotFoundError(f"❌ 关键缺失：请将模型 {os.path.basename(model_path)} 放入 {models_dir}")
+
+    print(f"🚀 加载检测模型 [{backend}]: {model_path}")
+    return BACKENDS[backend](model_path, threads=threads)
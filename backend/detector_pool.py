@@ -0,0 +1,195 @@
+"""
+检测模型副本池
+
+FastAPI 的同步端点在线程池中并发执行，多个线程同时调用同一个 ultralytics predictor
+并不安全，同时各自的 torch 线程也会互相争抢 CPU。副本池持有若干个独立加载的检测后端:
+  - 每次 predict 租用一个空闲副本，用完归还；没有空闲副本时排队等待
+  - 每个副本的推理线程数为 CPU 核数 / 副本数（CUBE_DETECTOR_THREADS 可显式指定），
+    各副本的线程数之和不超过核数，吞吐量随副本数线性增长而不会因争抢线程而下降
+  - 副本累计推理 CUBE_DETECTOR_RECYCLE_AFTER 次后被丢弃，下次租用时重新加载，限制长期运行的内存增长
+
+DetectorPool 与单个后端的接口相同（name / model_path / predict），CubeDetector 无需区分。
+
+注意: torch.set_num_threads 对整个进程生效，pytorch 后端无法按副本绑定线程，
+由副本池在启动时把进程级线程数设置一次（多副本时为 CPU 核数 / 副本数），所有副本共用；
+onnx / openvino 后端的线程数按副本各自设置。
+
+配置（环境变量）:
+  CUBE_DETECTOR_REPLICAS        副本数，默认 1
+  CUBE_DETECTOR_RECYCLE_AFTER   副本推理多少次后重新加载，默认 0（不回收）
+  CUBE_DETECTOR_LEASE_TIMEOUT   等待空闲副本的最长时间（秒），默认 30
+"""
+
+import os
+import queue
+import threading
+import time
+
+from detector_backends import DETECTOR_THREADS
+
+# ================= 配置区 =================
+
+DETECTOR_REPLICAS = max(1, int(os.environ.get("CUBE_DETECTOR_REPLICAS", 1)))
+DETECTOR_RECYCLE_AFTER = int(os.environ.get("CUBE_DETECTOR_RECYCLE_AFTER", 0))
+DETECTOR_LEASE_TIMEOUT = float(os.environ.get("CUBE_DETECTOR_LEASE_TIMEOUT", 30))
+
+
+class DetectorBusyError(RuntimeError):
+    """等待空闲副本超时"""
+
+
+def replica_threads(replicas: int, threads: int = DETECTOR_THREADS, cpu_count: int = None) -> int:
+    """每个副本的推理线程数：显式配置优先，多副本时平分 CPU 核数，单副本时为 0（由运行时决定）"""
+    if threads > 0:
+        return threads
+    if replicas <= 1:
+        return 0
+    return max(1, (cpu_count or os.cpu_count() or 1) // replicas)
+
+
+class _Replica:
+    def __init__(self, index, backend):
+        self.index = index
+        self.backend = backend
+        self.inferences = 0
+
+
+class DetectorPool:
+    """检测后端副本池（线程安全）。
+
+    Args:
+        factory: 创建后端的函数，参数为推理线程数，如 lambda threads: create_backend(models_dir, threads=threads)
+        size: 副本数
+        recycle_after: 副本推理多少次后重新加载，0 表示不回收
+        lease_timeout: 等待空闲副本的最长时间（秒）
+        threads: 每个副本的推理线程数，默认按 replica_threads 计算
+    """
+
+    def __init__(self, factory, size: int = DETECTOR_REPLICAS, recycle_after: int = DETECTOR_RECYCLE_AFTER,
+                 lease_timeout: float = DETECTOR_LEASE_TIMEOUT, threads: int = None):
+        self.factory = factory
+        self.size = max(1, size)
+        self.recycle_after = recycle_after
+        self.lease_timeout = lease_timeout
+        self.threads = replica_threads(self.size) if threads is None else threads
+
+        self._idle = queue.LifoQueue()  # 后进先出，负载低时总是复用最近用过的副本
+        self._replicas = [None] * self.size
+        self._lock = threading.Lock()
+        self._leases = 0
+        self._recycled = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+        # 启动时加载全部副本，首个请求不承担加载时间，也能尽早发现模型文件问题
+        if self.size > 1:
+            print(f"[System] 加载 {self.size} 个检测模型副本 (每个 {self.threads or '默认'} 线程)")
+        for index in range(self.size):
+            self._idle.put(self._load(index))
+
+        first = self._replicas[0].backend
+        self.name = first.name
+        self.model_path = first.model_path
+        if self.name == "pytorch":
+            self._configure_torch_threads()
+
+    def _configure_torch_threads(self):
+        """pytorch 后端：进程级设置一次 intra-op 线程数，使所有副本的线程总数不超过核数"""
+        if self.size > 1:
+            print(f"⚠️ pytorch 后端的 {self.size} 个副本共用进程级的 torch 线程池，"
+                  f"按副本绑定线程只对 onnx / openvino 后端生效")
+        if self.threads > 0:
+            import torch
+            torch.set_num_threads(self.threads)
+
+    def _load(self, index):
+        replica = _Replica(index, self.factory(self.threads))
+        with self._lock:
+            self._replicas[index] = replica
+        return replica
+
+    @property
+    def model(self):
+        """任一已加载副本的模型对象（健康检查用）"""
+        with self._lock:
+            for replica in self._replicas:
+                if replica is not None:
+                    return replica.backend.model
+        return None
+
+    def _acquire(self):
+        started = time.perf_counter()
+        try:
+            replica = self._idle.get(timeout=self.lease_timeout)
+        except queue.Empty:
+            with self._lock:
+                self._timeouts += 1
+            raise DetectorBusyError(f"等待检测模型超时（{self.lease_timeout}s），请稍后重试")
+
+        waited = time.perf_counter() - started
+        with self._lock:
+            self._leases += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        if isinstance(replica, int):  # 已回收的副本，在租用者的线程中重新加载
+            try:
+                replica = self._load(replica)
+            except Exception:
+                self._idle.put(replica)  # 加载失败时归还位置，下次租用重试
+                raise
+        return replica
+
+    def _release(self, replica):
+        replica.inferences += 1
+        if self.recycle_after > 0 and replica.inferences >= self.recycle_after:
+            with self._lock:
+                self._replicas[replica.index] = None
+                self._recycled += 1
+            self._idle.put(replica.index)  # 只归还位置，旧副本随引用释放
+            return
+        self._idle.put(replica)
+
+    def predict(self, images, imgsz=640, conf=0.25, iou=0.6):
+        """租用一个副本执行推理，参数与返回值同单个后端的 predict"""
+        replica = self._acquire()
+        try:
+            return replica.backend.predict(images, imgsz=imgsz, conf=conf, iou=iou)
+        finally:
+            self._release(replica)
+
+    def warm_up(self, images, imgsz=640, conf=0.25, iou=0.6) -> list:
+        """同时租用全部副本，各推理一次（首次推理的内存分配、算子选择等不留给真实请求）
+
+        Returns:
+            list: 每个副本的推理耗时（毫秒）
+        """
+        replicas = [self._acquire() for _ in range(self.size)]
+        latencies = []
+        try:
+            for replica in replicas:
+                started = time.perf_counter()
+                replica.backend.predict(images, imgsz=imgsz, conf=conf, iou=iou)
+                latencies.append((time.perf_counter() - started) * 1000)
+        finally:
+            for replica in replicas:
+                self._idle.put(replica)  # 预热不计入推理次数
+        return latencies
+
+    def stats(self) -> dict:
+        """返回副本数、租用次数与等待时间（毫秒）"""
+        with self._lock:
+            return {
+                "replicas": self.size,
+                "threads_per_replica": self.threads,
+                "idle": self._idle.qsize(),
+                "leases": self._leases,
+                "timeouts": self._timeouts,
+                "recycled": self._recycled,
+                "recycle_after": self.recycle_after,
+                "wait_ms": {
+                    "avg": round(self._wait_total / self._leases * 1000, 3) if self._leases else 0.0,
+                    "max": round(self._wait_max * 1000, 3),
+                },
+                "inferences": [r.inferences if r is not None else 0 for r in self._replicas],
+            }
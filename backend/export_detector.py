@@ -0,0 +1,183 @@
+"""
+检测模型导出与一致性校验
+
+把 models/best.pt 导出为 ONNX / OpenVINO 格式，并校验导出后端的检测框
+与 best.pt（ultralytics 后端）在容差内一致，同时报告两者的单张图片延迟。
+
+用法（在 backend 目录下）:
+  python export_detector.py export --format onnx
+  python export_detector.py export --format openvino
+  python export_detector.py verify --backend onnx --images ../yolo_train/raw_images
+  python export_detector.py verify --backend onnx --model best_int8.onnx --tolerance 4
+
+校验规则:
+  - 两边的框按类别相同、IoU 最大贪心配对
+  - 所有框都能配对，且配对框的坐标差不超过 --tolerance 像素、置信度差不超过 --conf-tolerance
+未指定 --images 时使用随机噪声图，只能验证数值一致性，不代表识别效果。
+"""
+
+import argparse
+import glob
+import os
+import shutil
+import statistics
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from detector_backends import create_backend, DEFAULT_MODEL_FILES
+
+MODELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models")
+
+IMAGE_PATTERNS = ("*.jpg", "*.jpeg", "*.png", "*.webp")
+
+
+# ================= 导出 =================
+
+def export_model(image_format: str, imgsz: int = 640, models_dir: str = MODELS_DIR) -> str:
+    """用 ultralytics 导出 best.pt（动态 batch），返回导出文件路径"""
+    from ultralytics import YOLO
+
+    model = YOLO(os.path.join(models_dir, DEFAULT_MODEL_FILES["pytorch"]))
+    exported = model.export(format=image_format, imgsz=imgsz, dynamic=True, simplify=True)
+
+    target = os.path.join(models_dir, DEFAULT_MODEL_FILES[image_format])
+    if os.path.abspath(exported) != os.path.abspath(target):
+        if os.path.isdir(target):
+            shutil.rmtree(target)
+        shutil.move(exported, target)
+    print(f"✅ 已导出: {target}")
+    return target
+
+
+# ================= 校验 =================
+
+def _iou(a, b):
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def match_detections(reference: np.ndarray, candidate: np.ndarray, iou_threshold: float = 0.5):
+    """按置信度从高到低，为每个参考框贪心匹配类别相同、IoU 最大的候选框
+
+    Returns:
+        tuple: (配对下标列表 [(参考, 候选)], 未匹配的参考框下标, 未匹配的候选框下标)
+    """
+    pairs = []
+    used = set()
+    for i in np.argsort(-reference[:, 4]) if len(reference) else []:
+        best, best_iou = None, iou_threshold
+        for j in range(len(candidate)):
+            if j in used or int(candidate[j, 5]) != int(reference[i, 5]):
+                continue
+            overlap = _iou(reference[i], candidate[j])
+            if overlap >= best_iou:
+                best, best_iou = j, overlap
+        if best is not None:
+            used.add(best)
+            pairs.append((int(i), best))
+
+    matched_ref = {i for i, _ in pairs}
+    missing = [i for i in range(len(reference)) if i not in matched_ref]
+    extra = [j for j in range(len(candidate)) if j not in used]
+    return pairs, missing, extra
+
+
+def load_images(images_dir: str = "", limit: int = 0) -> list:
+    """读取目录下的图片；未指定目录时生成随机噪声图"""
+    if not images_dir:
+        rng = np.random.default_rng(0)
+        return [rng.integers(0, 256, size=(640, 480, 3), dtype=np.uint8) for _ in range(limit or 8)]
+
+    paths = sorted(p for pattern in IMAGE_PATTERNS for p in glob.glob(os.path.join(images_dir, pattern)))
+    if limit:
+        paths = paths[:limit]
+    images = [img for img in (cv2.imread(p) for p in paths) if img is not None]
+    if not images:
+        raise FileNotFoundError(f"❌ {images_dir} 中没有可读取的图片")
+    return images
+
+
+def timed_predict(backend, images, imgsz=640):
+    """逐张推理，返回 (结果列表, 每张耗时毫秒列表)"""
+    backend.predict([images[0]], imgsz=imgsz)  # 预热
+    results, latencies = [], []
+    for img in images:
+        t0 = time.perf_counter()
+        results.append(backend.predict([img], imgsz=imgsz)[0])
+        latencies.append((time.perf_counter() - t0) * 1000)
+    return results, latencies
+
+
+def compare_backends(reference, candidate, images, tolerance=2.0, conf_tolerance=0.05, imgsz=640) -> dict:
+    """逐张比较两个后端的检测结果与延迟"""
+    ref_results, ref_latency = timed_predict(reference, images, imgsz)
+    cand_results, cand_latency = timed_predict(candidate, images, imgsz)
+
+    report = {
+        "images": len(images), "reference_boxes": 0, "matched": 0, "missing": 0, "extra": 0,
+        "max_coord_diff": 0.0, "max_conf_diff": 0.0,
+        "reference_ms": statistics.mean(ref_latency), "candidate_ms": statistics.mean(cand_latency),
+    }
+    for ref, cand in zip(ref_results, cand_results):
+        pairs, missing, extra = match_detections(ref, cand)
+        report["reference_boxes"] += len(ref)
+        report["matched"] += len(pairs)
+        report["missing"] += len(missing)
+        report["extra"] += len(extra)
+        for i, j in pairs:
+            report["max_coord_diff"] = max(report["max_coord_diff"], float(np.abs(ref[i, :4] - cand[j, :4]).max()))
+            report["max_conf_diff"] = max(report["max_conf_diff"], float(abs(ref[i, 4] - cand[j, 4])))
+
+    report["passed"] = (report["missing"] == 0 and report["extra"] == 0
+                        and report["max_coord_diff"] <= tolerance and report["max_conf_diff"] <= conf_tolerance)
+    return report
+
+
+def print_report(report: dict, name: str):
+    print(f"图片数: {report['images']}  参考框: {report['reference_boxes']}  配对: {report['matched']}  "
+          f"漏检: {report['missing']}  多检: {report['extra']}")
+    print(f"最大坐标差: {report['max_coord_diff']:.2f}px  最大置信度差: {report['max_conf_diff']:.4f}")
+    print(f"单张延迟: best.pt {report['reference_ms']:.1f}ms  {name} {report['candidate_ms']:.1f}ms  "
+          f"(x{report['reference_ms'] / report['candidate_ms']:.2f})")
+    print("✅ 校验通过" if report["passed"] else "❌ 校验未通过")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="检测模型导出与一致性校验")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = sub.add_parser("export", help="导出 best.pt")
+    export_parser.add_argument("--format", choices=["onnx", "openvino"], default="onnx")
+    export_parser.add_argument("--imgsz", type=int, default=640)
+
+    verify_parser = sub.add_parser("verify", help="校验导出模型与 best.pt 一致")
+    verify_parser.add_argument("--backend", choices=["onnx", "openvino"], default="onnx")
+    verify_parser.add_argument("--model", default="", help="models/ 下的模型文件名，默认按后端取")
+    verify_parser.add_argument("--images", default="", help="校验图片目录")
+    verify_parser.add_argument("--limit", type=int, default=0, help="最多使用的图片数")
+    verify_parser.add_argument("--tolerance", type=float, default=2.0, help="坐标容差（像素）")
+    verify_parser.add_argument("--conf-tolerance", type=float, default=0.05, help="置信度容差")
+    verify_parser.add_argument("--imgsz", type=int, default=640)
+
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_model(args.format, imgsz=args.imgsz)
+        return 0
+
+    reference = create_backend(MODELS_DIR, backend="pytorch", model="", precision="fp32")
+    candidate = create_backend(MODELS_DIR, backend=args.backend, model=args.model)
+    images = load_images(args.images, args.limit)
+    report = compare_backends(reference, candidate, images, args.tolerance, args.conf_tolerance, args.imgsz)
+    print_report(report, args.model or args.backend)
+    return 0 if report["passed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
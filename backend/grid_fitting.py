@@ -0,0 +1,258 @@
+"""
+贴纸网格拟合
+
+把一面检测到的贴纸中心（至多 9 个）对应到 3x3 格子。原先按检测点的包围盒等分，
+透视变形时中间行列会错位，缺少一整行/列时剩下的点会被拉伸到整个网格。
+
+本模块对一面或多面同时处理（贴纸中心打包为 (F, 9, 2) 数组 + 有效掩码）:
+  1. 晶格估计（向量化）：最近邻距离的中位数为格距，最近邻方向 4θ 的圆周平均为旋转角，
+     中心坐标旋转、按格距归一化后，用圆周平均求晶格相位，取整得到行列序号；
+     行列跨度不足 3 时（缺一整行/列），用图像中心所在的格子确定缺的是哪一边
+  2. 一一对应：scipy.optimize.linear_sum_assignment 以到格点的距离为代价分配格子
+  3. 精化（向量化）：对已分配的点批量 DLT 拟合单应矩阵（点数不足或共线时用相似变换），
+     把 9 个格点投影回图像，按投影位置重新分配；缺失格子的位置也由投影给出
+
+CubeDetector 通过 fill_matrices 使用本模块；与旧算法的吞吐量与填充正确率对比见
+benchmarks/bench_grid_fitting.py。
+"""
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+# 格点坐标 (列, 行)，行优先
+CELL_COORDS = np.array([(col, row) for row in range(3) for col in range(3)], dtype=np.float64)
+
+# 精化轮数
+_REFINE_ITERATIONS = 2
+# 只有 1 个点时，格距按贴纸框边长的倍数估计
+_PITCH_PER_BOX = 1.25
+
+
+def _circular_mean(values, weights, period):
+    """按周期求加权圆周平均，返回 (-period/2, period/2] 内的值"""
+    phase = 2 * np.pi * values / period
+    s = (np.sin(phase) * weights).sum(axis=-1)
+    c = (np.cos(phase) * weights).sum(axis=-1)
+    return np.arctan2(s, c) * period / (2 * np.pi)
+
+
+def _rotate(points, angle):
+    """把 (F, N, 2) 的点按每面的角度 (F,) 旋转"""
+    cos, sin = np.cos(angle)[:, None], np.sin(angle)[:, None]
+    x, y = points[..., 0], points[..., 1]
+    return np.stack([x * cos - y * sin, x * sin + y * cos], axis=-1)
+
+
+def estimate_lattice(centers, mask, box_sizes=None):
+    """估计每面的格距与旋转角。
+
+    Args:
+        centers: (F, 9, 2) 贴纸中心
+        mask: (F, 9) 有效掩码
+        box_sizes: 可选 (F, 9) 贴纸框边长，只有 1 个点的面用来估计格距
+
+    Returns:
+        tuple: (格距 (F,), 旋转角 (F,)，弧度，范围 (-45°, 45°])
+    """
+    diff = centers[:, None, :, :] - centers[:, :, None, :]  # [f, i, j] = c_j - c_i
+    dist = np.hypot(diff[..., 0], diff[..., 1])
+    valid = mask[:, :, None] & mask[:, None, :] & ~np.eye(centers.shape[1], dtype=bool)
+    dist = np.where(valid, dist, np.inf)
+
+    nearest = dist.argmin(axis=2)
+    nn_dist = np.take_along_axis(dist, nearest[..., None], axis=2)[..., 0]
+    has_nn = np.isfinite(nn_dist)
+    vec = np.take_along_axis(diff, nearest[..., None, None].repeat(2, axis=-1), axis=2)[:, :, 0]
+
+    # 按行求有效最近邻距离的中位数（无效值为 inf，排序后位于末尾）
+    ordered = np.sort(nn_dist, axis=1)
+    count = has_nn.sum(axis=1)
+    low = np.take_along_axis(ordered, np.maximum(count - 1, 0)[:, None] // 2, axis=1)[:, 0]
+    high = np.take_along_axis(ordered, (count // 2)[:, None], axis=1)[:, 0]
+    pitch = np.where(count > 0, (low + high) / 2, np.nan)
+    if box_sizes is not None:
+        box_count = mask.sum(axis=1)
+        box_mean = np.where(mask, box_sizes, 0).sum(axis=1) / np.maximum(box_count, 1)
+        pitch = np.where(np.isfinite(pitch), pitch, _PITCH_PER_BOX * box_mean)
+    pitch = np.where(np.isfinite(pitch) & (pitch > 0), pitch, 1.0)
+
+    theta = np.arctan2(vec[..., 1], vec[..., 0])
+    angle = _circular_mean(theta, has_nn.astype(np.float64), np.pi / 2)
+    return pitch, angle
+
+
+def _initial_cells(centers, mask, pitch, angle, image_sizes):
+    """晶格坐标 (F, 9, 2)：已平移到 0..2 的格子坐标系（连续值），以及相似变换参数"""
+    weights = mask.astype(np.float64)
+    count = np.maximum(weights.sum(axis=1), 1)
+    centroid = (centers * weights[..., None]).sum(axis=1) / count[:, None]
+
+    u = _rotate(centers - centroid[:, None, :], -angle) / pitch[:, None, None]
+    phase = np.stack([_circular_mean(u[..., k], weights, 1.0) for k in range(2)], axis=-1)
+    index = np.round(u - phase[:, None, :])
+
+    big = 1e9
+    lo = -np.where(mask[..., None], index, big).min(axis=1)
+    hi = 2 - np.where(mask[..., None], index, -big).max(axis=1)
+    offset = lo
+    if image_sizes is not None:
+        image_center = np.asarray(image_sizes, dtype=np.float64)[:, ::-1] / 2  # (h, w) -> (x, y)
+        cu = _rotate((image_center - centroid)[:, None, :], -angle)[:, 0] / pitch[:, None]
+        preferred = 1 - np.round(cu - phase)
+        offset = np.where(lo <= hi, np.clip(preferred, lo, np.maximum(lo, hi)), lo)
+    offset = np.where(mask.any(axis=1)[:, None], offset, 0)
+
+    cells = u - phase[:, None, :] + offset[:, None, :]
+    return cells, (centroid, phase - offset)
+
+
+def _assign(cost, mask):
+    """逐面一一分配：cost (F, 9, 9)，返回每个检测点的格子下标 (F, 9)，无效点为 -1"""
+    assignment = np.full(mask.shape, -1, dtype=np.int64)
+    for f in range(len(cost)):
+        rows = np.flatnonzero(mask[f])
+        if len(rows):
+            r, c = linear_sum_assignment(cost[f, rows])
+            assignment[f, rows[r]] = c
+    return assignment
+
+
+def _fit_homographies(assignment, centers, pitch):
+    """批量 DLT 拟合格点 -> 图像的单应矩阵 (F, 3, 3)，以及每面拟合是否可用"""
+    valid = assignment >= 0
+    grid = CELL_COORDS[np.where(valid, assignment, 0)]  # (F, 9, 2)
+
+    # Hartley 归一化，避免图像坐标量级造成的病态
+    weights = valid.astype(np.float64)
+    count = np.maximum(weights.sum(axis=1), 1)
+    origin = (centers * weights[..., None]).sum(axis=1) / count[:, None]
+    scale = 1.0 / pitch
+    img = (centers - origin[:, None, :]) * scale[:, None, None]
+
+    x, y = grid[..., 0], grid[..., 1]
+    u, v = img[..., 0], img[..., 1]
+    zeros, ones = np.zeros_like(x), np.ones_like(x)
+    rows_u = np.stack([-x, -y, -ones, zeros, zeros, zeros, u * x, u * y, u], axis=-1)
+    rows_v = np.stack([zeros, zeros, zeros, -x, -y, -ones, v * x, v * y, v], axis=-1)
+    a = np.concatenate([rows_u, rows_v], axis=1) * np.concatenate([weights, weights], axis=1)[..., None]
+
+    _, singular, vt = np.linalg.svd(a)
+    h = vt[:, -1, :].reshape(-1, 3, 3)
+
+    # 还原归一化: H = T^-1 @ Hn，T 为图像坐标的平移缩放
+    denorm = np.zeros((len(h), 3, 3))
+    denorm[:, 0, 0] = denorm[:, 1, 1] = 1 / scale
+    denorm[:, 0, 2], denorm[:, 1, 2] = origin[:, 0], origin[:, 1]
+    denorm[:, 2, 2] = 1
+    h = denorm @ h
+
+    # 至少 4 个点、在格子坐标中不共线，且解不退化
+    centered = (grid - (grid * weights[..., None]).sum(axis=1, keepdims=True) / count[:, None, None])
+    centered = centered * weights[..., None]
+    spread = np.linalg.det(np.einsum("fni,fnj->fij", centered, centered))
+    usable = (valid.sum(axis=1) >= 4) & (spread > 1e-6) & (singular[:, -2] > 1e-9)
+    return h, usable
+
+
+def _similarity(pitch, angle, centroid, shift):
+    """相似变换（由晶格估计得到）：格点 -> 图像，(F, 3, 3)"""
+    cos, sin = np.cos(angle), np.sin(angle)
+    h = np.zeros((len(pitch), 3, 3))
+    h[:, 0, 0], h[:, 0, 1] = pitch * cos, -pitch * sin
+    h[:, 1, 0], h[:, 1, 1] = pitch * sin, pitch * cos
+    offset = _rotate(shift[:, None, :], angle)[:, 0] * pitch[:, None]
+    h[:, 0, 2], h[:, 1, 2] = centroid[:, 0] + offset[:, 0], centroid[:, 1] + offset[:, 1]
+    h[:, 2, 2] = 1
+    return h
+
+
+def _project(h):
+    """把 9 个格点按 (F, 3, 3) 变换投影到图像 (F, 9, 2)"""
+    grid = np.concatenate([CELL_COORDS, np.ones((9, 1))], axis=1)
+    projected = np.einsum("fij,nj->fni", h, grid)
+    w = projected[..., 2:3]
+    w = np.where(np.abs(w) < 1e-12, 1e-12, w)
+    return projected[..., :2] / w
+
+
+def fit_grids(centers, mask, image_sizes=None, box_sizes=None, iterations: int = _REFINE_ITERATIONS):
+    """批量拟合多面的 3x3 网格。
+
+    Args:
+        centers: (F, 9, 2) 贴纸中心 (x, y)
+        mask: (F, 9) 有效掩码，每面至多 9 个有效点
+        image_sizes: 可选，每面图像的 (h, w)，缺一整行/列时用图像中心判断缺的是哪一边
+        box_sizes: 可选 (F, 9) 贴纸框边长
+        iterations: 单应精化轮数
+
+    Returns:
+        tuple: (每个点的格子下标 (F, 9)，无效点为 -1；9 个格子在图像中的位置 (F, 9, 2)，含缺失格子的推断位置)
+    """
+    centers = np.asarray(centers, dtype=np.float64)
+    mask = np.asarray(mask, dtype=bool)
+    if len(centers) == 0:
+        return np.zeros((0, 9), dtype=np.int64), np.zeros((0, 9, 2))
+
+    pitch, angle = estimate_lattice(centers, mask, box_sizes)
+    cells, (centroid, shift) = _initial_cells(centers, mask, pitch, angle, image_sizes)
+    cost = ((cells[:, :, None, :] - CELL_COORDS[None, None, :, :]) ** 2).sum(axis=-1)
+    assignment = _assign(cost, mask)
+
+    fallback = _similarity(pitch, angle, centroid, shift)
+    positions = _project(fallback)
+    for _ in range(iterations):
+        h, usable = _fit_homographies(assignment, centers, pitch)
+        positions = _project(np.where(usable[:, None, None], h, fallback))
+        cost = ((centers[:, :, None, :] - positions[:, None, :, :]) ** 2).sum(axis=-1)
+        assignment = _assign(cost, mask)
+    return assignment, positions
+
+
+def pack_stickers(stickers_list):
+    """把每面的贴纸列表（至多 9 个）打包为 fit_grids 的输入 (centers, mask, box_sizes)"""
+    count = len(stickers_list)
+    centers = np.zeros((count, 9, 2))
+    mask = np.zeros((count, 9), dtype=bool)
+    box_sizes = np.zeros((count, 9))
+    for f, stickers in enumerate(stickers_list):
+        for i, s in enumerate(stickers[:9]):
+            x1, y1, x2, y2 = s['box']
+            centers[f, i] = (s['x'], s['y'])
+            box_sizes[f, i] = ((x2 - x1) + (y2 - y1)) / 2
+            mask[f, i] = True
+    return centers, mask, box_sizes
+
+
+def fill_matrices(stickers_list, image_sizes=None, default: str = 'black') -> list:
+    """把多面的贴纸列表填入 3x3 颜色矩阵，未检测到的格子为 default。
+    同时在每个贴纸上记录分配到的格子 s['cell'] = (row, col)，供 confidence_matrix 使用。
+
+    Args:
+        stickers_list: 每面一个贴纸列表（_parse_detections 格式，至多 9 个）
+        image_sizes: 可选，每面图像的 (h, w)
+
+    Returns:
+        list: 每面一个 3x3 颜色矩阵
+    """
+    matrices = [[[default] * 3 for _ in range(3)] for _ in stickers_list]
+    if not stickers_list:
+        return matrices
+
+    centers, mask, box_sizes = pack_stickers(stickers_list)
+    assignment, _ = fit_grids(centers, mask, image_sizes, box_sizes)
+    for f, stickers in enumerate(stickers_list):
+        for i, s in enumerate(stickers[:9]):
+            row, col = divmod(int(assignment[f, i]), 3)
+            matrices[f][row][col] = s['color']
+            s['cell'] = (row, col)
+    return matrices
+
+
+def confidence_matrix(stickers) -> list:
+    """一面贴纸的 3x3 置信度矩阵（按 fill_matrices 记录的格子），未检测到的格子为 0"""
+    confidence = [[0.0] * 3 for _ in range(3)]
+    for s in stickers:
+        if 'cell' in s:
+            row, col = s['cell']
+            confidence[row][col] = round(s['conf'], 4)
+    return confidence
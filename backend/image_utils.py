@@ -1,7 +1,10 @@
 import base64
+import io
 import os
+from concurrent.futures import ThreadPoolExecutor
 import cv2
 import numpy as np
+from PIL import Image
 
 # ================= 配置区 =================
 
@@ -18,6 +21,32 @@ FACE_TO_FILENAME = {
 # 图像最大尺寸（等比缩放）
 MAX_IMAGE_SIZE = 640
 
+# 上传图片的尺寸上限：只读文件头判断，超过任一上限直接拒绝，不为解码分配内存
+MAX_UPLOAD_SIDE = int(os.environ.get("CUBE_MAX_UPLOAD_SIDE", 10000))
+MAX_UPLOAD_PIXELS = int(os.environ.get("CUBE_MAX_UPLOAD_PIXELS", 50_000_000))
+
+# JPEG 缩小解码（libjpeg 在 DCT 阶段按 1/8、1/4、1/2 缩放，不生成全尺寸图像）
+_REDUCED_JPEG_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+
+# 识别请求是否在后台保存上传的图片（识别本身直接使用内存中的图像）
+SAVE_UPLOADED_IMAGES = os.environ.get("CUBE_SAVE_UPLOADS", "1") == "1"
+
+# 后台保存的格式（jpg / webp / png）与质量（jpg / webp 有效，0-100）
+UPLOAD_IMAGE_FORMAT = os.environ.get("CUBE_UPLOAD_FORMAT", "jpg").lower()
+UPLOAD_IMAGE_QUALITY = int(os.environ.get("CUBE_UPLOAD_QUALITY", 90))
+
+_ENCODE_PARAMS = {
+    "jpg": lambda quality: [cv2.IMWRITE_JPEG_QUALITY, quality],
+    "webp": lambda quality: [cv2.IMWRITE_WEBP_QUALITY, quality],
+    "png": lambda quality: [],
+}
+
+_image_writer = None
+
 
 # ================= 工具函数 =================
 
@@ -48,8 +77,142 @@ def _resize_keep_ratio(img: np.ndarray, max_size: int) -> np.ndarray:
     return cv2.resize(img, (new_w, new_h), interpolation=cv2.INTER_AREA)
 
 
+def read_image_header(img_bytes: bytes) -> tuple | None:
+    """
+    只解析文件头，返回 (格式, 宽, 高)，如 ('JPEG', 4032, 3024)；无法识别时返回 None
+    """
+    try:
+        with Image.open(io.BytesIO(img_bytes)) as header:
+            return header.format, header.width, header.height
+    except Exception:
+        return None
+
+
+def reduced_decode_flag(image_format: str, width: int, height: int, max_size: int = MAX_IMAGE_SIZE) -> int:
+    """
+    选择 imdecode 标志：JPEG 取缩小后最长边仍不小于 max_size 的最大倍数，其他格式完整解码
+    """
+    if image_format == "JPEG":
+        longest = max(width, height)
+        for factor, flag in _REDUCED_JPEG_FLAGS:
+            if longest / factor >= max_size:
+                return flag
+    return cv2.IMREAD_COLOR
+
+
+def decode_image_bytes(img_bytes: bytes, max_size: int = MAX_IMAGE_SIZE) -> np.ndarray | None:
+    """
+    图片字节 -> OpenCV BGR 图像（等比缩放到 max_size 以内），失败或尺寸超限返回 None
+
+    先读文件头：尺寸超过 MAX_UPLOAD_SIDE / MAX_UPLOAD_PIXELS 的图片不解码；
+    JPEG 直接按 1/2、1/4、1/8 缩小解码，12MP 的手机照片不再分配约 36MB 的全尺寸图像。
+    """
+    header = read_image_header(img_bytes)
+    if header is None:
+        return None
+
+    image_format, width, height = header
+    if max(width, height) > MAX_UPLOAD_SIDE or width * height > MAX_UPLOAD_PIXELS:
+        print(f"  ❌ 图片尺寸过大: {width}x{height}")
+        return None
+
+    flag = reduced_decode_flag(image_format, width, height, max_size)
+    img = cv2.imdecode(np.frombuffer(img_bytes, np.uint8), flag)
+    if img is None:
+        return None
+
+    return _resize_keep_ratio(img, max_size)
+
+
+def decode_base64_image(base64_str: str) -> np.ndarray | None:
+    """
+    Base64 -> OpenCV BGR 图像（已等比缩放到 MAX_IMAGE_SIZE 以内），失败返回 None
+    """
+    img_bytes = _safe_base64_decode(base64_str)
+    if img_bytes is None:
+        return None
+
+    return decode_image_bytes(img_bytes)
+
+
+def _get_image_writer() -> ThreadPoolExecutor:
+    global _image_writer
+    if _image_writer is None:
+        _image_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="image-writer")
+    return _image_writer
+
+
 # ================= 主函数 =================
 
+def decode_base64_images(images_dict: dict) -> dict:
+    """
+    在内存中解码前端 Base64 图片，不落盘
+
+    Args:
+        images_dict: { 'U': 'base64...', 'F': 'base64...' }
+
+    Returns:
+        dict: { 'U': ndarray, ... }，只包含解码成功的面
+    """
+    images = {}
+    for face_key, base64_str in images_dict.items():
+        if face_key not in FACE_TO_FILENAME:
+            continue
+
+        img = decode_base64_image(base64_str)
+        if img is None:
+            print(f"  ❌ 图像解码失败: {face_key}")
+            continue
+        images[face_key] = img
+
+    return images
+
+
+def write_images(images: dict, output_dir: str, image_format: str = UPLOAD_IMAGE_FORMAT,
+                 quality: int = UPLOAD_IMAGE_QUALITY) -> dict:
+    """
+    把已解码的图像编码后写入目录，文件名为 white.jpg 等
+
+    Returns:
+        dict: { 'U': True, 'F': False } 表示各面是否保存成功
+    """
+    if image_format not in _ENCODE_PARAMS:
+        raise ValueError(f"不支持的图片格式: {image_format}")
+
+    os.makedirs(output_dir, exist_ok=True)
+    params = _ENCODE_PARAMS[image_format](quality)
+
+    save_results = {}
+    for face_key, img in images.items():
+        save_path = os.path.join(output_dir, f"{FACE_TO_FILENAME[face_key]}.{image_format}")
+        try:
+            save_results[face_key] = bool(cv2.imwrite(save_path, img, params))
+        except Exception as e:
+            print(f"  ❌ 保存失败 {face_key}: {e}")
+            save_results[face_key] = False
+
+    return save_results
+
+
+def persist_images_async(images: dict, output_dir: str = 'images', session_id: str = None):
+    """
+    在后台线程中保存已解码的图像，不占用识别请求的时间
+
+    Args:
+        images: { 'U': ndarray, ... }
+        output_dir: 保存目录（当 session_id 存在时会被覆盖为会话目录）
+        session_id: 会话唯一标识，用于会话隔离
+
+    Returns:
+        concurrent.futures.Future: 结果同 write_images
+    """
+    if session_id:
+        from session_manager import get_session_dir
+        output_dir = get_session_dir(session_id)["images_dir"]
+
+    return _get_image_writer().submit(write_images, dict(images), output_dir)
+
+
 def save_base64_images(images_dict: dict, output_dir: str = 'images', session_id: str = None) -> dict:
     """
     接收前端 Base64 图片并保存为本地文件
@@ -79,25 +242,13 @@ def save_base64_images(images_dict: dict, output_dir: str = 'images', session_id
         filename = FACE_TO_FILENAME[face_key] + '.png'
         save_path = os.path.join(output_dir, filename)
 
-        # ---------- Base64 解码 ----------
-        img_bytes = _safe_base64_decode(base64_str)
-        if img_bytes is None:
-            print(f"  ❌ Base64 解码失败: {face_key}")
-            save_results[face_key] = False
-            continue
-
-        # ---------- 转 OpenCV 图像 ----------
-        nparr = np.frombuffer(img_bytes, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-
+        # ---------- 解码 + 尺寸控制 ----------
+        img = decode_base64_image(base64_str)
         if img is None:
-            print(f"  ❌ 图像解析失败: {face_key}")
+            print(f"  ❌ Base64 / 图像解码失败: {face_key}")
             save_results[face_key] = False
             continue
 
-        # ---------- 尺寸控制 ----------
-        img = _resize_keep_ratio(img, MAX_IMAGE_SIZE)
-
         # ---------- 保存 ----------
         try:
             cv2.imwrite(save_path, img)
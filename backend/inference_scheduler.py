@@ -0,0 +1,220 @@
+"""
+跨请求的检测推理微批调度器
+
+并发的识别请求各自调用一次 predict 时，模型被串行地用很小的 batch 反复执行。
+调度器把所有请求的面图片放进同一个队列，由推理线程按
+"凑满 max_batch_size 或最早一张图片已等待 max_wait_ms" 的规则组批，
+一次前向推理后再把结果分发回各自等待的请求。
+
+推理线程数与检测模型副本数相同（见 detector_pool），每个推理线程各自组批、各自租用一个副本，
+多副本时批次可以并行推理。
+
+配置（环境变量）:
+  CUBE_INFER_BATCHING      是否启用微批调度，默认 1
+  CUBE_INFER_MAX_BATCH     单批最多图片数，默认 24（4 个请求的六面）
+  CUBE_INFER_MAX_WAIT_MS   最早一张图片的最长等待时间（毫秒），默认 10
+  CUBE_INFER_WORKERS       推理线程数，默认等于 CUBE_DETECTOR_REPLICAS
+  CUBE_INFER_RESULT_TIMEOUT  run() 等待一组图片结果的最长时间（秒），默认 30
+"""
+
+import os
+import queue
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+from detector_pool import DETECTOR_REPLICAS
+
+# ================= 配置区 =================
+
+INFER_BATCHING = os.environ.get("CUBE_INFER_BATCHING", "1") == "1"
+INFER_MAX_BATCH = int(os.environ.get("CUBE_INFER_MAX_BATCH", 24))
+INFER_MAX_WAIT_MS = float(os.environ.get("CUBE_INFER_MAX_WAIT_MS", 10))
+INFER_WORKERS = int(os.environ.get("CUBE_INFER_WORKERS", DETECTOR_REPLICAS))
+INFER_RESULT_TIMEOUT = float(os.environ.get("CUBE_INFER_RESULT_TIMEOUT", 30))
+
+# 等待时间统计窗口（最近 N 张图片）
+_WAIT_WINDOW = 1024
+
+_scheduler_instance = None
+_scheduler_lock = threading.Lock()
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(int(len(sorted_values) * q), len(sorted_values) - 1)]
+
+
+class InferenceScheduler:
+    """把并发提交的图片合并为批次，交给 infer_fn 一次推理。
+
+    Args:
+        infer_fn: 批量推理函数，输入图片列表，返回等长的结果列表
+        max_batch_size: 单批最多图片数
+        max_wait_ms: 批次中最早一张图片的最长等待时间（毫秒）
+        workers: 推理线程数，infer_fn 需要能被这么多线程同时调用
+    """
+
+    def __init__(self, infer_fn, max_batch_size: int = INFER_MAX_BATCH, max_wait_ms: float = INFER_MAX_WAIT_MS,
+                 workers: int = INFER_WORKERS):
+        self.infer_fn = infer_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000
+        self.workers = max(1, workers)
+
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._batch_sizes = Counter()
+        self._waits = deque(maxlen=_WAIT_WINDOW)
+        self._infer_times = deque(maxlen=_WAIT_WINDOW)
+        self._images = 0
+        self._failed_batches = 0
+        self._closed = False
+
+        self._threads = [threading.Thread(target=self._loop, name=f"inference-scheduler-{i}", daemon=True)
+                         for i in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, image) -> Future:
+        """提交一张图片，返回结果的 Future。"""
+        if self._closed:
+            raise RuntimeError("推理调度器已关闭")
+        future = Future()
+        self._queue.put((time.perf_counter(), image, future))
+        return future
+
+    def run(self, images, timeout: float = None) -> list:
+        """提交一组图片并阻塞等待全部结果（可直接作为 CubeDetector.detect_images 的 infer 参数）。
+
+        Args:
+            images: 图片列表
+            timeout: 等待全部结果的最长时间（秒），默认 INFER_RESULT_TIMEOUT
+
+        Raises:
+            TimeoutError: 超时未拿到全部结果（尚未推理的图片会被取消）
+        """
+        timeout = INFER_RESULT_TIMEOUT if timeout is None else timeout
+        futures = [self.submit(image) for image in images]
+        deadline = time.perf_counter() + timeout
+        try:
+            return [future.result(timeout=max(0.0, deadline - time.perf_counter())) for future in futures]
+        except FutureTimeoutError:
+            for future in futures:
+                future.cancel()
+            raise TimeoutError(f"推理超时（>{timeout}s）") from None
+
+    def _collect_batch(self, first):
+        batch = [first]
+        deadline = first[0] + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)  # 留给主循环处理关闭
+                break
+            batch.append(item)
+        return batch
+
+    def _loop(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                self._queue.put(None)  # 留给其他推理线程
+                return
+
+            batch = self._collect_batch(first)
+            started = time.perf_counter()
+            try:
+                results = list(self.infer_fn([image for _, image, _ in batch]))
+                if len(results) != len(batch):
+                    raise RuntimeError(f"推理结果数量 {len(results)} 与批次图片数 {len(batch)} 不一致")
+                error = None
+            except Exception as e:
+                results, error = None, e
+            elapsed = time.perf_counter() - started
+
+            with self._stats_lock:
+                self._batch_sizes[len(batch)] += 1
+                self._images += len(batch)
+                self._infer_times.append(elapsed)
+                self._waits.extend(started - enqueued for enqueued, _, _ in batch)
+                if error is not None:
+                    self._failed_batches += 1
+
+            for index, (_, _, future) in enumerate(batch):
+                # 单个结果分发失败（如请求已超时取消了 Future）不能结束推理线程
+                try:
+                    if error is not None:
+                        future.set_exception(error)
+                    else:
+                        future.set_result(results[index])
+                except Exception as e:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def stats(self) -> dict:
+        """返回队列深度、批大小分布与等待时间（毫秒）。"""
+        with self._stats_lock:
+            waits = sorted(self._waits)
+            infer_times = list(self._infer_times)
+            batches = sum(self._batch_sizes.values())
+            return {
+                "queue_depth": self._queue.qsize(),
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000,
+                "workers": self.workers,
+                "batches": batches,
+                "images": self._images,
+                "failed_batches": self._failed_batches,
+                "avg_batch_size": round(self._images / batches, 2) if batches else 0.0,
+                "batch_size_histogram": dict(sorted(self._batch_sizes.items())),
+                "wait_ms": {
+                    "avg": round(sum(waits) / len(waits) * 1000, 3) if waits else 0.0,
+                    "p50": round(_percentile(waits, 0.5) * 1000, 3),
+                    "p95": round(_percentile(waits, 0.95) * 1000, 3),
+                    "max": round(waits[-1] * 1000, 3) if waits else 0.0,
+                },
+                "infer_ms_avg": round(sum(infer_times) / len(infer_times) * 1000, 3) if infer_times else 0.0,
+            }
+
+    def shutdown(self, timeout: float = 5):
+        """停止推理线程（已在队列中的图片会先处理完）。"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        deadline = time.perf_counter() + timeout
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.perf_counter()))
+
+
+def get_inference_scheduler(infer_fn=None) -> InferenceScheduler:
+    """获取全局唯一的推理调度器（延迟初始化，首次调用时需提供 infer_fn）。"""
+    global _scheduler_instance
+    with _scheduler_lock:
+        if _scheduler_instance is None:
+            if infer_fn is None:
+                raise RuntimeError("推理调度器尚未初始化")
+            print(f"[System] 启动推理微批调度器 (max_batch={INFER_MAX_BATCH}, max_wait={INFER_MAX_WAIT_MS}ms, "
+                  f"workers={INFER_WORKERS})")
+            _scheduler_instance = InferenceScheduler(infer_fn)
+        return _scheduler_instance
+
+
+def get_inference_stats():
+    """返回调度器统计；尚未启动时返回 None（不会触发模型加载）。"""
+    return _scheduler_instance.stats() if _scheduler_instance is not None else None
+
+
+def shutdown_inference_scheduler():
+    global _scheduler_instance
+    with _scheduler_lock:
+        if _scheduler_instance is not None:
+            _scheduler_instance.shutdown()
+            _scheduler_instance = None
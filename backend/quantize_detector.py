@@ -0,0 +1,314 @@
+"""
+检测模型 INT8 训练后量化与评估报告
+
+流程:
+  1. quantize: 以 models/best.onnx（先用 export_detector.py 导出）为输入，
+     用本地图片目录（如 yolo_train/capture_data.py 采集的 raw_images）做静态校准，
+     输出 models/best_int8.onnx（QDQ 格式，权重按通道 INT8）
+  2. report:   在评估图片上对比 best.pt 与 INT8 模型，输出
+       - mAP@0.5 与 mAP@0.5:0.95
+       - 按颜色的混淆矩阵（最后一列为漏检，最后一行为多检）
+       - 单张图片 CPU 延迟（均值 / p50 / p95）
+     评估图片旁存在 YOLO 格式标注（images/xxx.jpg -> labels/xxx.txt）时以标注为真值，
+     否则以 best.pt 的检测结果为真值（此时 best.pt 的 mAP 约为 1，只比较 INT8 的损失）
+     报告同时写入 models/best_int8_report.json
+
+量化后的模型通过配置启用:
+  CUBE_DETECTOR_BACKEND=onnx CUBE_DETECTOR_PRECISION=int8
+
+用法（在 backend 目录下）:
+  python quantize_detector.py quantize --calib ../yolo_train/raw_images --limit 200
+  python quantize_detector.py report --images ../yolo_train/datasets/valid/images
+"""
+
+import argparse
+import glob
+import json
+import os
+import statistics
+import sys
+
+import cv2
+import numpy as np
+
+from detector_backends import create_backend, preprocess_batch, DEFAULT_MODEL_FILES, QUANTIZED_MODEL_FILES
+from export_detector import MODELS_DIR, IMAGE_PATTERNS, timed_predict
+
+COLOR_NAMES = ['blue', 'green', 'orange', 'red', 'white', 'yellow']
+
+# 默认保持浮点的节点名前缀：YOLOv8 检测头（DFL 解码与类别 sigmoid 对量化误差最敏感）
+DEFAULT_EXCLUDE_PREFIXES = ["/model.22/"]
+
+
+# ================= 量化 =================
+
+def _image_paths(images_dir: str, limit: int = 0) -> list:
+    paths = sorted(p for pattern in IMAGE_PATTERNS for p in glob.glob(os.path.join(images_dir, pattern)))
+    return paths[:limit] if limit else paths
+
+
+class FolderCalibrationReader:
+    """逐张读取校准目录中的图片，按推理时相同的 letterbox 前处理后交给量化器"""
+
+    def __init__(self, images_dir: str, input_name: str, imgsz: int = 640, limit: int = 0):
+        self.paths = _image_paths(images_dir, limit)
+        if not self.paths:
+            raise FileNotFoundError(f"❌ 校准目录 {images_dir} 中没有图片")
+        self.input_name = input_name
+        self.imgsz = imgsz
+        self._iter = iter(self.paths)
+
+    def get_next(self):
+        for path in self._iter:
+            img = cv2.imread(path)
+            if img is not None:
+                batch, _ = preprocess_batch([img], self.imgsz)
+                return {self.input_name: batch}
+        return None
+
+    def rewind(self):
+        self._iter = iter(self.paths)
+
+
+def quantize_model(calib_dir: str, imgsz: int = 640, limit: int = 0, exclude_prefixes=None,
+                   models_dir: str = MODELS_DIR) -> str:
+    """静态 INT8 量化 best.onnx，返回量化模型路径"""
+    import onnx
+    from onnxruntime.quantization import CalibrationMethod, QuantFormat, QuantType, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    source = os.path.join(models_dir, DEFAULT_MODEL_FILES["onnx"])
+    target = os.path.join(models_dir, QUANTIZED_MODEL_FILES["onnx"])
+    if not os.path.exists(source):
+        raise FileNotFoundError(f"❌ 缺少 {source}，请先运行 python export_detector.py export --format onnx")
+
+    prepared = source.replace(".onnx", "_prep.onnx")
+    quant_pre_process(source, prepared)
+
+    model = onnx.load(prepared)
+    prefixes = DEFAULT_EXCLUDE_PREFIXES if exclude_prefixes is None else exclude_prefixes
+    excluded = [node.name for node in model.graph.node if any(node.name.startswith(p) for p in prefixes)]
+
+    reader = FolderCalibrationReader(calib_dir, model.graph.input[0].name, imgsz, limit)
+    print(f"🔧 校准图片 {len(reader.paths)} 张，保持浮点的节点 {len(excluded)} 个")
+    quantize_static(
+        prepared, target, reader,
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=True,
+        calibrate_method=CalibrationMethod.MinMax,
+        nodes_to_exclude=excluded,
+    )
+    os.remove(prepared)
+    print(f"✅ 已输出: {target}")
+    return target
+
+
+# ================= 评估指标 =================
+
+def box_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """两组 xyxy 框的 IoU 矩阵 (len(a), len(b))"""
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)), dtype=np.float32)
+    tl = np.maximum(a[:, None, :2], b[None, :, :2])
+    br = np.minimum(a[:, None, 2:4], b[None, :, 2:4])
+    inter = np.prod(np.clip(br - tl, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:4] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:4] - b[:, :2], axis=1)
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def average_precision(recall: np.ndarray, precision: np.ndarray) -> float:
+    """101 点插值 AP，与 ultralytics val 一致（完全正确时为 0.995 而非 1）"""
+    recall = np.concatenate([[0.0], recall, [1.0]])
+    precision = np.concatenate([[1.0], precision, [0.0]])
+    precision = np.flip(np.maximum.accumulate(np.flip(precision)))
+    x = np.linspace(0, 1, 101)
+    return float(np.trapezoid(np.interp(x, recall, precision), x))
+
+
+def mean_average_precision(predictions, ground_truths, num_classes: int = len(COLOR_NAMES),
+                           iou_thresholds=(0.5,)) -> float:
+    """按类别计算 AP 后取平均（只统计有真值的类别），多个 IoU 阈值时再取平均
+
+    Args:
+        predictions: 每张图片一个 (K, 6) 数组: x1, y1, x2, y2, conf, cls
+        ground_truths: 每张图片一个 (M, 5) 数组: x1, y1, x2, y2, cls
+    """
+    scores_per_threshold = []
+    for threshold in iou_thresholds:
+        aps = []
+        for cls in range(num_classes):
+            n_gt = sum(int((gt[:, 4] == cls).sum()) for gt in ground_truths)
+            if n_gt == 0:
+                continue
+            records = []  # (置信度, 是否命中)
+            for pred, gt in zip(predictions, ground_truths):
+                pred_c = pred[pred[:, 5] == cls]
+                gt_c = gt[gt[:, 4] == cls]
+                pred_c = pred_c[np.argsort(-pred_c[:, 4])]
+                ious = box_iou(pred_c, gt_c)
+                for i in range(len(pred_c)):
+                    j = int(np.argmax(ious[i])) if len(gt_c) else -1
+                    hit = j >= 0 and ious[i, j] >= threshold
+                    if hit:
+                        ious[:, j] = -1  # 每个真值只能被命中一次
+                    records.append((float(pred_c[i, 4]), bool(hit)))
+            if not records:
+                aps.append(0.0)
+                continue
+            records.sort(key=lambda r: -r[0])
+            hits = np.array([r[1] for r in records], dtype=np.float64)
+            tp = np.cumsum(hits)
+            fp = np.cumsum(1 - hits)
+            aps.append(average_precision(tp / n_gt, tp / (tp + fp)))
+        scores_per_threshold.append(float(np.mean(aps)) if aps else 0.0)
+    return float(np.mean(scores_per_threshold))
+
+
+def color_confusion(predictions, ground_truths, num_classes: int = len(COLOR_NAMES), iou_threshold: float = 0.5):
+    """类别无关配对后的混淆矩阵 (nc + 1) x (nc + 1)
+
+    行为真值颜色、列为预测颜色；最后一列为漏检，最后一行为多检（无对应真值）。
+    """
+    matrix = np.zeros((num_classes + 1, num_classes + 1), dtype=np.int64)
+    for pred, gt in zip(predictions, ground_truths):
+        ious = box_iou(gt, pred)
+        used = set()
+        for i in range(len(gt)):
+            j = int(np.argmax(ious[i])) if len(pred) else -1
+            if j >= 0 and ious[i, j] >= iou_threshold:
+                used.add(j)
+                ious[:, j] = -1  # 每个预测框只配对一次
+                matrix[int(gt[i, 4]), int(pred[j, 5])] += 1
+            else:
+                matrix[int(gt[i, 4]), num_classes] += 1
+        for j in range(len(pred)):
+            if j not in used:
+                matrix[num_classes, int(pred[j, 5])] += 1
+    return matrix
+
+
+def load_yolo_labels(image_path: str, shape) -> np.ndarray | None:
+    """读取 YOLO 格式标注（归一化 cls cx cy w h），返回 (M, 5) xyxy + cls；无标注文件返回 None"""
+    images_dir, filename = os.path.split(image_path)
+    label_path = os.path.join(os.path.dirname(images_dir), "labels", os.path.splitext(filename)[0] + ".txt")
+    if not os.path.exists(label_path):
+        return None
+
+    h, w = shape[:2]
+    rows = []
+    with open(label_path, encoding="utf-8") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) < 5:
+                continue
+            cls, cx, cy, bw, bh = int(parts[0]), *map(float, parts[1:5])
+            rows.append([(cx - bw / 2) * w, (cy - bh / 2) * h, (cx + bw / 2) * w, (cy + bh / 2) * h, cls])
+    return np.array(rows, dtype=np.float32).reshape(-1, 5)
+
+
+# ================= 报告 =================
+
+def _latency_summary(samples) -> dict:
+    ordered = sorted(samples)
+    return {
+        "mean_ms": round(statistics.mean(ordered), 2),
+        "p50_ms": round(ordered[len(ordered) // 2], 2),
+        "p95_ms": round(ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)], 2),
+    }
+
+
+def build_report(images, labels, reference_results, reference_latency, quantized_results, quantized_latency) -> dict:
+    """汇总 mAP、混淆矩阵与延迟；labels 为 None 时以 best.pt 的结果为真值"""
+    if labels is None:
+        labels = [r[:, [0, 1, 2, 3, 5]] for r in reference_results]
+        ground_truth = "best.pt"
+    else:
+        ground_truth = "labels"
+
+    report = {"images": len(images), "ground_truth": ground_truth, "models": {}}
+    for name, results, latency in (("best.pt", reference_results, reference_latency),
+                                   ("int8", quantized_results, quantized_latency)):
+        report["models"][name] = {
+            "map50": round(mean_average_precision(results, labels), 4),
+            "map50_95": round(mean_average_precision(results, labels, iou_thresholds=np.arange(0.5, 0.96, 0.05)), 4),
+            "latency": _latency_summary(latency),
+            "confusion": color_confusion(results, labels).tolist(),
+        }
+    report["map50_drop"] = round(report["models"]["best.pt"]["map50"] - report["models"]["int8"]["map50"], 4)
+    report["speedup"] = round(report["models"]["best.pt"]["latency"]["mean_ms"]
+                              / report["models"]["int8"]["latency"]["mean_ms"], 2)
+    return report
+
+
+def print_report(report: dict):
+    print(f"评估图片: {report['images']}  真值来源: {report['ground_truth']}")
+    for name, stats in report["models"].items():
+        latency = stats["latency"]
+        print(f"[{name}] mAP50={stats['map50']:.4f}  mAP50-95={stats['map50_95']:.4f}  "
+              f"延迟 mean={latency['mean_ms']}ms p50={latency['p50_ms']}ms p95={latency['p95_ms']}ms")
+        header = ''.join(f"{c:>8}" for c in COLOR_NAMES + ['miss'])
+        print(f"{'':>8}{header}")
+        for row_name, row in zip(COLOR_NAMES + ['extra'], stats["confusion"]):
+            print(f"{row_name:>8}" + ''.join(f"{v:>8}" for v in row))
+    print(f"mAP50 下降: {report['map50_drop']:.4f}  加速比: x{report['speedup']}")
+
+
+def run_report(images_dir: str, imgsz: int = 640, limit: int = 0, output: str = "") -> dict:
+    paths = _image_paths(images_dir, limit)
+    images, labels = [], []
+    for path in paths:
+        img = cv2.imread(path)
+        if img is None:
+            continue
+        images.append(img)
+        labels.append(load_yolo_labels(path, img.shape))
+    if not images:
+        raise FileNotFoundError(f"❌ {images_dir} 中没有可读取的图片")
+    if any(label is None for label in labels):
+        labels = None
+
+    reference = create_backend(MODELS_DIR, backend="pytorch", model="", precision="fp32")
+    quantized = create_backend(MODELS_DIR, backend="onnx", model="", precision="int8")
+    reference_results, reference_latency = timed_predict(reference, images, imgsz)
+    quantized_results, quantized_latency = timed_predict(quantized, images, imgsz)
+
+    report = build_report(images, labels, reference_results, reference_latency,
+                          quantized_results, quantized_latency)
+    output = output or os.path.join(MODELS_DIR, "best_int8_report.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print_report(report)
+    print(f"📄 报告已保存: {output}")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="检测模型 INT8 量化与评估")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    quantize_parser = sub.add_parser("quantize", help="静态 INT8 量化 best.onnx")
+    quantize_parser.add_argument("--calib", required=True, help="校准图片目录")
+    quantize_parser.add_argument("--limit", type=int, default=200, help="最多使用的校准图片数")
+    quantize_parser.add_argument("--imgsz", type=int, default=640)
+    quantize_parser.add_argument("--exclude-prefix", nargs="*", default=None,
+                                 help="保持浮点的节点名前缀，默认为检测头 /model.22/")
+
+    report_parser = sub.add_parser("report", help="对比 best.pt 与 INT8 模型")
+    report_parser.add_argument("--images", required=True, help="评估图片目录（可带 YOLO 标注）")
+    report_parser.add_argument("--limit", type=int, default=0)
+    report_parser.add_argument("--imgsz", type=int, default=640)
+    report_parser.add_argument("--output", default="", help="报告 JSON 路径")
+
+    args = parser.parse_args()
+    if args.command == "quantize":
+        quantize_model(args.calib, imgsz=args.imgsz, limit=args.limit, exclude_prefixes=args.exclude_prefix)
+    else:
+        run_report(args.images, imgsz=args.imgsz, limit=args.limit, output=args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,243 @@
+"""
+魔方解法缓存
+
+课堂和教程场景中，同一批打乱会被反复提交。缓存以 Kociemba 编码为键，
+命中时直接返回已有解法，不再执行二阶段搜索。
+
+对称规约:
+  一个状态在 48 种整体对称（旋转 + 镜像）及求逆下共有至多 96 个等价形式，
+  取字典序最小者作为规范代表。缓存中保存的是规范代表的解法，
+  命中时再把解法变换回调用方的朝向，因此等价的打乱共用同一条缓存。
+
+存储分两层:
+  - 内存 LRU（容量可配置）
+  - 可选的 SQLite 磁盘层，服务重启后仍然有效
+
+超时记录:
+  twophase 只有在时间预算用完时才会返回超过目标步数的解。此时缓存同时记下这次
+  用完的时间预算：之后同一状态的请求即使目标步数更短，只要时间预算不超过它，
+  重新搜索也只会再次超时，因此直接返回缓存的解，而不是每次都付出整个时间预算。
+
+配置（环境变量）:
+  CUBE_SOLUTION_CACHE_SIZE  内存层容量（条），默认 4096；0 表示关闭缓存
+  CUBE_SOLUTION_CACHE_PATH  磁盘层 SQLite 文件路径，默认不启用
+"""
+
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from cube_geometry import (
+    SYMMETRIES, SYMMETRY_INVERSE,
+    conjugate_state, conjugate_moves, invert_state, invert_moves,
+)
+from convert_cube_state import parse_solution_moves
+
+# ================= 配置区 =================
+
+SOLUTION_CACHE_SIZE = int(os.environ.get("CUBE_SOLUTION_CACHE_SIZE", 4096))
+SOLUTION_CACHE_PATH = os.environ.get("CUBE_SOLUTION_CACHE_PATH", "")
+
+_cache_instance = None
+
+
+def canonicalize(kociemba_code: str):
+    """求状态在对称与求逆下的规范代表。
+
+    Returns:
+        tuple | None: (规范编码, 对称下标, 是否取逆)，满足
+        conjugate_state(原状态或其逆, 对称下标) == 规范编码；
+        状态无法分解为小块时返回 None
+    """
+    inverse = invert_state(kociemba_code)
+    if inverse is None:
+        return None
+
+    best = None
+    for inverted, state in ((False, kociemba_code), (True, inverse)):
+        for sym in range(len(SYMMETRIES)):
+            candidate = conjugate_state(state, sym)
+            if best is None or candidate < best[0]:
+                best = (candidate, sym, inverted)
+    return best
+
+
+def _normalize_moves(moves) -> list:
+    """统一为 twophase 的数字记法：R -> R1，R' -> R3"""
+    return [m[0] + {'': '1', "'": '3'}.get(m[1:], m[1:]) for m in moves]
+
+
+def format_raw_solution(moves) -> str:
+    """按 twophase 的格式拼接原始解法字符串，如 'R1 U3 (2f)'"""
+    return ''.join(m + ' ' for m in moves) + f'({len(moves)}f)'
+
+
+class SolutionCache:
+    """对称规约的两级解法缓存（线程安全）。"""
+
+    def __init__(self, max_size: int = SOLUTION_CACHE_SIZE, db_path: str = SOLUTION_CACHE_PATH):
+        self.max_size = max_size
+        self.db_path = db_path or None
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._memory_hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+
+        if self.db_path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS solutions "
+                             "(canonical TEXT PRIMARY KEY, moves TEXT NOT NULL, exhausted REAL)")
+            columns = [row[1] for row in self._db.execute("PRAGMA table_info(solutions)")]
+            if "exhausted" not in columns:  # 旧版本创建的缓存文件
+                self._db.execute("ALTER TABLE solutions ADD COLUMN exhausted REAL")
+            self._db.commit()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def _remember(self, canonical, moves, exhausted=None):
+        self._memory[canonical] = (moves, exhausted)
+        self._memory.move_to_end(canonical)
+        while len(self._memory) > self.max_size:
+            self._memory.popitem(last=False)
+
+    def _find(self, canonical):
+        """依次查内存层和磁盘层，返回 (解法, 用完的时间预算, 来源)；调用方需持有锁"""
+        entry = self._memory.get(canonical)
+        if entry is not None:
+            self._memory.move_to_end(canonical)
+            return entry + ("memory",)
+
+        if self._db is not None:
+            row = self._db.execute("SELECT moves, exhausted FROM solutions WHERE canonical = ?",
+                                   (canonical,)).fetchone()
+            if row is not None:
+                moves = row[0].split()
+                self._remember(canonical, moves, row[1])
+                return moves, row[1], "disk"
+
+        return None, None, None
+
+    def _get_canonical(self, canonical, max_length=None, timeout=None):
+        with self._lock:
+            moves, exhausted, source = self._find(canonical)
+            too_long = moves is not None and max_length is not None and len(moves) > max_length
+            if too_long and timeout is not None and exhausted is not None and timeout <= exhausted:
+                too_long = False  # 同样或更长的时间预算已经搜索过，重新搜索也只会超时
+            if moves is None or too_long:
+                self._misses += 1
+                return None
+
+            if source == "memory":
+                self._memory_hits += 1
+            else:
+                self._disk_hits += 1
+            return moves
+
+    def lookup(self, kociemba_code: str, max_length: int = None, timeout: float = None):
+        """查询解法。
+
+        Args:
+            kociemba_code: 54 字符 Kociemba 编码
+            max_length: 可选，缓存的解超过该步数时视为未命中
+            timeout: 可选，本次请求的搜索时间预算；缓存的解虽超过 max_length，
+                     但来自用完了不少于该预算的搜索时，仍视为命中
+
+        Returns:
+            str | None: twophase 格式的原始解法字符串；未命中返回 None
+        """
+        if not self.enabled:
+            return None
+
+        key = canonicalize(kociemba_code)
+        if key is None:
+            return None
+        canonical, sym, inverted = key
+
+        moves = self._get_canonical(canonical, max_length, timeout)
+        if moves is None:
+            return None
+
+        moves = conjugate_moves(moves, SYMMETRY_INVERSE[sym])
+        if inverted:
+            moves = invert_moves(moves)
+        return format_raw_solution(moves)
+
+    def store(self, kociemba_code: str, raw_solution: str, max_length: int = None, timeout: float = None):
+        """写入一条解法（转换到规范代表的坐标系后保存）。
+
+        同一状态已有不更长的解时保留原解，避免快速档位的长解覆盖短解。
+
+        Args:
+            kociemba_code: 54 字符 Kociemba 编码
+            raw_solution: twophase 原始解法字符串
+            max_length: 可选，搜索的目标步数
+            timeout: 可选，搜索的时间预算（秒）；解超过 max_length 时说明预算已用完，一并记录
+        """
+        if not self.enabled:
+            return
+
+        key = canonicalize(kociemba_code)
+        if key is None:
+            return
+        canonical, sym, inverted = key
+
+        moves = _normalize_moves(parse_solution_moves(raw_solution))
+        if inverted:
+            moves = invert_moves(moves)
+        moves = conjugate_moves(moves, sym)
+
+        exhausted = None
+        if max_length is not None and timeout is not None and len(moves) > max_length:
+            exhausted = timeout
+
+        with self._lock:
+            existing, existing_exhausted, _ = self._find(canonical)
+            if existing_exhausted is not None:
+                exhausted = max(exhausted or 0, existing_exhausted)
+            if existing is not None and len(existing) <= len(moves):
+                if exhausted == existing_exhausted:
+                    return  # 已有不更长的解，保留原解
+                moves = existing  # 保留原解，只更新用完的时间预算
+            self._remember(canonical, moves, exhausted)
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO solutions (canonical, moves, exhausted) VALUES (?, ?, ?)",
+                                 (canonical, ' '.join(moves), exhausted))
+                self._db.commit()
+
+    def stats(self) -> dict:
+        """返回命中统计。"""
+        with self._lock:
+            hits = self._memory_hits + self._disk_hits
+            total = hits + self._misses
+            return {
+                "enabled": self.enabled,
+                "size": len(self._memory),
+                "max_size": self.max_size,
+                "disk_enabled": self._db is not None,
+                "hits": hits,
+                "memory_hits": self._memory_hits,
+                "disk_hits": self._disk_hits,
+                "misses": self._misses,
+                "hit_rate": round(hits / total, 4) if total else 0.0,
+            }
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+def get_solution_cache() -> SolutionCache:
+    """获取全局唯一的解法缓存（延迟初始化）。"""
+    global _cache_instance
+    if _cache_instance is None:
+        _cache_instance = SolutionCache()
+    return _cache_instance
@@ -0,0 +1,323 @@
+"""
+求解器进程池
+
+将 Kociemba 二阶段搜索从 FastAPI 线程池中移出，交给独立的工作进程执行:
+  - 每个工作进程启动时加载一次 twophase 表，之后反复复用
+  - 求解任务经由进程池队列分发，异步端点通过 await 获取结果
+  - 多个求解真正并行（不受 GIL 限制），也不会阻塞识别与会话接口
+
+配置（环境变量）:
+  CUBE_SOLVER_POOL_SIZE        工作进程数，默认等于 CPU 核数；0 表示在后台线程中求解
+  CUBE_SOLVER_JOB_TIMEOUT      单个任务的最长等待时间（秒），默认 10
+  CUBE_SOLVER_QUEUE_DEPTH      允许同时排队/执行的任务数，超出时直接拒绝，默认 64
+  CUBE_SOLVER_PROFILES         JSON，覆盖或新增求解档位，如 {"fast": {"max_length": 24, "timeout": 0.3}}
+  CUBE_SOLVER_DEFAULT_PROFILE  请求未指定档位时使用的档位，默认 balanced
+"""
+
+import asyncio
+import json
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from convert_cube_state import run_twophase_search, run_twophase_search_timed, DEFAULT_MAX_LENGTH, DEFAULT_TIMEOUT
+from twophase_tables import load_twophase
+
+# ================= 配置区 =================
+
+SOLVER_POOL_SIZE = int(os.environ.get("CUBE_SOLVER_POOL_SIZE", os.cpu_count() or 1))
+SOLVER_JOB_TIMEOUT = float(os.environ.get("CUBE_SOLVER_JOB_TIMEOUT", 10))
+SOLVER_QUEUE_DEPTH = int(os.environ.get("CUBE_SOLVER_QUEUE_DEPTH", 64))
+
+# 求解档位：max_length 为目标步数（找到不超过该步数的解即返回），timeout 为搜索时间预算（秒）
+#   fast      交互场景，拿到第一个 25 步以内的解就返回
+#   balanced  原有的默认参数
+#   short     批量/离线场景，用更长的时间换更短的解
+SOLVER_PROFILES = {
+    "fast": {"max_length": 25, "timeout": 0.5},
+    "balanced": {"max_length": DEFAULT_MAX_LENGTH, "timeout": DEFAULT_TIMEOUT},
+    "short": {"max_length": 19, "timeout": 5},
+}
+SOLVER_PROFILES.update(json.loads(os.environ.get("CUBE_SOLVER_PROFILES", "{}")))
+DEFAULT_SOLVER_PROFILE = os.environ.get("CUBE_SOLVER_DEFAULT_PROFILE", "balanced")
+
+# 预热时每个工作进程求解一次的状态（superflip，需要完整使用两阶段的表）
+_WARMUP_STATE = "UBULURUFURURFRBRDRFUFLFRFDFDFDLDRDBDLULBLFLDLBUBRBLBDB"
+
+_pool_instance = None
+
+
+class SolverBusyError(RuntimeError):
+    """求解队列已满"""
+
+
+class SolverTimeoutError(RuntimeError):
+    """求解任务超过等待时间"""
+
+
+def get_solver_profile(name: str = None) -> tuple:
+    """按名称查找求解档位。
+
+    Args:
+        name: 档位名称，为空时使用 DEFAULT_SOLVER_PROFILE
+
+    Returns:
+        tuple: (档位名称, {"max_length": int, "timeout": float})
+
+    Raises:
+        ValueError: 档位不存在
+    """
+    name = name or DEFAULT_SOLVER_PROFILE
+    if name not in SOLVER_PROFILES:
+        raise ValueError(f"未知的求解档位: {name}，可选: {', '.join(SOLVER_PROFILES)}")
+    return name, SOLVER_PROFILES[name]
+
+
+def resolve_search_params(name: str = None, max_length=None, timeout=None) -> tuple:
+    """按档位确定搜索参数，请求给出的 max_length / timeout 只能在档位范围内收紧。
+
+    工作进程中已开始的搜索无法取消，因此不允许请求把时间预算调得比档位更长、
+    或把目标步数调得比档位更短（更短的目标会一直搜到时间预算用完）。
+
+    Args:
+        name: 档位名称，为空时使用 DEFAULT_SOLVER_PROFILE
+        max_length: 可选，目标步数，不小于档位的 max_length
+        timeout: 可选，搜索时间预算（秒），不超过档位的 timeout
+
+    Returns:
+        tuple: (档位名称, max_length, timeout)
+
+    Raises:
+        ValueError: 档位不存在或参数不是正数
+    """
+    name, params = get_solver_profile(name)
+    try:
+        max_length = params["max_length"] if max_length is None else int(max_length)
+        timeout = params["timeout"] if timeout is None else float(timeout)
+    except (TypeError, ValueError):
+        raise ValueError("max_length 必须是整数，timeout 必须是数字")
+    if max_length <= 0 or not timeout > 0:
+        raise ValueError("max_length 与 timeout 必须为正数")
+    return name, max(max_length, params["max_length"]), min(timeout, params["timeout"])
+
+
+def _init_worker():
+    """工作进程初始化：预先加载 twophase 表（内存映射，多进程共享页缓存）。"""
+    load_twophase()
+
+
+class SolverPool:
+    """Kociemba 求解进程池。
+
+    进程池在第一次提交任务时才创建。排队深度通过信号量控制，
+    任务真正结束（而非调用方放弃等待）时才归还名额，保证计数准确。
+    """
+
+    def __init__(self, size: int = SOLVER_POOL_SIZE, job_timeout: float = SOLVER_JOB_TIMEOUT,
+                 queue_depth: int = SOLVER_QUEUE_DEPTH):
+        self.size = size
+        self.job_timeout = job_timeout
+        self.queue_depth = queue_depth
+
+        self._executor = None
+        self._manager = None
+        self._waiters = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(queue_depth)
+        self._pending = 0
+        self._completed = 0
+        self._rejected = 0
+        self._timeouts = 0
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                if self.size > 0:
+                    print(f"[System] 启动求解进程池: {self.size} 个工作进程")
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.size,
+                        mp_context=multiprocessing.get_context("spawn"),
+                        initializer=_init_worker,
+                    )
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="solver")
+            return self._executor
+
+    def _get_progress_waiters(self):
+        """读取进度队列的等待线程（每个进行中的任务至多占用一个，与默认线程池隔离）"""
+        with self._lock:
+            if self._waiters is None:
+                self._waiters = ThreadPoolExecutor(max_workers=self.queue_depth,
+                                                   thread_name_prefix="solver-progress")
+            return self._waiters
+
+    def _on_done(self, _future):
+        with self._lock:
+            self._pending -= 1
+            self._completed += 1
+        self._slots.release()
+
+    def submit(self, fn, *args):
+        """提交任务到进程池。
+
+        Args:
+            fn: 可被工作进程导入的模块级函数
+            *args: 传给 fn 的参数
+
+        Returns:
+            concurrent.futures.Future: 任务结果
+
+        Raises:
+            SolverBusyError: 排队任务数已达上限
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise SolverBusyError(f"求解队列已满（{self.queue_depth}），请稍后重试")
+
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._pending += 1
+        future.add_done_callback(self._on_done)
+        return future
+
+    async def run(self, fn, *args):
+        """在进程池中执行任务并异步等待结果。
+
+        Raises:
+            SolverBusyError: 排队任务数已达上限
+            SolverTimeoutError: 超过 job_timeout 仍未完成
+        """
+        future = self.submit(fn, *args)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.job_timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self._timeouts += 1
+            raise SolverTimeoutError(f"求解超时（>{self.job_timeout}s）")
+
+    def create_progress_queue(self):
+        """创建可传给任务函数的进度队列（进程模式下为 Manager 队列）。"""
+        if self.size <= 0:
+            return queue.Queue()
+        with self._lock:
+            if self._manager is None:
+                self._manager = multiprocessing.get_context("spawn").Manager()
+            return self._manager.Queue()
+
+    async def run_with_progress(self, fn, *args):
+        """执行会汇报进度的任务，边执行边产出进度。
+
+        fn 的最后一个参数为进度队列，由本方法创建并传入。任务结束时再放入一个 None 作为结束标记；
+        读取进度在专用的等待线程中阻塞进行（Manager 队列的每次读取都是一次进程间往返），
+        不占用事件循环，也不轮询。
+
+        Yields:
+            tuple: 若干个 ("progress", 进度项)，最后一个为 ("result", 返回值)
+
+        Raises:
+            SolverBusyError: 排队任务数已达上限
+            SolverTimeoutError: 超过 job_timeout 仍未完成
+        """
+        progress = self.create_progress_queue()
+        future = self.submit(fn, *args, progress)
+        # 工作进程 put 返回时进度项已进入队列，因此结束标记总在全部进度项之后
+        future.add_done_callback(lambda _: progress.put(None))
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.job_timeout
+        waiters = self._get_progress_waiters()
+
+        while True:
+            try:
+                item = await loop.run_in_executor(waiters, progress.get, True, max(deadline - loop.time(), 0))
+            except queue.Empty:
+                future.cancel()
+                with self._lock:
+                    self._timeouts += 1
+                raise SolverTimeoutError(f"求解超时（>{self.job_timeout}s）")
+            if item is None:
+                break
+            yield "progress", item
+
+        yield "result", future.result()
+
+    async def solve(self, kociemba_code: str, max_length: int = DEFAULT_MAX_LENGTH,
+                    timeout: float = DEFAULT_TIMEOUT) -> tuple:
+        """异步求解单个魔方状态。
+
+        Args:
+            kociemba_code: 54 字符 Kociemba 编码
+            max_length: 找到不超过该步数的解即返回
+            timeout: twophase 搜索时间预算（秒）
+
+        Returns:
+            tuple: (twophase 原始解法字符串, 工作进程内的搜索耗时（秒，不含排队）)
+        """
+        return await self.run(run_twophase_search_timed, kociemba_code, max_length, timeout)
+
+    def warm_up(self) -> float:
+        """启动全部工作进程，并在每个进程中完成一次求解（加载 twophase 表、预热内存映射页）。
+
+        预热任务不占用排队名额，也不计入统计。
+
+        Returns:
+            float: 耗时（秒）
+        """
+        start = time.perf_counter()
+        executor = self._get_executor()
+        # 没有空闲进程时每次提交都会启动一个新进程，因此连续提交 size 个任务即可启动全部进程
+        futures = [executor.submit(run_twophase_search, _WARMUP_STATE, 25, 1.0) for _ in range(max(self.size, 1))]
+        for future in futures:
+            future.result()
+        return time.perf_counter() - start
+
+    def stats(self) -> dict:
+        """返回进程池的运行统计。"""
+        with self._lock:
+            return {
+                "size": self.size,
+                "queue_depth": self.queue_depth,
+                "job_timeout": self.job_timeout,
+                "started": self._executor is not None,
+                "pending": self._pending,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "timeouts": self._timeouts,
+            }
+
+    def shutdown(self):
+        """关闭进程池，不等待排队中的任务。"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+            manager, self._manager = self._manager, None
+            waiters, self._waiters = self._waiters, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        if manager is not None:
+            manager.shutdown()
+        if waiters is not None:
+            waiters.shutdown(wait=False, cancel_futures=True)
+
+
+def get_solver_pool() -> SolverPool:
+    """获取全局唯一的求解进程池（延迟初始化）。"""
+    global _pool_instance
+    if _pool_instance is None:
+        _pool_instance = SolverPool()
+    return _pool_instance
+
+
+def shutdown_solver_pool():
+    """关闭全局求解进程池。"""
+    global _pool_instance
+    if _pool_instance is not None:
+        _pool_instance.shutdown()
+        _pool_instance = None
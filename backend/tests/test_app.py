@@ -1,5 +1,6 @@
 import sys
-from unittest.mock import Mock, MagicMock
+import json
+from unittest.mock import Mock, MagicMock, AsyncMock, patch
 from fastapi.testclient import TestClient
 
 # Mock昂贵的依赖模块以避免测试时初始化
@@ -39,6 +40,35 @@ def test_health_check():
     assert data["status"] in ["healthy", "unhealthy"]
 
 
+def test_health_does_not_load_model():
+    """测试健康检查只读取缓存的加载状态，不会触发模型加载"""
+    with patch("cube_service.get_detector") as mock_get_detector:
+        data = client.get("/api/health").json()
+
+    mock_get_detector.assert_not_called()
+    assert data["model_loaded"] is False
+
+
+def test_liveness_and_readiness_probes():
+    """测试存活探针总是 200，就绪探针在预热完成前返回 503"""
+    from warmup import Readiness
+
+    readiness = Readiness()
+    with patch("app.get_readiness", return_value=readiness):
+        live = client.get("/api/health/live")
+        not_ready = client.get("/api/health/ready")
+        readiness.update("detector", state="ready", loaded=True, load_s=2.5, warmup_ms={"640": 80.0})
+        readiness.update("solver", state="ready", loaded=True, load_s=1.2)
+        ready = client.get("/api/health/ready")
+
+    assert live.status_code == 200
+    assert live.json()["status"] == "alive"
+    assert not_ready.status_code == 503
+    assert not_ready.json()["components"]["detector"]["state"] == "pending"
+    assert ready.status_code == 200
+    assert ready.json()["components"]["detector"]["warmup_ms"] == {"640": 80.0}
+
+
 def test_create_session():
     """测试创建会话端点"""
     response = client.post("/api/session")
@@ -110,18 +140,100 @@ def test_recognize_endpoint_with_session():
     assert "success" in data
 
 
+def test_recognize_stream_endpoint():
+    """测试渐进式识别逐面推送 face 事件，最后的 done 事件与 /api/recognize 的响应相同"""
+    cube_state = {face: [["white"] * 3] * 3 for face in "URFDLB"}
+
+    async def fake_stream(images, session_id=None):
+        yield {"event": "face", "face": "U", "matrix": cube_state["U"], "confidence": [[0.9] * 3] * 3,
+               "stage": 640, "count": 1, "total": 1, "elapsed": 0.01}
+        yield {"event": "done", "data": cube_state, "detection": {"stages": {"U": 640}, "reruns": 0}}
+
+    with patch("app.recognize_cube_stream", side_effect=fake_stream) as mock_stream:
+        response = client.post("/api/recognize/stream", json={"images": {"U": "b64"}, "session_id": "s1"})
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    blocks = [b for b in response.text.split("\n\n") if b]
+    events = [(b.split("\n")[0][len("event: "):], json.loads(b.split("\n")[1][len("data: "):])) for b in blocks]
+    assert [e[0] for e in events] == ["face", "done"]
+    assert events[0][1]["face"] == "U"
+    assert events[1][1]["success"] is True and events[1][1]["detection"]["stages"] == {"U": 640}
+    assert mock_stream.call_args.kwargs["session_id"] == "s1"
+
+
+def test_recognize_stream_reports_errors():
+    """测试渐进式识别的错误以 error 事件返回"""
+    response = client.post("/api/recognize/stream", json={"images": {}})
+    assert "event: error" in response.text
+    assert "未接收到图片数据" in response.text
+
+
+def test_recognize_upload_endpoint():
+    """测试二进制上传识别端点：各面解码后直接交给识别，session_id 取自表单字段"""
+    import cv2
+    import numpy as np
+
+    jpeg = cv2.imencode(".jpg", np.full((30, 30, 3), 255, np.uint8))[1].tobytes()
+    cube_state = {face: [["white"] * 3] * 3 for face in "URFDLB"}
+    with patch("app.recognize_images", return_value=cube_state) as mock_recognize:
+        response = client.post("/api/recognize/upload",
+                               files={"U": ("u.jpg", jpeg, "image/jpeg"), "F": ("f.jpg", jpeg, "image/jpeg")},
+                               data={"session_id": "s1"})
+
+    assert response.status_code == 200
+    assert response.json()["success"] is True
+    images = mock_recognize.call_args.args[0]
+    assert set(images) == {"U", "F"} and images["U"].shape == (30, 30, 3)
+    assert mock_recognize.call_args.kwargs["session_id"] == "s1"
+
+
+def test_recognize_upload_endpoint_rejects_invalid():
+    """测试二进制上传识别端点：超过字节上限返回 413，非 multipart 返回 400，没有图片时 success 为 False"""
+    with patch("upload_stream.MAX_UPLOAD_BYTES", 10):
+        too_large = client.post("/api/recognize/upload", files={"U": ("u.jpg", b"x" * 100, "image/jpeg")})
+    not_multipart = client.post("/api/recognize/upload", json={"images": {}})
+    empty = client.post("/api/recognize/upload", files={"X": ("x.jpg", b"x", "image/jpeg")})
+
+    assert too_large.status_code == 413
+    assert not_multipart.status_code == 400
+    assert empty.status_code == 200 and empty.json()["success"] is False
+
+
 def test_save_state_with_session():
-    """测试带 session_id 的保存状态端点"""
+    """测试带 session_id 的保存状态端点（只写状态文件，不加载检测模型）"""
     create_resp = client.post("/api/session")
     session_id = create_resp.json()["session_id"]
 
-    response = client.post("/api/save_state", json={
-        "faces": {"U": ["white"] * 9},
-        "session_id": session_id,
-    })
+    with patch("cube_service.get_detector") as mock_get_detector:
+        response = client.post("/api/save_state", json={
+            "faces": {"U": ["white"] * 9},
+            "session_id": session_id,
+        })
     assert response.status_code == 200
     data = response.json()
-    assert "success" in data
+    assert data["success"] is True
+    mock_get_detector.assert_not_called()
+    client.delete(f"/api/session/{session_id}")
+
+
+def test_debug_overlay_rendered_on_demand():
+    """测试按需渲染调试图端点"""
+    import numpy as np
+    from debug_overlay import DebugOverlayRecorder
+
+    recorder = DebugOverlayRecorder(mode="on_demand")
+    recorder.record("s1", "white", np.zeros((64, 64, 3), np.uint8),
+                    [{'color': 'white', 'box': (10, 10, 30, 30)}])
+
+    with patch("app.get_debug_recorder", return_value=recorder):
+        listing = client.get("/api/session/s1/debug").json()
+        image = client.get("/api/session/s1/debug/U")
+        missing = client.get("/api/session/s1/debug/R")
+
+    assert listing["faces"] == ["white"]
+    assert image.status_code == 200
+    assert image.headers["content-type"] == "image/jpeg"
+    assert missing.status_code == 404
 
 
 def test_performance_middleware():
@@ -135,4 +247,302 @@ def test_performance_middleware():
         time_value = float(time_header[:-1])
         assert time_value >= 0.0
     except ValueError:
-        assert False, f"Invalid time format: {time_header}"
\ No newline at end of file
+        assert False, f"Invalid time format: {time_header}"
+
+def _solved_faces():
+    """六面均已复原的颜色矩阵"""
+    colors = {'U': 'white', 'R': 'red', 'F': 'green', 'D': 'yellow', 'L': 'orange', 'B': 'blue'}
+    return {face: [[color] * 3 for _ in range(3)] for face, color in colors.items()}
+
+
+def test_solve_batch_streams_per_item_results():
+    """测试批量求解按输入顺序逐行返回，非法状态单独失败"""
+    scrambled = "UUBUUBUURFRRFRRFRRLLUFFUFFUDDLDDFDDFBBBLLLLLLDRRDBBDBB"  # U' R'
+    fake_pool = MagicMock()
+    fake_pool.size = 2
+    fake_pool.solve = AsyncMock(side_effect=lambda code, *args: ("R1 U1 (2f)" if code == scrambled else "(0f)", 0.01))
+
+    states = [scrambled, "bad", _solved_faces()]
+    with patch('cube_service.get_solver_pool', return_value=fake_pool), \
+            patch('cube_service.get_solution_cache') as mock_cache:
+        mock_cache.return_value.lookup.return_value = None
+        response = client.post("/api/solve/batch", json={"states": states})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [item["index"] for item in lines] == [0, 1, 2]
+    assert lines[0]["success"] is True
+    assert lines[0]["data"]["moves"] == ["R", "U"]
+    assert lines[1]["success"] is False
+    assert lines[2]["success"] is True
+
+
+def test_solve_batch_rejects_empty_list():
+    """测试空状态列表直接返回错误"""
+    response = client.post("/api/solve/batch", json={"states": []})
+    assert response.status_code == 200
+    assert response.json()["success"] is False
+
+
+def test_solve_stateless_with_persist():
+    """测试无状态求解：直接提交状态，并在响应后写入会话目录"""
+    import os
+    from session_manager import RESULTS_ROOT
+
+    session_id = client.post("/api/session").json()["session_id"]
+    fake_pool = MagicMock()
+    fake_pool.solve = AsyncMock(return_value=("U3 (1f)", 0.01))
+    state = "UUUUUUUUUBBBRRRRRRRRRFFFFFFDDDDDDDDDFFFLLLLLLLLLBBBBBB"
+
+    with patch('cube_service.get_solver_pool', return_value=fake_pool), \
+            patch('cube_service.get_solution_cache') as mock_cache:
+        mock_cache.return_value.lookup.return_value = None
+        response = client.post("/api/solve", json={
+            "state": state, "persist": True, "session_id": session_id,
+        })
+
+    data = response.json()
+    assert data["success"] is True
+    assert data["data"]["moves"] == ["U'"]
+    assert fake_pool.solve.await_args.args[0] == state
+
+    results_dir = os.path.join(RESULTS_ROOT, session_id)
+    assert os.path.exists(os.path.join(results_dir, "cube_state.json"))
+    assert os.path.exists(os.path.join(results_dir, "solution.json"))
+
+    loaded = client.get(f"/api/session/{session_id}/load").json()
+    assert loaded["data"]["cube_state"]["F"][0] == ["red"] * 3
+    client.delete(f"/api/session/{session_id}")
+
+
+def test_solve_stateless_invalid_state():
+    """测试无状态求解的非法状态直接返回错误"""
+    response = client.post("/api/solve", json={"state": "UUU"})
+    data = response.json()
+    assert data["success"] is False
+    assert "长度错误" in data["error"]
+
+
+def test_solve_rejects_twisted_corner_before_solver():
+    """测试拧角状态返回结构化原因，且不会提交到求解进程池"""
+    state = "UUUUUUUUFURRRRRRRRFFRFFFFFFDDDDDDDDDLLLLLLLLLBBBBBBBBB"
+    fake_pool = MagicMock()
+    fake_pool.solve = AsyncMock(return_value=("U1 (1f)", 0.01))
+
+    with patch('cube_service.get_solver_pool', return_value=fake_pool):
+        data = client.post("/api/solve", json={"state": state}).json()
+
+    assert data["success"] is False
+    assert data["reason"]["code"] == "corner_twist"
+    assert data["reason"]["cubie"] == "URF"
+    fake_pool.solve.assert_not_called()
+
+
+def test_solve_stream_sends_improvements_then_done():
+    """测试渐进式求解依次推送每个更短的解和最终结果"""
+    async def fake_progress(fn, *args):
+        yield "progress", {"raw_solution": "R1 R2 (2f)", "length": 2, "elapsed": 0.001}
+        yield "progress", {"raw_solution": "R3 (1f)", "length": 1, "elapsed": 0.002}
+        yield "result", "R3 (1f)"
+
+    fake_pool = MagicMock()
+    fake_pool.run_with_progress = fake_progress
+    state = "UUFUUFUUFRRRRRRRRRFFDFFDFFDDDBDDBDDBLLLLLLLLLUBBUBBUBB"  # R
+
+    with patch('cube_service.get_solver_pool', return_value=fake_pool), \
+            patch('cube_service.get_solution_cache') as mock_cache:
+        mock_cache.return_value.lookup.return_value = None
+        response = client.post("/api/solve/stream", json={"state": state})
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    blocks = [b for b in response.text.split("\n\n") if b]
+    events = [(b.split("\n")[0][len("event: "):], json.loads(b.split("\n")[1][len("data: "):])) for b in blocks]
+    assert [e[0] for e in events] == ["solution", "solution", "done"]
+    assert [e[1].get("length") for e in events[:2]] == [2, 1]
+    assert events[2][1]["moves"] == ["R'"]
+
+
+def test_solve_returns_intermediate_states():
+    """测试 include_states 返回每步变化的贴纸，逐步应用后魔方还原"""
+    state = "UUFUUFUUFRRRRRRRRRFFDFFDFFDDDBDDBDDBLLLLLLLLLUBBUBBUBB"  # R
+    fake_pool = MagicMock()
+    fake_pool.solve = AsyncMock(return_value=("R1 R2 (2f)", 0.01))
+
+    with patch('cube_service.get_solver_pool', return_value=fake_pool), \
+            patch('cube_service.get_solution_cache') as mock_cache:
+        mock_cache.return_value.lookup.return_value = None
+        data = client.post("/api/solve", json={"state": state, "include_states": True}).json()
+
+    states = data["data"]["states"]
+    assert states["initial"] == state
+    assert len(states["deltas"]) == 2
+
+    facelets = list(state)
+    for indices, colors in states["deltas"]:
+        assert len(indices) == len(colors)
+        for i, color in zip(indices, colors):
+            facelets[i] = color
+    assert ''.join(facelets) == "UUUUUUUUURRRRRRRRRFFFFFFFFFDDDDDDDDDLLLLLLLLLBBBBBBBBB"
+
+
+def test_solve_rejects_corrupted_solution():
+    """测试无法还原魔方的解法被拒绝，且不写入缓存和会话文件"""
+    import os
+    from session_manager import RESULTS_ROOT
+
+    session_id = client.post("/api/session").json()["session_id"]
+    state = "UUFUUFUUFRRRRRRRRRFFDFFDFFDDDBDDBDDBLLLLLLLLLUBBUBBUBB"  # R
+    fake_pool = MagicMock()
+    fake_pool.solve = AsyncMock(return_value=("R1 (1f)", 0.01))
+
+    with patch('cube_service.get_solver_pool', return_value=fake_pool), \
+            patch('cube_service.get_solution_cache') as mock_cache:
+        mock_cache.return_value.lookup.return_value = None
+        data = client.post("/api/solve", json={
+            "state": state, "persist": True, "session_id": session_id,
+        }).json()
+
+    assert data["success"] is False
+    assert "解法校验失败" in data["error"]
+    mock_cache.return_value.store.assert_not_called()
+    assert not os.path.exists(os.path.join(RESULTS_ROOT, session_id, "solution.json"))
+    client.delete(f"/api/session/{session_id}")
+
+
+def test_solve_stream_reports_errors():
+    """测试渐进式求解的错误以 error 事件返回"""
+    response = client.post("/api/solve/stream", json={"state": "UUU"})
+    assert "event: error" in response.text
+
+
+def test_solve_stream_rejects_invalid_overrides():
+    """测试非法的 timeout 以 error 事件返回，而不是 500"""
+    state = "UUFUUFUUFRRRRRRRRRFFDFFDFFDDDBDDBDDBLLLLLLLLLUBBUBBUBB"  # R
+    response = client.post("/api/solve/stream", json={"state": state, "timeout": "abc"})
+
+    assert response.status_code == 200
+    assert "event: error" in response.text
+
+
+def test_solve_stream_clamps_overrides_to_profile():
+    """测试请求的 timeout 不能超过档位的时间预算"""
+    from solver_pool import SOLVER_PROFILES
+
+    calls = []
+
+    async def fake_progress(fn, *args):
+        calls.append(args)
+        yield "result", "R3 (1f)"
+
+    fake_pool = MagicMock()
+    fake_pool.run_with_progress = fake_progress
+    state = "UUFUUFUUFRRRRRRRRRFFDFFDFFDDDBDDBDDBLLLLLLLLLUBBUBBUBB"  # R
+
+    with patch('cube_service.get_solver_pool', return_value=fake_pool), \
+            patch('cube_service.get_solution_cache') as mock_cache:
+        mock_cache.return_value.lookup.return_value = None
+        client.post("/api/solve/stream", json={"state": state, "profile": "fast", "timeout": 3600})
+
+    assert calls[0][1:] == (SOLVER_PROFILES["fast"]["max_length"], SOLVER_PROFILES["fast"]["timeout"])
+
+
+def test_solve_profile_selects_search_parameters():
+    """测试 profile 字段决定传给求解池的目标步数和时间预算，并返回耗时"""
+    from solver_pool import SOLVER_PROFILES
+
+    fake_pool = MagicMock()
+    fake_pool.solve = AsyncMock(return_value=("U3 (1f)", 0.25))
+    state = "UUUUUUUUUBBBRRRRRRRRRFFFFFFDDDDDDDDDFFFLLLLLLLLLBBBBBB"
+
+    with patch('cube_service.get_solver_pool', return_value=fake_pool), \
+            patch('cube_service.get_solution_cache') as mock_cache:
+        mock_cache.return_value.lookup.return_value = None
+        data = client.post("/api/solve", json={"state": state, "profile": "fast"}).json()
+
+    fast = SOLVER_PROFILES["fast"]
+    fake_pool.solve.assert_awaited_once_with(state, fast["max_length"], fast["timeout"])
+    mock_cache.return_value.lookup.assert_called_once_with(
+        state, max_length=fast["max_length"], timeout=fast["timeout"])
+    assert data["data"]["profile"] == "fast"
+    assert data["data"]["step_count"] == 1
+    assert data["data"]["search_time"] == 0.25
+    assert data["data"]["queue_wait"] >= 0
+    assert data["data"]["cached"] is False
+
+
+def test_solve_unknown_profile():
+    """测试未知档位返回错误"""
+    state = "UUUUUUUUURRRRRRRRRFFFFFFFFFDDDDDDDDDLLLLLLLLLBBBBBBBBB"
+    data = client.post("/api/solve", json={"state": state, "profile": "turbo"}).json()
+    assert data["success"] is False
+    assert "turbo" in data["error"]
+
+    data = client.post("/api/solve/batch", json={"states": [state], "profile": "turbo"}).json()
+    assert data["success"] is False
+
+
+def test_list_solver_profiles():
+    """测试列出求解档位"""
+    data = client.get("/api/solve/profiles").json()
+    assert {"fast", "balanced", "short"} <= set(data["data"])
+    assert data["default"] in data["data"]
+
+
+def _in_event_loop():
+    """当前线程是否正在运行事件循环"""
+    import asyncio
+
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+
+def test_solve_cache_calls_run_off_event_loop():
+    """测试解法缓存的查询与写入（对称规约、SQLite 读写）不在事件循环线程中执行"""
+    calls = []
+    fake_cache = MagicMock()
+    fake_cache.lookup.side_effect = lambda *args, **kwargs: calls.append(("lookup", _in_event_loop()))
+    fake_cache.store.side_effect = lambda *args, **kwargs: calls.append(("store", _in_event_loop()))
+    fake_pool = MagicMock()
+    fake_pool.solve = AsyncMock(return_value=("R3 (1f)", 0.01))
+    state = "UUFUUFUUFRRRRRRRRRFFDFFDFFDDDBDDBDDBLLLLLLLLLUBBUBBUBB"  # R
+
+    with patch('cube_service.get_solver_pool', return_value=fake_pool), \
+            patch('cube_service.get_solution_cache', return_value=fake_cache):
+        data = client.post("/api/solve", json={"state": state}).json()
+
+    assert data["success"] is True
+    assert calls == [("lookup", False), ("store", False)]
+
+
+def test_solve_stream_session_files_accessed_off_event_loop():
+    """测试渐进式求解读取会话状态与写入解法文件不在事件循环线程中执行"""
+    state = "UUFUUFUUFRRRRRRRRRFFDFFDFFDDDBDDBDDBLLLLLLLLLUBBUBBUBB"  # R
+    calls = []
+
+    def fake_load(session_id=None):
+        calls.append(("load", _in_event_loop()))
+        return state
+
+    def fake_build(solution, kociemba_code, session_id=None):
+        calls.append(("build", _in_event_loop()))
+        return {"raw_solution": solution}
+
+    async def fake_progress(fn, *args):
+        yield "result", "R3 (1f)"
+
+    fake_pool = MagicMock()
+    fake_pool.run_with_progress = fake_progress
+
+    with patch('cube_service.get_solver_pool', return_value=fake_pool), \
+            patch('cube_service.get_solution_cache') as mock_cache, \
+            patch('cube_service.load_kociemba_code', side_effect=fake_load), \
+            patch('cube_service.build_solution_result', side_effect=fake_build):
+        mock_cache.return_value.lookup.return_value = None
+        response = client.post("/api/solve/stream", json={"session_id": "s1"})
+
+    assert "event: done" in response.text
+    assert calls == [("load", False), ("build", False)]
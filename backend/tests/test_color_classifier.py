@@ -0,0 +1,122 @@
+"""
+color_classifier 颜色采样识别测试
+
+用合成的规整魔方面图片（带黑色缝隙与噪声）验证网格采样、CIEDE2000 分类、
+会话质心沿用与置信度；CIEDE2000 的向量化实现与 pyciede2000 对照。
+"""
+
+import numpy as np
+import pytest
+
+from color_classifier import ColorClassifier, ciede2000, bgr_to_lab, sample_grid, FACE_COLORS
+
+# 与默认质心略有偏差的"实拍"颜色 (BGR)
+PHOTO_BGR = {
+    'white': (225, 230, 228),
+    'yellow': (20, 205, 240),
+    'red': (50, 35, 180),
+    'orange': (15, 100, 245),
+    'blue': (170, 80, 10),
+    'green': (90, 150, 20),
+}
+
+
+def face_image(colors, size=300, seed=0):
+    """按行优先的 9 个颜色名生成一面图片，格子之间留黑色缝隙并加噪声"""
+    rng = np.random.default_rng(seed)
+    img = np.zeros((size, size, 3), np.uint8)
+    cell = size // 3
+    for i, color in enumerate(colors):
+        row, col = divmod(i, 3)
+        img[row * cell + 6:(row + 1) * cell - 6, col * cell + 6:(col + 1) * cell - 6] = PHOTO_BGR[color]
+    noise = rng.integers(-8, 9, img.shape)
+    return np.clip(img.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+
+
+def scrambled_faces(seed=0):
+    rng = np.random.default_rng(seed)
+    palette = list(PHOTO_BGR)
+    faces = {}
+    for code, center in FACE_COLORS.items():
+        colors = [palette[i] for i in rng.integers(0, 6, 9)]
+        colors[4] = center
+        faces[code] = colors
+    return faces
+
+
+class TestCiede2000:
+    """CIEDE2000 色差测试类"""
+
+    def test_reference_pairs(self):
+        """测试 Sharma 等人论文中的参考数据"""
+        pairs = [
+            ((50, 2.6772, -79.7751), (50, 0, -82.7485), 2.0425),
+            ((50, 0, 0), (50, -1, 2), 2.3669),
+            ((50, 2.5, 0), (73, 25, -18), 27.1492),
+            ((2.0776, 0.0795, -1.135), (0.9033, -0.0636, -0.5514), 0.9082),
+        ]
+        for lab1, lab2, expected in pairs:
+            assert float(ciede2000(lab1, lab2)) == pytest.approx(expected, abs=1e-4)
+
+    def test_matches_pyciede2000(self):
+        """测试向量化实现与 pyciede2000 逐对计算一致"""
+        pyciede2000 = pytest.importorskip("pyciede2000")
+        rng = np.random.default_rng(1)
+        lab1 = np.column_stack([rng.uniform(0, 100, 200), rng.uniform(-100, 100, (200, 2))])
+        lab2 = np.column_stack([rng.uniform(0, 100, 200), rng.uniform(-100, 100, (200, 2))])
+
+        expected = [pyciede2000.ciede2000(tuple(a), tuple(b))['delta_E_00'] for a, b in zip(lab1, lab2)]
+        assert np.allclose(ciede2000(lab1, lab2), expected, atol=1e-9)
+
+    def test_broadcast(self):
+        """测试 (N, 1, 3) 与 (1, M, 3) 广播为 (N, M)"""
+        lab = bgr_to_lab(np.array([[255, 255, 255], [0, 0, 255]], np.float32))
+        distances = ciede2000(lab[:, None, :], lab[None, :, :])
+        assert distances.shape == (2, 2)
+        assert np.allclose(np.diag(distances), 0)
+
+
+class TestColorClassifier:
+    """颜色采样分类测试类"""
+
+    def test_sample_grid_centers(self):
+        """测试每格采样到格子中心的颜色"""
+        colors = ['white', 'red', 'green', 'yellow', 'orange', 'blue', 'white', 'red', 'green']
+        sampled, boxes = sample_grid(face_image(colors))
+
+        assert len(boxes) == 9
+        for i, color in enumerate(colors):
+            assert np.allclose(sampled[i], PHOTO_BGR[color], atol=8)
+
+    def test_recognizes_well_framed_faces(self):
+        """测试规整照片六面全部识别正确且置信度足够"""
+        faces = scrambled_faces()
+        images = {code: face_image(colors, seed=i) for i, (code, colors) in enumerate(faces.items())}
+
+        results = ColorClassifier().recognize(images)
+
+        for code, colors in faces.items():
+            matrix, stickers, confidence = results[code]
+            assert matrix == [colors[0:3], colors[3:6], colors[6:9]]
+            assert len(stickers) == 9
+            assert confidence > 0.3
+
+    def test_session_centroids_are_reused(self):
+        """测试只重拍一面时沿用同一会话之前的中心块质心"""
+        classifier = ColorClassifier()
+        faces = scrambled_faces()
+        classifier.recognize({code: face_image(colors) for code, colors in faces.items()}, session_id="s1")
+
+        stored = classifier.centroids({}, session_id="s1")
+        assert np.allclose(stored['orange'], bgr_to_lab(np.array(PHOTO_BGR['orange'], np.float32)), atol=3)
+        assert classifier.centroids({}, session_id="s2")['orange'] is not stored['orange']
+
+    def test_unframed_image_has_low_confidence(self):
+        """测试不是魔方面的图片置信度为 0"""
+        rng = np.random.default_rng(3)
+        img = np.full((300, 300, 3), (128, 0, 128), np.uint8)
+        img[100:200, 100:200] = PHOTO_BGR['green']
+        img = np.clip(img + rng.integers(0, 30, img.shape), 0, 255).astype(np.uint8)
+
+        _, _, confidence = ColorClassifier().recognize({'F': img})['F']
+        assert confidence < 0.3
@@ -0,0 +1,334 @@
+"""
+CubeDetector 识别流程测试
+
+使用假的检测后端（返回预设检测框），验证批量推理、结果拆分与网格填充，
+不需要安装 ultralytics 或提供模型文件。
+"""
+
+import importlib.util
+import os
+from unittest.mock import MagicMock, patch
+
+import cv2
+import numpy as np
+import pytest
+
+from debug_overlay import DebugOverlayRecorder
+from detection_cache import DetectionCache
+
+# 其他测试会把 cube_image_detection 整体替换为 Mock，这里按文件路径加载真实实现
+_spec = importlib.util.spec_from_file_location(
+    "cube_image_detection_impl",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cube_image_detection.py"),
+)
+detection = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(detection)
+
+# 类别编号: 0 blue, 1 green, 2 orange, 3 red, 4 white, 5 yellow
+COLOR_TO_ID = {'blue': 0, 'green': 1, 'orange': 2, 'red': 3, 'white': 4, 'yellow': 5}
+
+
+def grid_detections(colors, conf=0.9, origin=100, step=100, size=80):
+    """按 3x3 网格生成检测结果数组 (K, 6)，colors 为行优先的 9 个颜色（None 表示漏检）"""
+    rows = []
+    for i, color in enumerate(colors):
+        if color is None:
+            continue
+        cx, cy = origin + step * (i % 3), origin + step * (i // 3)
+        rows.append([cx - size / 2, cy - size / 2, cx + size / 2, cy + size / 2, conf, COLOR_TO_ID[color]])
+    return np.array(rows, dtype=np.float32).reshape(-1, 6)
+
+
+@pytest.fixture
+def detector(tmp_path):
+    backend = MagicMock()
+    backend.name = "fake"
+    backend.model_path = str(tmp_path / "best.pt")
+    with patch.object(detection, "create_backend", return_value=backend):
+        instance = detection.CubeDetector()
+    assert isinstance(instance.backend, detection.DetectorPool)
+    instance.backend = backend  # 直接使用假后端，副本池本身见 test_detector_pool
+    instance.debug_dir = str(tmp_path)
+    instance.debug = DebugOverlayRecorder(mode="on_demand", default_dir=str(tmp_path))
+    instance.cache = DetectionCache(max_size=0)
+    return instance
+
+
+class TestBatchedDetection:
+    """批量推理测试类"""
+
+    def test_detect_images_runs_single_forward_pass(self, detector):
+        """测试六面图片只调用一次 predict，并按面拆分结果"""
+        faces = {'U': 'white', 'R': 'red', 'F': 'green', 'D': 'yellow', 'L': 'orange', 'B': 'blue'}
+        detector.backend.predict.return_value = [grid_detections([c] * 9) for c in faces.values()]
+        images = {code: np.zeros((480, 480, 3), np.uint8) for code in faces}
+
+        matrices = detector.detect_images(images)
+
+        assert detector.backend.predict.call_count == 1
+        batch = detector.backend.predict.call_args.args[0]
+        assert len(batch) == 6
+        for code, color in faces.items():
+            assert matrices[code] == [[color] * 3] * 3
+
+    def test_partial_detection_is_filled_with_black(self, detector):
+        """测试漏检的贴纸填充为 black"""
+        colors = ['red', 'red', 'red', 'green', None, 'green', 'blue', 'blue', 'blue']
+        detector.backend.predict.return_value = [grid_detections(colors)]
+
+        matrices = detector.detect_images({'F': np.zeros((480, 480, 3), np.uint8)})
+
+        assert matrices['F'][0] == ['red'] * 3
+        assert matrices['F'][1][1] == 'black'
+
+    def test_missing_row_is_not_stretched(self, detector):
+        """测试漏检一整行时，其余两行仍落在原来的行（按图像中心判断缺的是哪一行）"""
+        colors = [None, None, None, 'green', 'green', 'green', 'blue', 'blue', 'blue']
+        detector.backend.predict.return_value = [grid_detections(colors)]
+
+        matrices = detector.detect_images({'F': np.zeros((400, 400, 3), np.uint8)})
+
+        assert matrices['F'] == [['black'] * 3, ['green'] * 3, ['blue'] * 3]
+
+    def test_keeps_top_nine_by_confidence(self, detector):
+        """测试多于 9 个框时只保留置信度最高的 9 个"""
+        detections = np.vstack([
+            grid_detections(['white'] * 9, conf=0.9),
+            grid_detections(['red'], conf=0.3, origin=110),
+        ])
+        detector.backend.predict.return_value = [detections]
+
+        matrices = detector.detect_images({'U': np.zeros((480, 480, 3), np.uint8)})
+
+        assert matrices['U'] == [['white'] * 3] * 3
+
+    def test_detect_all_faces_reads_images_and_batches(self, detector, tmp_path):
+        """测试 detect_all_faces 读取已保存的图片并合并为一次推理，缺失的面保持 black"""
+        images_dir = tmp_path / "images"
+        images_dir.mkdir()
+        for name in ("white", "red"):
+            cv2.imwrite(str(images_dir / f"{name}.png"), np.zeros((64, 64, 3), np.uint8))
+        detector.backend.predict.return_value = [
+            grid_detections(['white'] * 9),
+            grid_detections(['red'] * 9),
+        ]
+
+        with patch("session_manager.get_session_dir", return_value={"images_dir": str(images_dir)}):
+            state = detector.detect_all_faces(session_id="s1")
+
+        assert detector.backend.predict.call_count == 1
+        assert state['U'] == [['white'] * 3] * 3
+        assert state['R'] == [['red'] * 3] * 3
+        assert state['F'] == [['black'] * 3] * 3
+
+    def test_detect_all_faces_prefers_newest_file(self, detector, tmp_path):
+        """测试同一面存在多种扩展名的图片时读取最近写入的一个，而不是固定优先 png"""
+        images_dir = tmp_path / "images"
+        images_dir.mkdir()
+        stale, fresh = images_dir / "white.png", images_dir / "white.jpg"
+        cv2.imwrite(str(stale), np.zeros((64, 64, 3), np.uint8))
+        cv2.imwrite(str(fresh), np.full((32, 48, 3), 255, np.uint8))
+        os.utime(stale, (1_000_000, 1_000_000))
+        detector.backend.predict.return_value = [grid_detections(['white'] * 9)]
+
+        with patch("session_manager.get_session_dir", return_value={"images_dir": str(images_dir)}), \
+                patch.object(detector, "detect_images", wraps=detector.detect_images) as detect_images:
+            detector.detect_all_faces(session_id="s1")
+
+        assert detect_images.call_args.args[0]['U'].shape == (32, 48, 3)
+
+
+class TestDebugOverlay:
+    """调试图记录测试类"""
+
+    def test_detection_does_not_write_debug_images(self, detector, tmp_path):
+        """测试识别时不再同步写调试图，而是按会话保留检测结果"""
+        detector.backend.predict.return_value = [grid_detections(['white'] * 9)]
+
+        detector.detect_images({'U': np.zeros((480, 480, 3), np.uint8)}, session_id="s1")
+
+        assert list(tmp_path.iterdir()) == []
+        entry = detector.debug.get("s1", "U")
+        assert len(entry["stickers"]) == 9
+        assert detector.debug.get("s2", "U") is None
+
+
+class TestDetectionCache:
+    """检测结果缓存测试类"""
+
+    @staticmethod
+    def faces():
+        rng = np.random.default_rng(0)
+        return {code: rng.integers(0, 256, (64, 64, 3), dtype=np.uint8) for code in "URF"}
+
+    def test_resubmission_skips_inference(self, detector):
+        """测试重复提交相同图片时不再推理"""
+        detector.cache = DetectionCache(max_size=16)
+        detector.backend.predict.return_value = [grid_detections([c] * 9) for c in ('white', 'red', 'green')]
+        images = self.faces()
+
+        first = detector.detect_images(images)
+        second = detector.detect_images({code: img.copy() for code, img in images.items()})
+
+        assert detector.backend.predict.call_count == 1
+        assert first == second
+        assert detector.cache.stats()["hits"] == 3
+
+    def test_only_changed_face_is_inferred(self, detector):
+        """测试只有变化的面参与推理，结果按传入顺序返回"""
+        detector.cache = DetectionCache(max_size=16)
+        detector.backend.predict.return_value = [grid_detections([c] * 9) for c in ('white', 'red', 'green')]
+        images = self.faces()
+        detector.detect_images(images)
+
+        images['R'] = np.full((64, 64, 3), 7, np.uint8)
+        detector.backend.predict.return_value = [grid_detections(['orange'] * 9)]
+        matrices = detector.detect_images(images)
+
+        assert len(detector.backend.predict.call_args.args[0]) == 1
+        assert list(matrices) == ['U', 'R', 'F']
+        assert matrices['R'] == [['orange'] * 3] * 3
+        assert matrices['U'] == [['white'] * 3] * 3
+
+    def test_threshold_change_misses(self, detector):
+        """测试推理参数变化后不复用旧结果"""
+        detector.cache = DetectionCache(max_size=16)
+        detector.backend.predict.return_value = [grid_detections(['white'] * 9)]
+        image = {'U': np.zeros((64, 64, 3), np.uint8)}
+
+        detector.detect_images(image)
+        detector.conf = 0.5
+        detector.detect_images(image)
+
+        assert detector.backend.predict.call_count == 2
+
+
+class TestProgressiveDetection:
+    """逐面产出测试类"""
+
+    def test_faces_inferred_and_yielded_one_at_a_time(self, detector):
+        """测试逐面推理：每次前向推理一张图片，推理完一面立即产出一面"""
+        colors = ['white', 'red', 'green']
+        detector.backend.predict.side_effect = lambda images, **kwargs: [
+            grid_detections([colors[img[0, 0, 0]]] * 9) for img in images]
+        images = {code: np.full((64, 64, 3), i, np.uint8) for i, code in enumerate("URF")}
+
+        faces = detector.iter_detect_images(images)
+        code, matrix, stickers, stage = next(faces)
+
+        assert detector.backend.predict.call_count == 1
+        assert (code, stage) == ('U', 640)
+        assert matrix == [['white'] * 3] * 3
+        assert len(stickers) == 9 and all('cell' in s for s in stickers)
+        rest = list(faces)
+        assert [item[0] for item in rest] == ['R', 'F']
+        assert rest[1][1] == [['green'] * 3] * 3
+        assert all(len(call.args[0]) == 1 for call in detector.backend.predict.call_args_list)
+
+    def test_cached_faces_yielded_before_inference(self, detector):
+        """测试缓存命中的面先于需要推理的面产出"""
+        detector.cache = DetectionCache(max_size=16)
+        detector.backend.predict.return_value = [grid_detections(['red'] * 9)]
+        images = {'U': np.zeros((64, 64, 3), np.uint8), 'R': np.ones((64, 64, 3), np.uint8)}
+        detector.detect_images({'R': images['R']})
+
+        order = [(code, stage) for code, _, _, stage in detector.iter_detect_images(images)]
+
+        assert order == [('R', 'cache'), ('U', 640)]
+
+
+class TestResolutionCascade:
+    """分辨率级联测试类"""
+
+    @staticmethod
+    def enable_cascade(detector):
+        detector.cascade = True
+        detector.cascade_imgsz = 320
+        detector.cascade_min_conf = 0.5
+
+    def test_clean_faces_answered_at_low_resolution(self, detector):
+        """测试低分辨率检出 9 个高置信度贴纸时不再重跑"""
+        self.enable_cascade(detector)
+        detector.backend.predict.return_value = [grid_detections(['white'] * 9), grid_detections(['red'] * 9)]
+        telemetry = {}
+
+        matrices = detector.detect_images({'U': np.zeros((64, 64, 3), np.uint8),
+                                           'R': np.ones((64, 64, 3), np.uint8)}, telemetry=telemetry)
+
+        assert detector.backend.predict.call_count == 1
+        assert detector.backend.predict.call_args.kwargs["imgsz"] == 320
+        assert telemetry == {"stages": {'U': 320, 'R': 320}, "reruns": 0}
+        assert matrices['R'] == [['red'] * 3] * 3
+
+    def test_hard_faces_rerun_at_full_resolution(self, detector):
+        """测试贴纸不足或置信度过低的面以 640 合批重跑，其余面保留低分辨率结果"""
+        self.enable_cascade(detector)
+        partial = grid_detections(['green'] * 8 + [None])
+        low_conf = grid_detections(['blue'] * 9, conf=0.3)
+        detector.backend.predict.side_effect = [
+            [grid_detections(['white'] * 9), partial, low_conf],
+            [grid_detections(['green'] * 9), grid_detections(['blue'] * 9)],
+        ]
+        telemetry = {}
+
+        matrices = detector.detect_images({code: np.full((64, 64, 3), i, np.uint8)
+                                           for i, code in enumerate("UFB")}, telemetry=telemetry)
+
+        second = detector.backend.predict.call_args_list[1]
+        assert len(second.args[0]) == 2
+        assert second.kwargs["imgsz"] == 640
+        assert telemetry == {"stages": {'U': 320, 'F': 640, 'B': 640}, "reruns": 2}
+        assert matrices['F'] == [['green'] * 3] * 3
+        assert detector.cascade_stats()["first_stage"] == 1
+        assert detector.cascade_stats()["reruns"] == 2
+
+    def test_cascade_disabled_uses_full_resolution(self, detector):
+        """测试关闭级联时只以 640 推理一次"""
+        detector.backend.predict.return_value = [grid_detections(['white'] * 9)]
+        telemetry = {}
+
+        detector.detect_images({'U': np.zeros((64, 64, 3), np.uint8)}, telemetry=telemetry)
+
+        assert detector.backend.predict.call_args.kwargs["imgsz"] == 640
+        assert telemetry == {"stages": {'U': 640}, "reruns": 0}
+
+    def test_cache_hits_reported_in_telemetry(self, detector):
+        """测试缓存命中的面在遥测中标记为 cache"""
+        detector.cache = DetectionCache(max_size=4)
+        detector.backend.predict.return_value = [grid_detections(['white'] * 9)]
+        image = {'U': np.zeros((64, 64, 3), np.uint8)}
+        detector.detect_images(image)
+
+        telemetry = {}
+        detector.detect_images(image, telemetry=telemetry)
+        assert telemetry["stages"] == {'U': 'cache'}
+
+
+class TestClassicFastPath:
+    """颜色采样快速路径测试类"""
+
+    @staticmethod
+    def solid_face(bgr):
+        img = np.zeros((300, 300, 3), np.uint8)
+        for row in range(3):
+            for col in range(3):
+                img[row * 100 + 5:row * 100 + 95, col * 100 + 5:col * 100 + 95] = bgr
+        return img
+
+    def test_confident_faces_skip_yolo(self, detector):
+        """测试颜色采样置信度足够的面不经过 YOLO，其余面回退"""
+        detector.classic = True
+        detector.classic_min_conf = 0.3
+        detector.backend.predict.return_value = [grid_detections(['green'] * 9)]
+        noise = np.random.default_rng(0).integers(0, 256, (300, 300, 3), dtype=np.uint8)
+        telemetry = {}
+
+        matrices = detector.detect_images({'U': self.solid_face((255, 255, 255)), 'F': noise},
+                                          session_id="s1", telemetry=telemetry)
+
+        assert detector.backend.predict.call_count == 1
+        assert len(detector.backend.predict.call_args.args[0]) == 1
+        assert telemetry["stages"] == {'U': 'classic', 'F': 640}
+        assert matrices['U'] == [['white'] * 3] * 3
+        assert matrices['F'] == [['green'] * 3] * 3
+        assert len(detector.debug.get("s1", "U")["stickers"]) == 9
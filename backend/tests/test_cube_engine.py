@@ -0,0 +1,134 @@
+"""
+cube_engine NumPy 魔方引擎测试
+
+以 cube_geometry 的逐步字符串实现为参照，验证置换复合与批量应用的结果一致。
+"""
+
+import random
+
+import numpy as np
+import pytest
+
+from cube_engine import (
+    MOVE_TABLE, SOLVED,
+    normalize_move, move_indices, encode_states, decode_state,
+    compose_moves, apply_sequence, apply_move_batch, random_states, is_solved,
+    replay_states, state_deltas,
+)
+from convert_cube_state import verify_solution, SolutionVerificationError
+from cube_geometry import SOLVED_STATE, MOVE_NAMES, apply_moves, invert_moves
+from cube_validation import check_cube_state
+
+
+def random_sequence(length, seed):
+    rng = random.Random(seed)
+    return [rng.choice(MOVE_NAMES) for _ in range(length)]
+
+
+class TestNotation:
+    """转动记法测试类"""
+
+    def test_normalize_move(self):
+        """测试两种记法统一为 twophase 记法"""
+        assert normalize_move("R") == "R1"
+        assert normalize_move("R'") == "R3"
+        assert normalize_move("R2") == "R2"
+        assert normalize_move("U3") == "U3"
+
+    def test_invalid_move(self):
+        """测试无法识别的转动抛出 ValueError"""
+        with pytest.raises(ValueError):
+            normalize_move("X")
+
+    def test_move_indices_accepts_string(self):
+        """测试空格分隔字符串与列表结果相同"""
+        assert move_indices("R U' F2").tolist() == move_indices(["R1", "U3", "F2"]).tolist()
+
+    def test_encode_decode_roundtrip(self):
+        """测试编码与解码互逆"""
+        state = apply_moves(SOLVED_STATE, random_sequence(20, 1))
+        assert decode_state(encode_states(state)) == state
+        assert encode_states([state, SOLVED_STATE]).shape == (2, 54)
+        assert np.array_equal(encode_states(SOLVED_STATE), SOLVED)
+
+
+class TestApply:
+    """转动应用测试类"""
+
+    def test_move_table_shape(self):
+        """测试置换表为 18 行 54 列"""
+        assert MOVE_TABLE.shape == (18, 54)
+
+    def test_sequence_matches_reference(self):
+        """测试复合置换与逐步字符串实现结果一致"""
+        for seed in range(20):
+            moves = random_sequence(30, seed)
+            expected = apply_moves(SOLVED_STATE, moves)
+            assert decode_state(apply_sequence(SOLVED, moves)) == expected
+
+    def test_sequence_then_inverse_is_identity(self):
+        """测试序列与其逆复合为恒等置换"""
+        moves = random_sequence(40, 3)
+        assert np.array_equal(compose_moves(moves + invert_moves(moves)), np.arange(54))
+
+    def test_batch_sequence(self):
+        """测试同一序列作用于整批状态"""
+        starts = [apply_moves(SOLVED_STATE, random_sequence(10, seed)) for seed in range(8)]
+        moves = random_sequence(15, 99)
+        result = apply_sequence(encode_states(starts), moves)
+        for start, row in zip(starts, result):
+            assert decode_state(row) == apply_moves(start, moves)
+
+    def test_move_batch_applies_one_move_per_state(self):
+        """测试每个状态执行各自的一步转动"""
+        states = np.tile(SOLVED, (3, 1))
+        result = apply_move_batch(states, move_indices(["U1", "R2", "B3"]))
+        for row, move in zip(result, ["U1", "R2", "B3"]):
+            assert decode_state(row) == apply_moves(SOLVED_STATE, [move])
+
+
+class TestAnalytics:
+    """打乱生成与还原判断测试类"""
+
+    def test_is_solved(self):
+        """测试单个与批量还原判断"""
+        assert is_solved(SOLVED)
+        scrambled = apply_sequence(SOLVED, "R U")
+        assert not is_solved(scrambled)
+        assert is_solved(np.stack([SOLVED, scrambled])).tolist() == [True, False]
+
+    def test_random_states_are_valid(self):
+        """测试随机打乱生成的状态都能通过小块级校验"""
+        states = random_states(50, length=20, rng=np.random.default_rng(0))
+        assert states.shape == (50, 54)
+        for row in states:
+            assert check_cube_state(decode_state(row)) is None
+
+
+class TestReplay:
+    """解法回放与中间状态测试类"""
+
+    def test_replay_states_match_each_step(self):
+        """测试中间状态与逐步执行结果一致"""
+        moves = random_sequence(12, 7)
+        states = replay_states(SOLVED, moves)
+        assert states.shape == (13, 54)
+        for step in range(13):
+            assert decode_state(states[step]) == apply_moves(SOLVED_STATE, moves[:step])
+
+    def test_deltas_only_list_changed_facelets(self):
+        """测试差分编码只包含颜色发生变化的贴纸"""
+        states = replay_states(SOLVED, ["R1", "R2"])
+        deltas = state_deltas(states)
+        assert len(deltas) == 2
+        for (indices, colors), prev, curr in zip(deltas, states[:-1], states[1:]):
+            assert indices == np.flatnonzero(prev != curr).tolist()
+            assert decode_state(curr)[indices[0]] == colors[0]
+
+    def test_verify_solution(self):
+        """测试正确的解法通过校验，错误的解法抛出异常"""
+        moves = random_sequence(20, 11)
+        state = apply_moves(SOLVED_STATE, moves)
+        verify_solution(' '.join(invert_moves(moves)) + " (20f)", state)
+        with pytest.raises(SolutionVerificationError):
+            verify_solution(' '.join(invert_moves(moves)[:-1]) + " (19f)", state)
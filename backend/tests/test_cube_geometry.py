@@ -0,0 +1,101 @@
+"""
+cube_geometry 贴纸几何模型测试
+
+验证面转动置换、整体对称与状态求逆的代数性质。
+"""
+
+import random
+import pytest
+
+from cube_geometry import (
+    SOLVED_STATE, MOVE_NAMES, MOVE_PERMS, SYMMETRIES, SYMMETRY_INVERSE,
+    apply_moves, invert_moves, conjugate_state, conjugate_moves,
+    invert_state, state_permutation,
+)
+
+# 超级翻转（所有棱块原位翻转）的 Kociemba 编码
+SUPERFLIP = "UBULURUFURURFRBRDRFUFLFRFDFDFDLDRDBDLULBLFLDLBUBRBLBDB"
+
+
+def random_sequence(length, seed):
+    rng = random.Random(seed)
+    return [rng.choice(MOVE_NAMES) for _ in range(length)]
+
+
+class TestMoves:
+    """面转动测试类"""
+
+    def test_all_moves_are_permutations(self):
+        """测试 18 种转动都是 54 贴纸的置换，且中心不动"""
+        assert len(MOVE_PERMS) == 18
+        for perm in MOVE_PERMS.values():
+            assert sorted(perm) == list(range(54))
+            assert all(perm[i] == i for i in (4, 13, 22, 31, 40, 49))
+
+    def test_quarter_turn_has_order_four(self):
+        """测试任意面连续转四次回到原状"""
+        for face in "URFDLB":
+            assert apply_moves(SOLVED_STATE, [face + "1"] * 4) == SOLVED_STATE
+            assert apply_moves(SOLVED_STATE, [face + "1", face + "3"]) == SOLVED_STATE
+
+    def test_u_turn_moves_front_row_to_left(self):
+        """测试 U 顺时针转动把前面顶行转到左面"""
+        state = apply_moves(SOLVED_STATE, ["U1"])
+        assert state[36:39] == "FFF"
+        assert state[18:21] == "RRR"
+
+    def test_superflip_sequence(self):
+        """测试已知的超级翻转公式"""
+        seq = "U1 R2 F1 B1 R1 B2 R1 U2 L1 B2 R1 U3 D3 R2 F1 R3 L1 B2 U2 F2".split()
+        assert apply_moves(SOLVED_STATE, seq) == SUPERFLIP
+
+    def test_inverse_sequence_restores(self):
+        """测试逆序列还原打乱"""
+        seq = random_sequence(25, seed=1)
+        state = apply_moves(SOLVED_STATE, seq)
+        assert apply_moves(state, invert_moves(seq)) == SOLVED_STATE
+
+
+class TestSymmetries:
+    """整体对称测试类"""
+
+    def test_group_size(self):
+        """测试 48 个互不相同的对称，其中 24 个为纯旋转"""
+        assert len(set(SYMMETRIES)) == 48
+        assert SYMMETRIES[0] == ((1, 0, 0), (0, 1, 0), (0, 0, 1))
+
+    def test_solved_state_is_invariant(self):
+        """测试复原状态在所有对称下不变"""
+        for sym in range(48):
+            assert conjugate_state(SOLVED_STATE, sym) == SOLVED_STATE
+
+    @pytest.mark.parametrize("sym", range(48))
+    def test_conjugation_commutes_with_moves(self, sym):
+        """测试 conj(s)·conj(m) == conj(s·m)"""
+        state = apply_moves(SOLVED_STATE, random_sequence(15, seed=sym))
+        moves = random_sequence(5, seed=100 + sym)
+        assert (apply_moves(conjugate_state(state, sym), conjugate_moves(moves, sym))
+                == conjugate_state(apply_moves(state, moves), sym))
+
+    def test_inverse_symmetry(self):
+        """测试对称与其逆复合为恒等"""
+        state = apply_moves(SOLVED_STATE, random_sequence(20, seed=7))
+        for sym in range(48):
+            assert conjugate_state(conjugate_state(state, sym), SYMMETRY_INVERSE[sym]) == state
+
+
+class TestInvertState:
+    """状态求逆测试类"""
+
+    def test_invert_matches_inverse_scramble(self):
+        """测试求逆结果等于执行逆打乱序列"""
+        seq = random_sequence(20, seed=3)
+        state = apply_moves(SOLVED_STATE, seq)
+        assert invert_state(state) == apply_moves(SOLVED_STATE, invert_moves(seq))
+
+    def test_duplicate_cubie_rejected(self):
+        """测试存在重复小块的状态无法分解"""
+        broken = list(SOLVED_STATE)
+        broken[2], broken[20] = broken[20], broken[2]  # 把 URF 角块的两个贴纸换成 UFL 的颜色组合
+        assert state_permutation(''.join(broken)) is None
+        assert invert_state("U" * 54) is None
@@ -4,6 +4,7 @@ CubeService 模块测试
 测试魔方识别、状态保存和求解的业务逻辑，包含会话隔离功能测试
 """
 
+import asyncio
 import pytest
 from unittest.mock import Mock, patch, MagicMock
 import sys
@@ -19,16 +20,17 @@ for name, mock_obj in mock_modules.items():
     if name not in sys.modules:
         sys.modules[name] = mock_obj
 
-from cube_service import recognize_cube, save_cube_state, get_detector
+from cube_service import recognize_cube, recognize_cube_stream, save_cube_state, get_detector, RESULTS_DIR
 
 
 class TestCubeService:
     """CubeService 业务逻辑测试类"""
 
-    @patch('cube_service.save_base64_images')
+    @patch('cube_service.persist_images_async')
+    @patch('cube_service.decode_base64_images')
     @patch('cube_service.get_detector')
-    def test_recognize_cube_success(self, mock_get_detector, mock_save_images):
-        """测试魔方识别功能 - 正常情况（无 session_id）"""
+    def test_recognize_cube_success(self, mock_get_detector, mock_decode, mock_persist):
+        """测试魔方识别功能 - 正常情况（无 session_id），识别直接使用内存中的图像"""
         test_images = {
             'U': 'base64_white',
             'D': 'base64_yellow',
@@ -37,39 +39,71 @@ class TestCubeService:
             'L': 'base64_orange',
             'R': 'base64_red'
         }
+        decoded = {face: object() for face in test_images}
+        mock_decode.return_value = decoded
 
         mock_detector = Mock()
-        expected_state = [['R'] * 9, ['U'] * 9, ['F'] * 9, ['B'] * 9, ['L'] * 9, ['D'] * 9]
-        mock_detector.detect_all_faces.return_value = expected_state
+        expected_state = {face: [[face] * 3] * 3 for face in "URFDLB"}
+        mock_detector.detect_images.return_value = expected_state
         mock_get_detector.return_value = mock_detector
 
         result = recognize_cube(test_images)
 
         assert result == expected_state
-        mock_save_images.assert_called_once()
-        mock_detector.detect_all_faces.assert_called_once_with(session_id=None)
+        mock_decode.assert_called_once_with(test_images)
+        assert mock_detector.detect_images.call_count == 1
+        assert mock_detector.detect_images.call_args.args[0] is decoded
+        mock_persist.assert_called_once_with(decoded, output_dir="images", session_id=None)
 
-    @patch('cube_service.save_base64_images')
-    @patch('cube_service.get_session_dir')
+    @patch('cube_service.persist_images_async')
+    @patch('cube_service.decode_base64_images')
     @patch('cube_service.get_detector')
-    def test_recognize_cube_with_session(self, mock_get_detector, mock_get_dir, mock_save_images):
-        """测试魔方识别功能 - 带 session_id"""
+    def test_recognize_cube_with_session(self, mock_get_detector, mock_decode, mock_persist):
+        """测试魔方识别功能 - 带 session_id，只上传部分面时其余面为 black"""
         test_images = {'U': 'base64_white'}
         session_id = "test-session-123"
-
-        mock_dir = {"images_dir": "/tmp/images/test-session-123", "results_dir": "/tmp/cube_results/test-session-123"}
-        mock_get_dir.return_value = mock_dir
+        mock_decode.return_value = {'U': object()}
 
         mock_detector = Mock()
-        expected_state = [['R'] * 9] * 6
-        mock_detector.detect_all_faces.return_value = expected_state
+        mock_detector.detect_images.return_value = {'U': [['white'] * 3] * 3}
         mock_get_detector.return_value = mock_detector
 
         result = recognize_cube(test_images, session_id=session_id)
 
-        assert result == expected_state
-        mock_get_dir.assert_called_once_with(session_id)
-        mock_detector.detect_all_faces.assert_called_once_with(session_id=session_id)
+        assert result['U'] == [['white'] * 3] * 3
+        assert result['F'] == [['black'] * 3] * 3
+        assert len(result) == 6
+        assert mock_persist.call_args.kwargs["session_id"] == session_id
+
+    @patch('cube_service.SAVE_UPLOADED_IMAGES', False)
+    @patch('cube_service.persist_images_async')
+    @patch('cube_service.decode_base64_images')
+    @patch('cube_service.get_detector')
+    def test_recognize_cube_without_persistence(self, mock_get_detector, mock_decode, mock_persist):
+        """测试关闭上传图片保存后不触发后台写入"""
+        mock_decode.return_value = {'U': object()}
+        mock_get_detector.return_value.detect_images.return_value = {}
+
+        recognize_cube({'U': 'base64_white'})
+
+        mock_persist.assert_not_called()
+
+    @patch('cube_service.INFER_BATCHING', True)
+    @patch('cube_service.get_inference_scheduler')
+    @patch('cube_service.persist_images_async')
+    @patch('cube_service.decode_base64_images')
+    @patch('cube_service.get_detector')
+    def test_recognize_cube_uses_inference_scheduler(self, mock_get_detector, mock_decode, mock_persist,
+                                                      mock_get_scheduler):
+        """测试启用微批调度时推理交给调度器，与其他请求合批"""
+        mock_decode.return_value = {'U': object()}
+        mock_detector = mock_get_detector.return_value
+        mock_detector.detect_images.return_value = {}
+
+        recognize_cube({'U': 'base64_white'})
+
+        mock_get_scheduler.assert_called_once_with(mock_detector.infer_faces)
+        assert mock_detector.detect_images.call_args.kwargs["infer"] is mock_get_scheduler.return_value.run
 
     def test_recognize_cube_empty_input(self):
         """测试魔方识别功能 - 空输入"""
@@ -77,9 +111,10 @@ class TestCubeService:
             recognize_cube({})
         assert "未接收到图片数据" in str(exc_info.value)
 
+    @patch('cube_service.save_cube_state_file')
     @patch('cube_service.get_detector')
-    def test_save_cube_state_success(self, mock_get_detector):
-        """测试保存魔方状态 - 正常情况"""
+    def test_save_cube_state_success(self, mock_get_detector, mock_save):
+        """测试保存魔方状态 - 正常情况，只写文件，不加载检测模型"""
         test_state = {
             'faces': {
                 'U': ['white'] * 9,
@@ -91,25 +126,20 @@ class TestCubeService:
             }
         }
 
-        mock_detector = Mock()
-        mock_get_detector.return_value = mock_detector
-
         save_cube_state(test_state)
 
-        mock_detector.save_cube_state_json.assert_called_once_with(test_state, session_id=None)
+        mock_save.assert_called_once_with(test_state, session_id=None, output_dir=RESULTS_DIR)
+        mock_get_detector.assert_not_called()
 
-    @patch('cube_service.get_detector')
-    def test_save_cube_state_with_session(self, mock_get_detector):
+    @patch('cube_service.save_cube_state_file')
+    def test_save_cube_state_with_session(self, mock_save):
         """测试保存魔方状态 - 带 session_id"""
         test_state = {'faces': {'U': ['white'] * 9}}
         session_id = "test-session-456"
 
-        mock_detector = Mock()
-        mock_get_detector.return_value = mock_detector
-
         save_cube_state(test_state, session_id=session_id)
 
-        mock_detector.save_cube_state_json.assert_called_once_with(test_state, session_id=session_id)
+        mock_save.assert_called_once_with(test_state, session_id=session_id, output_dir=RESULTS_DIR)
 
     def test_save_cube_state_empty_input(self):
         """测试保存魔方状态 - 空输入"""
@@ -138,24 +168,92 @@ class TestCubeService:
         detector2 = get_detector()
         assert detector1 is detector2
         assert mock_cube_detector_class.call_count == 1
+        cube_service._detector_instance = None
+
+    @patch('cube_service.get_readiness')
+    @patch('cube_service.CubeDetector')
+    def test_get_detector_records_load_state(self, mock_cube_detector_class, mock_get_readiness):
+        """测试模型加载成功 / 失败都记录到就绪状态，get_loaded_detector 不触发加载"""
+        import cube_service
+        from cube_service import get_loaded_detector
+        from warmup import Readiness
+        cube_service._detector_instance = None
+        readiness = Readiness()
+        mock_get_readiness.return_value = readiness
+
+        mock_cube_detector_class.side_effect = FileNotFoundError("best.pt")
+        with pytest.raises(FileNotFoundError):
+            get_detector()
+        assert readiness.get("detector")["loaded"] is False
+        assert "best.pt" in readiness.get("detector")["error"]
+        assert get_loaded_detector() is None
+
+        mock_cube_detector_class.side_effect = None
+        detector = get_detector()
+        state = readiness.get("detector")
+        assert state["loaded"] is True and state["error"] is None and state["load_s"] >= 0
+        assert get_loaded_detector() is detector
+        cube_service._detector_instance = None
+
+
+class TestRecognizeCubeStream:
+    """渐进式识别测试类"""
+
+    @staticmethod
+    def collect(images_data, **kwargs):
+        async def run():
+            return [item async for item in recognize_cube_stream(images_data, **kwargs)]
+        return asyncio.run(run())
+
+    @patch('cube_service.persist_images_async')
+    @patch('cube_service.decode_base64_images')
+    @patch('cube_service.get_detector')
+    def test_faces_streamed_then_done(self, mock_get_detector, mock_decode, mock_persist):
+        """测试每识别完一面推送一次（含 3x3 置信度），最后推送六面结果"""
+        mock_decode.return_value = {'U': object(), 'F': object()}
+        white = [{'color': 'white', 'conf': 0.8, 'cell': (0, 0)}]
+        mock_detector = Mock()
+        mock_detector.iter_detect_images.return_value = iter([
+            ('F', [['green'] * 3] * 3, [], 'cache'),
+            ('U', [['white'] * 3] * 3, white, 640),
+        ])
+        mock_detector.detection_telemetry.return_value = {"stages": {'U': 640, 'F': 'cache'}, "reruns": 0}
+        mock_get_detector.return_value = mock_detector
+
+        events = self.collect({'U': 'b64', 'F': 'b64'}, session_id="s1")
+
+        assert [e["event"] for e in events] == ["face", "face", "done"]
+        assert [e["face"] for e in events[:2]] == ['F', 'U']
+        assert events[1]["confidence"] == [[0.8, 0.0, 0.0], [0.0, 0.0, 0.0], [0.0, 0.0, 0.0]]
+        assert events[1]["count"] == 2 and events[1]["total"] == 2
+        assert events[2]["data"]['U'] == [['white'] * 3] * 3
+        assert events[2]["data"]['D'] == [['black'] * 3] * 3
+        assert events[2]["detection"]["stages"] == {'U': 640, 'F': 'cache'}
+        assert mock_detector.iter_detect_images.call_args.kwargs["session_id"] == "s1"
+
+    def test_empty_images_raises(self):
+        """测试空图片数据抛出 ValueError"""
+        with pytest.raises(ValueError, match="未接收到图片数据"):
+            self.collect({})
 
 
 class TestRecognizeCubeIntegration:
     """识别功能集成测试"""
 
-    @patch('cube_service.save_base64_images')
+    @patch('cube_service.persist_images_async')
     @patch('cube_service.get_detector')
-    def test_recognize_cube_with_invalid_face_key(self, mock_get_detector, mock_save_images):
-        """测试包含无效面名的识别请求"""
+    def test_recognize_cube_with_invalid_face_key(self, mock_get_detector, mock_persist):
+        """测试包含无效面名的识别请求（无效面名和无法解码的图片都会被跳过）"""
         test_images = {
             'U': 'base64_white',
             'X': 'base64_invalid',
         }
 
         mock_detector = Mock()
-        mock_detector.detect_all_faces.return_value = [['R'] * 9] * 6
+        mock_detector.detect_images.return_value = {}
         mock_get_detector.return_value = mock_detector
 
         result = recognize_cube(test_images)
         assert len(result) == 6
-        mock_save_images.assert_called_once()
\ No newline at end of file
+        mock_detector.detect_images.assert_not_called()
+        mock_persist.assert_not_called()
\ No newline at end of file
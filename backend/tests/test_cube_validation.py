@@ -0,0 +1,129 @@
+"""
+cube_validation 小块级状态校验测试
+
+构造拧角、翻棱、奇偶错误、重复小块等典型识别错误，验证返回的结构化原因。
+"""
+
+import random
+
+from cube_geometry import SOLVED_STATE, MOVE_NAMES, apply_moves
+from cube_validation import check_cube_state, validate_cube_state, InvalidCubeStateError
+from convert_cube_state import validate_kociemba_state, state_to_kociemba
+
+import pytest
+
+
+def with_facelets(state, **changes):
+    """按 {下标: 颜色} 修改贴纸，下标写作 f<下标>"""
+    chars = list(state)
+    for key, color in changes.items():
+        chars[int(key[1:])] = color
+    return ''.join(chars)
+
+
+class TestValidStates:
+    """合法状态测试类"""
+
+    def test_solved_state_is_valid(self):
+        """测试还原态合法"""
+        assert check_cube_state(SOLVED_STATE) is None
+
+    def test_random_scrambles_are_valid(self):
+        """测试随机打乱得到的状态全部合法"""
+        rng = random.Random(8)
+        for _ in range(200):
+            state = apply_moves(SOLVED_STATE, [rng.choice(MOVE_NAMES) for _ in range(25)])
+            assert check_cube_state(state) is None
+
+    def test_validate_returns_code(self):
+        """测试 validate_cube_state 原样返回合法编码"""
+        assert validate_cube_state(SOLVED_STATE) == SOLVED_STATE
+
+
+class TestInvalidStates:
+    """非法状态测试类"""
+
+    def test_length(self):
+        """测试长度错误"""
+        assert check_cube_state("UUU")["code"] == "length"
+
+    def test_unrecognized_color(self):
+        """测试无法识别的颜色"""
+        reason = check_cube_state(with_facelets(SOLVED_STATE, f0='?'))
+        assert reason["code"] == "invalid_color"
+        assert reason["facelet"] == 0
+
+    def test_center(self):
+        """测试中心块错误"""
+        reason = check_cube_state(with_facelets(SOLVED_STATE, f4='R', f13='U'))
+        assert reason["code"] == "center"
+        assert reason["face"] == "U"
+
+    def test_color_count(self):
+        """测试某种颜色数量不是 9"""
+        reason = check_cube_state(with_facelets(SOLVED_STATE, f0='R'))
+        assert reason["code"] == "color_count"
+        assert reason["color"] == "U"
+        assert reason["count"] == 8
+
+    def test_nonexistent_piece(self):
+        """测试不存在的小块（棱块两面同色）"""
+        reason = check_cube_state(with_facelets(SOLVED_STATE, f5='R', f12='U'))
+        assert reason["code"] == "invalid_piece"
+        assert reason["cubie"] == "UR"
+
+    def test_mirrored_corner_is_rejected(self):
+        """测试颜色顺序镜像的角块（现实中不存在）被拒绝"""
+        state = with_facelets(SOLVED_STATE, f8='D', f29='U')
+        reason = check_cube_state(state)
+        assert reason["code"] == "invalid_piece"
+        assert reason["cubie"] == "URF"
+
+    def test_duplicate_piece(self):
+        """测试同一棱块出现两次"""
+        state = with_facelets(SOLVED_STATE, f10='F', f25='R')
+        reason = check_cube_state(state)
+        assert reason["code"] == "duplicate_piece"
+        assert reason["piece"] == "UF"
+
+    def test_twisted_corner(self):
+        """测试单个角块被拧"""
+        state = with_facelets(SOLVED_STATE, f8='F', f9='U', f20='R')
+        reason = check_cube_state(state)
+        assert reason["code"] == "corner_twist"
+        assert reason["cubie"] == "URF"
+
+    def test_flipped_edge(self):
+        """测试单个棱块被翻"""
+        state = apply_moves(with_facelets(SOLVED_STATE, f7='F', f19='U'), ["R1", "D2"])
+        reason = check_cube_state(state)
+        assert reason["code"] == "edge_flip"
+        assert len(reason["cubies"]) % 2 == 1
+
+    def test_swapped_edges_parity(self):
+        """测试两个棱块对调（奇偶性错误）"""
+        state = with_facelets(SOLVED_STATE, f10='F', f19='R')
+        assert check_cube_state(state)["code"] == "parity"
+
+    def test_validate_raises_structured_error(self):
+        """测试 validate_cube_state 抛出带原因的 InvalidCubeStateError"""
+        state = with_facelets(SOLVED_STATE, f7='F', f19='U')
+        with pytest.raises(InvalidCubeStateError) as exc:
+            validate_cube_state(state)
+        assert exc.value.reason["code"] == "edge_flip"
+        assert isinstance(exc.value, ValueError)
+
+
+class TestConvertIntegration:
+    """与 convert_cube_state 的集成测试类"""
+
+    def test_validate_kociemba_state_uses_cubie_checks(self):
+        """测试原有校验函数也能发现拧角"""
+        valid, msg = validate_kociemba_state(with_facelets(SOLVED_STATE, f8='F', f9='U', f20='R'))
+        assert valid is False
+        assert "URF" in msg
+
+    def test_state_to_kociemba_rejects_parity(self):
+        """测试请求状态转换时拒绝奇偶错误"""
+        with pytest.raises(InvalidCubeStateError):
+            state_to_kociemba(with_facelets(SOLVED_STATE, f10='F', f19='R'))
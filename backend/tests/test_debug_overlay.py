@@ -0,0 +1,126 @@
+"""
+debug_overlay 调试图模式测试
+
+验证 off / sampled / on_demand 三种模式的行为、按会话隔离的写盘目录与 LRU 淘汰。
+"""
+
+from unittest.mock import patch
+
+import cv2
+import numpy as np
+import pytest
+
+import debug_overlay
+from debug_overlay import DebugOverlayRecorder, debug_filename
+
+
+def stickers(count=9):
+    return [{'x': 50 + 10 * i, 'y': 50, 'color': 'red', 'conf': 0.9, 'box': (40 + 10 * i, 40, 60 + 10 * i, 60)}
+            for i in range(count)]
+
+
+@pytest.fixture
+def image():
+    return np.zeros((120, 200, 3), np.uint8)
+
+
+class TestModes:
+    """调试图模式测试类"""
+
+    def test_unknown_mode(self):
+        """测试不支持的模式"""
+        with pytest.raises(ValueError):
+            DebugOverlayRecorder(mode="always")
+
+    def test_off_keeps_nothing(self, image, tmp_path):
+        """测试 off 模式不记录也不写盘"""
+        recorder = DebugOverlayRecorder(mode="off", default_dir=str(tmp_path))
+        assert recorder.record("s1", "white", image, stickers()) is None
+        assert recorder.get("s1", "U") is None
+        assert list(tmp_path.iterdir()) == []
+
+    def test_on_demand_renders_lazily(self, image):
+        """测试 on_demand 模式只保留检测结果，请求时再渲染为 JPEG"""
+        recorder = DebugOverlayRecorder(mode="on_demand")
+        with patch("debug_overlay.draw_debug_boxes", wraps=debug_overlay.draw_debug_boxes) as draw:
+            recorder.record("s1", "white", image, stickers())
+            assert draw.call_count == 0
+
+            content = recorder.render("s1", "U")
+            assert draw.call_count == 1
+
+        decoded = cv2.imdecode(np.frombuffer(content, np.uint8), cv2.IMREAD_COLOR)
+        assert decoded.shape == image.shape
+        assert recorder.faces("s1") == ["white"]
+        assert recorder.render("s2", "U") is None
+
+    def test_on_demand_evicts_oldest_session(self, image):
+        """测试超过会话上限时淘汰最久未更新的会话"""
+        recorder = DebugOverlayRecorder(mode="on_demand", max_sessions=2)
+        for session in ("a", "b", "c"):
+            recorder.record(session, "white", image, stickers())
+
+        assert recorder.get("a", "white") is None
+        assert recorder.get("c", "white") is not None
+        assert recorder.stats()["sessions"] == 2
+
+        recorder.drop("c")
+        assert recorder.get("c", "white") is None
+
+    def test_on_demand_keeps_downscaled_copy(self):
+        """测试 on_demand 模式保留缩小后的副本而非原图引用，检测框按比例缩放"""
+        large = np.zeros((2000, 3000, 3), np.uint8)
+        recorder = DebugOverlayRecorder(mode="on_demand", max_side=300)
+        recorder.record("s1", "white", large, [{'color': 'red', 'conf': 0.9, 'box': (1000, 500, 1500, 1000)}])
+
+        entry = recorder.get("s1", "white")
+        assert entry["image"].shape == (200, 300, 3)
+        assert entry["image"].base is not large
+        assert entry["stickers"][0]["box"] == (100, 50, 150, 100)
+        assert recorder.stats()["bytes"] == 200 * 300 * 3
+
+    def test_on_demand_byte_budget(self, image):
+        """测试总字节数超过上限时淘汰最久未用的会话与当前会话中较早的面"""
+        face_bytes = image.nbytes
+        recorder = DebugOverlayRecorder(mode="on_demand", max_bytes=2 * face_bytes)
+        recorder.record("a", "white", image, stickers())
+        recorder.record("b", "white", image, stickers())
+        recorder.record("c", "white", image, stickers())
+
+        assert recorder.get("a", "white") is None
+        assert recorder.stats()["bytes"] == 2 * face_bytes
+
+        for face_name in ("red", "green"):
+            recorder.record("c", face_name, image, stickers())
+        assert recorder.faces("c") == ["red", "green"]
+        assert recorder.faces("b") == []
+
+        recorder.record("c", "green", image, stickers())
+        recorder.drop("c")
+        assert recorder.stats()["bytes"] == 0
+
+    def test_sampled_writes_to_session_dir(self, image, tmp_path):
+        """测试 sampled 模式在后台写入各自的会话目录"""
+        recorder = DebugOverlayRecorder(mode="sampled", sample_rate=1.0)
+        dirs = {"s1": tmp_path / "s1", "s2": tmp_path / "s2"}
+
+        with patch("session_manager.get_session_dir", side_effect=lambda sid: {"results_dir": str(dirs[sid])}):
+            first = recorder.record("s1", "white", image, stickers())
+            second = recorder.record("s2", "white", image, stickers(5))
+            paths = [first.result(), second.result()]
+        recorder.shutdown()
+
+        assert paths[0] == str(dirs["s1"] / "debug_steps" / "white_ok.jpg")
+        assert paths[1] == str(dirs["s2"] / "debug_steps" / "white_partial.jpg")
+        assert recorder.stats()["written"] == 2
+
+    def test_sampled_skips_unsampled_faces(self, image, tmp_path):
+        """测试抽样比例为 0 时不写盘"""
+        recorder = DebugOverlayRecorder(mode="sampled", sample_rate=0.0, default_dir=str(tmp_path))
+        assert recorder.record(None, "white", image, stickers()) is None
+        assert list(tmp_path.iterdir()) == []
+
+    def test_debug_filename(self):
+        """测试调试图文件名标记"""
+        assert debug_filename("white", 9) == "white_ok.jpg"
+        assert debug_filename("white", 7) == "white_partial.jpg"
@@ -0,0 +1,88 @@
+"""
+detection_cache 检测结果缓存测试
+
+验证哈希键、LRU 淘汰、命中统计与返回副本。
+"""
+
+import numpy as np
+
+from detection_cache import DetectionCache, image_key, model_fingerprint
+
+MATRIX = [['red'] * 3 for _ in range(3)]
+STICKERS = [{'x': 1.0, 'y': 2.0, 'color': 'red', 'conf': 0.9, 'box': (0, 0, 2, 4)}]
+
+
+class TestImageKey:
+    """哈希键测试类"""
+
+    def test_same_pixels_same_key(self):
+        """测试内容相同的图像得到相同的键（与内存布局无关）"""
+        img = np.arange(48, dtype=np.uint8).reshape(4, 4, 3)
+        view = np.asfortranarray(img)
+        assert image_key(img, "v1", (640, 0.25, 0.6)) == image_key(view, "v1", (640, 0.25, 0.6))
+
+    def test_key_depends_on_content_model_and_params(self):
+        """测试像素、形状、模型版本与推理参数都会改变键"""
+        img = np.zeros((4, 4, 3), np.uint8)
+        base = image_key(img, "v1", (640, 0.25, 0.6))
+        changed = img.copy()
+        changed[0, 0, 0] = 1
+
+        assert image_key(changed, "v1", (640, 0.25, 0.6)) != base
+        assert image_key(img.reshape(8, 2, 3), "v1", (640, 0.25, 0.6)) != base
+        assert image_key(img, "v2", (640, 0.25, 0.6)) != base
+        assert image_key(img, "v1", (320, 0.25, 0.6)) != base
+
+    def test_model_fingerprint(self, tmp_path):
+        """测试模型文件内容变化后版本标识变化"""
+        model = tmp_path / "best.pt"
+        model.write_bytes(b"a")
+        first = model_fingerprint(str(model))
+        model.write_bytes(b"ab")
+        assert model_fingerprint(str(model)) != first
+        assert model_fingerprint(str(tmp_path / "missing.pt")) == "missing.pt"
+
+
+class TestDetectionCache:
+    """LRU 缓存测试类"""
+
+    def test_hit_and_miss_stats(self):
+        """测试命中率统计"""
+        cache = DetectionCache(max_size=4)
+        assert cache.get("a") is None
+        cache.put("a", STICKERS, MATRIX)
+        assert cache.get("a") == (STICKERS, MATRIX)
+
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["hit_rate"] == 0.5
+
+    def test_lru_eviction(self):
+        """测试超过容量时淘汰最久未使用的条目"""
+        cache = DetectionCache(max_size=2)
+        cache.put("a", STICKERS, MATRIX)
+        cache.put("b", STICKERS, MATRIX)
+        cache.get("a")
+        cache.put("c", STICKERS, MATRIX)
+
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.stats()["evictions"] == 1
+
+    def test_returns_copies(self):
+        """测试调用方修改返回值不影响缓存"""
+        cache = DetectionCache(max_size=2)
+        cache.put("a", STICKERS, MATRIX)
+        stickers, matrix = cache.get("a")
+        matrix[0][0] = 'blue'
+        stickers[0]['color'] = 'blue'
+
+        assert cache.get("a") == (STICKERS, MATRIX)
+
+    def test_disabled(self):
+        """测试容量为 0 时关闭缓存"""
+        cache = DetectionCache(max_size=0)
+        cache.put("a", STICKERS, MATRIX)
+        assert cache.get("a") is None
+        assert cache.stats()["enabled"] is False
@@ -0,0 +1,210 @@
+"""
+detector_backends 推理后端测试
+
+验证 letterbox、YOLOv8 输出解码与 NMS 的坐标还原，以及后端选择逻辑。
+ONNX Runtime / OpenVINO 本身不参与测试，用构造的检测头输出代替。
+"""
+
+import sys
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+
+from detector_backends import (
+    letterbox, preprocess_batch, postprocess, create_backend, resolve_model_path,
+    UltralyticsBackend, _TensorBackend,
+)
+
+NUM_CLASSES = 6
+
+
+def head_output(boxes, size_meta):
+    """按原图坐标的 (x1, y1, x2, y2, conf, cls) 构造 letterbox 坐标系下的检测头输出 (1, 4+nc, K)"""
+    scale, (pad_x, pad_y), _ = size_meta
+    columns = []
+    for x1, y1, x2, y2, conf, cls in boxes:
+        lx1, ly1 = x1 * scale + pad_x, y1 * scale + pad_y
+        lx2, ly2 = x2 * scale + pad_x, y2 * scale + pad_y
+        column = np.zeros(4 + NUM_CLASSES, dtype=np.float32)
+        column[:4] = [(lx1 + lx2) / 2, (ly1 + ly2) / 2, lx2 - lx1, ly2 - ly1]
+        column[4 + cls] = conf
+        columns.append(column)
+    return np.stack(columns, axis=1)[None]
+
+
+class TestPreprocess:
+    """前处理测试类"""
+
+    def test_letterbox_pads_to_square(self):
+        """测试竖图等比缩放后左右对称填充"""
+        img = np.zeros((1280, 960, 3), np.uint8)
+        padded, scale, (left, top) = letterbox(img, 640)
+        assert padded.shape == (640, 640, 3)
+        assert scale == pytest.approx(0.5)
+        assert (left, top) == (80, 0)
+        assert padded[0, 0].tolist() == [114, 114, 114]
+
+    def test_preprocess_batch_layout(self):
+        """测试输出为 NCHW、RGB、0-1 归一化"""
+        img = np.zeros((64, 64, 3), np.uint8)
+        img[:, :] = (255, 0, 0)  # BGR 蓝色
+        batch, metas = preprocess_batch([img, img], 64)
+        assert batch.shape == (2, 3, 64, 64)
+        assert batch.dtype == np.float32
+        assert batch[0, 2, 0, 0] == pytest.approx(1.0)  # RGB 中的 B 通道
+        assert batch[0, 0, 0, 0] == pytest.approx(0.0)
+        assert len(metas) == 2
+
+
+class TestPostprocess:
+    """后处理测试类"""
+
+    def test_boxes_map_back_to_original_coordinates(self):
+        """测试解码后的框还原到原图坐标"""
+        img = np.zeros((480, 360, 3), np.uint8)
+        _, metas = preprocess_batch([img], 640)
+        expected = [(10, 20, 110, 120, 0.9, 3), (200, 300, 260, 360, 0.8, 4)]
+
+        result = postprocess(head_output(expected, metas[0]), metas, conf=0.25, iou=0.6)[0]
+
+        assert result.shape == (2, 6)
+        order = np.argsort(-result[:, 4])
+        np.testing.assert_allclose(result[order], np.array(expected, dtype=np.float32), atol=0.01)
+
+    def test_confidence_threshold_and_agnostic_nms(self):
+        """测试低置信度框被过滤，重叠框不分类别只保留最高分"""
+        img = np.zeros((640, 640, 3), np.uint8)
+        _, metas = preprocess_batch([img], 640)
+        boxes = [
+            (100, 100, 200, 200, 0.9, 0),
+            (102, 101, 201, 199, 0.7, 1),  # 与第一个框高度重叠、类别不同
+            (400, 400, 450, 450, 0.1, 2),  # 低于阈值
+        ]
+
+        result = postprocess(head_output(boxes, metas[0]), metas, conf=0.25, iou=0.6)[0]
+
+        assert len(result) == 1
+        assert result[0, 5] == 0
+
+    def test_empty_result(self):
+        """测试没有候选框超过阈值时返回空数组"""
+        img = np.zeros((64, 64, 3), np.uint8)
+        _, metas = preprocess_batch([img], 64)
+        output = np.zeros((1, 4 + NUM_CLASSES, 10), np.float32)
+        assert postprocess(output, metas, 0.25, 0.6)[0].shape == (0, 6)
+
+
+class TestTensorBackend:
+    """张量后端公共逻辑测试类"""
+
+    def test_fixed_batch_model_is_called_in_chunks(self):
+        """测试导出为固定 batch=1 的模型逐张推理，结果仍按图片返回"""
+        calls = []
+
+        class FixedBatch(_TensorBackend):
+            fixed_batch = 1
+
+            def _run(self, batch):
+                calls.append(batch.shape[0])
+                return np.zeros((batch.shape[0], 4 + NUM_CLASSES, 5), np.float32)
+
+        images = [np.zeros((32, 32, 3), np.uint8)] * 3
+        results = FixedBatch().predict(images, imgsz=32)
+
+        assert calls == [1, 1, 1]
+        assert len(results) == 3
+
+    def test_backend_without_run_cannot_be_created(self):
+        """测试未实现 _run 的后端在创建时即报错，而不是推理时才失败"""
+        class Incomplete(_TensorBackend):
+            pass
+
+        with pytest.raises(TypeError):
+            Incomplete()
+
+
+class TestBackendSelection:
+    """后端选择测试类"""
+
+    def test_unknown_backend(self, tmp_path):
+        """测试不支持的后端名称"""
+        with pytest.raises(ValueError):
+            resolve_model_path(str(tmp_path), backend="tensorrt")
+
+    def test_missing_model_file(self, tmp_path):
+        """测试模型文件不存在"""
+        with pytest.raises(FileNotFoundError):
+            create_backend(str(tmp_path), backend="onnx")
+
+    def test_default_model_files(self, tmp_path):
+        """测试各后端的默认模型文件名"""
+        assert resolve_model_path("m", backend="pytorch") == "m/best.pt"
+        assert resolve_model_path("m", backend="onnx") == "m/best.onnx"
+        assert resolve_model_path("m", backend="onnx", model="best_int8.onnx") == "m/best_int8.onnx"
+
+    def test_int8_precision_selects_quantized_model(self):
+        """测试 int8 精度选择量化模型，显式指定的模型文件优先"""
+        assert resolve_model_path("m", backend="onnx", precision="int8") == "m/best_int8.onnx"
+        assert resolve_model_path("m", backend="onnx", model="x.onnx", precision="int8") == "m/x.onnx"
+
+    def test_int8_unsupported_backend(self):
+        """测试没有量化模型的后端与未知精度"""
+        with pytest.raises(ValueError):
+            resolve_model_path("m", backend="pytorch", precision="int8")
+        with pytest.raises(ValueError):
+            resolve_model_path("m", backend="onnx", precision="fp8")
+
+    def test_ultralytics_backend_converts_results(self):
+        """测试 ultralytics 结果转换为 (K, 6) 数组"""
+        fake = MagicMock()
+        detections = np.array([[1, 2, 3, 4, 0.9, 5]], np.float32)
+        result = MagicMock()
+        result.boxes.data.cpu.return_value.numpy.return_value = detections
+        fake.YOLO.return_value.predict.return_value = [result]
+
+        with patch.dict(sys.modules, {"ultralytics": fake}):
+            backend = UltralyticsBackend("best.pt")
+            output = backend.predict([np.zeros((8, 8, 3), np.uint8)])
+
+        assert output[0] is detections
+        assert fake.YOLO.return_value.predict.call_args.kwargs["agnostic_nms"] is True
+
+    def test_ultralytics_backend_leaves_torch_threads_to_pool(self):
+        """测试副本构造时不修改进程级的 torch 线程数（由 detector_pool 设置一次）"""
+        fake_torch = MagicMock()
+
+        with patch.dict(sys.modules, {"ultralytics": MagicMock(), "torch": fake_torch}):
+            UltralyticsBackend("best.pt", threads=3)
+
+        fake_torch.set_num_threads.assert_not_called()
+
+
+class TestExportVerification:
+    """导出模型一致性校验测试类"""
+
+    def test_match_detections_pairs_same_class(self):
+        """测试按类别和 IoU 配对，坐标轻微偏差仍可配对"""
+        from export_detector import match_detections
+
+        reference = np.array([[0, 0, 10, 10, 0.9, 1], [20, 20, 30, 30, 0.8, 2]], np.float32)
+        candidate = np.array([[20.5, 20, 30, 30.5, 0.79, 2], [0, 0, 10, 10, 0.9, 3]], np.float32)
+
+        pairs, missing, extra = match_detections(reference, candidate)
+
+        assert pairs == [(1, 0)]
+        assert missing == [0]
+        assert extra == [1]
+
+    def test_compare_backends_passes_for_identical_outputs(self):
+        """测试两个后端输出一致时校验通过"""
+        from export_detector import compare_backends
+
+        backend = MagicMock()
+        backend.predict.return_value = [np.array([[0, 0, 10, 10, 0.9, 1]], np.float32)]
+        images = [np.zeros((8, 8, 3), np.uint8)] * 2
+
+        report = compare_backends(backend, backend, images)
+
+        assert report["passed"] is True
+        assert report["matched"] == 2
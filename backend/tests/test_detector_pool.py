@@ -0,0 +1,209 @@
+"""
+DetectorPool 检测模型副本池测试
+
+使用假的检测后端，验证副本租用互斥、线程数分配、等待超时、按推理次数回收与统计。
+"""
+
+import sys
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from detector_pool import DetectorPool, DetectorBusyError, replica_threads
+
+
+class FakeBackend:
+    """记录并发调用数的假后端"""
+
+    name = "fake"
+    active = 0
+    max_active = 0
+    lock = threading.Lock()
+
+    def __init__(self, threads, delay=0.0):
+        self.threads = threads
+        self.delay = delay
+        self.model = object()
+        self.model_path = "models/best.pt"
+        self.calls = 0
+
+    def predict(self, images, imgsz=640, conf=0.25, iou=0.6):
+        with FakeBackend.lock:
+            FakeBackend.active += 1
+            FakeBackend.max_active = max(FakeBackend.max_active, FakeBackend.active)
+        self.calls += 1
+        time.sleep(self.delay)
+        with FakeBackend.lock:
+            FakeBackend.active -= 1
+        return [id(self)] * len(images)
+
+
+@pytest.fixture
+def factory():
+    FakeBackend.active = FakeBackend.max_active = 0
+    created = []
+
+    def make(threads, delay=0.0):
+        backend = FakeBackend(threads, delay)
+        created.append(backend)
+        return backend
+
+    make.created = created
+    return make
+
+
+def run_concurrently(fn, count):
+    start = threading.Barrier(count)
+    results = [None] * count
+
+    def client(i):
+        start.wait()
+        results[i] = fn()
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(count)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+class TestReplicaThreads:
+    """线程数分配测试类"""
+
+    def test_threads_split_across_replicas(self):
+        """测试多副本平分 CPU 核数，单副本交给运行时决定，显式配置优先"""
+        assert replica_threads(4, threads=0, cpu_count=16) == 4
+        assert replica_threads(3, threads=0, cpu_count=8) == 2
+        assert replica_threads(8, threads=0, cpu_count=4) == 1
+        assert replica_threads(1, threads=0, cpu_count=16) == 0
+        assert replica_threads(4, threads=6, cpu_count=16) == 6
+
+    def test_factory_receives_thread_count(self, factory):
+        """测试每个副本按分配的线程数创建"""
+        pool = DetectorPool(factory, size=2, threads=3)
+
+        assert [b.threads for b in factory.created] == [3, 3]
+        assert pool.name == "fake" and pool.model_path == "models/best.pt"
+        assert pool.model is factory.created[0].model
+
+    def test_pytorch_threads_set_once_per_process(self, factory, capsys):
+        """测试 pytorch 后端多副本时只在进程级设置一次 torch 线程数，并提示无法按副本绑定"""
+        fake_torch = MagicMock()
+
+        def make_pytorch(threads):
+            backend = factory(threads)
+            backend.name = "pytorch"
+            return backend
+
+        with patch.dict(sys.modules, {"torch": fake_torch}):
+            DetectorPool(make_pytorch, size=3, threads=2)
+
+        fake_torch.set_num_threads.assert_called_once_with(2)
+        assert "onnx / openvino" in capsys.readouterr().out
+
+    def test_other_backends_do_not_touch_torch(self, factory):
+        """测试 onnx 等后端的副本池不修改 torch 线程数"""
+        fake_torch = MagicMock()
+
+        with patch.dict(sys.modules, {"torch": fake_torch}):
+            DetectorPool(factory, size=2, threads=3)
+
+        fake_torch.set_num_threads.assert_not_called()
+
+
+class TestLeasing:
+    """租用测试类"""
+
+    def test_replica_used_by_one_request_at_a_time(self, factory):
+        """测试单副本时并发请求依次执行，不会同时调用同一个模型"""
+        pool = DetectorPool(lambda threads: factory(threads, delay=0.02), size=1)
+
+        run_concurrently(lambda: pool.predict([1]), 4)
+
+        assert FakeBackend.max_active == 1
+        assert pool.stats()["leases"] == 4
+
+    def test_replicas_run_in_parallel(self, factory):
+        """测试多副本时并发请求同时推理，每个副本都被用到"""
+        pool = DetectorPool(lambda threads: factory(threads, delay=0.05), size=3)
+
+        results = run_concurrently(lambda: pool.predict([1])[0], 3)
+
+        assert FakeBackend.max_active == 3
+        assert len(set(results)) == 3
+
+    def test_lease_timeout(self, factory):
+        """测试等待空闲副本超时时抛出 DetectorBusyError"""
+        pool = DetectorPool(lambda threads: factory(threads, delay=0.2), size=1, lease_timeout=0.01)
+        holder = threading.Thread(target=pool.predict, args=([1],))
+        holder.start()
+        time.sleep(0.05)
+
+        with pytest.raises(DetectorBusyError):
+            pool.predict([1])
+        holder.join()
+        assert pool.stats()["timeouts"] == 1
+
+    def test_failed_inference_returns_replica(self, factory):
+        """测试推理抛出异常后副本仍归还到池中"""
+        pool = DetectorPool(factory, size=1, lease_timeout=0.1)
+        factory.created[0].predict = lambda *a, **k: 1 / 0
+
+        with pytest.raises(ZeroDivisionError):
+            pool.predict([1])
+        assert pool.stats()["idle"] == 1
+
+
+class TestRecycling:
+    """回收测试类"""
+
+    def test_replica_reloaded_after_n_inferences(self, factory):
+        """测试副本推理 recycle_after 次后被丢弃，下次租用时重新加载"""
+        pool = DetectorPool(factory, size=1, recycle_after=2)
+
+        first = [pool.predict([1])[0] for _ in range(2)]
+        third = pool.predict([1])[0]
+
+        assert len(factory.created) == 2
+        assert first[0] == first[1] != third
+        stats = pool.stats()
+        assert stats["recycled"] == 1
+        assert stats["inferences"] == [1]
+
+    def test_failed_reload_keeps_slot(self, factory):
+        """测试重新加载失败时保留副本位置，之后的租用会再次尝试加载"""
+        attempts = []
+
+        def flaky(threads):
+            attempts.append(threads)
+            if len(attempts) == 2:
+                raise RuntimeError("load failed")
+            return factory(threads)
+
+        pool = DetectorPool(flaky, size=1, recycle_after=1, lease_timeout=0.1)
+        pool.predict([1])
+
+        with pytest.raises(RuntimeError):
+            pool.predict([1])
+        assert pool.predict([1]) == [id(factory.created[-1])]
+        assert len(attempts) == 3
+
+
+class TestWarmUp:
+    """预热测试类"""
+
+    def test_every_replica_runs_once(self, factory):
+        """测试预热让每个副本各推理一次，不计入推理次数，结束后全部归还"""
+        pool = DetectorPool(factory, size=3, recycle_after=1)
+
+        latencies = pool.warm_up([1], imgsz=320)
+
+        assert len(latencies) == 3
+        assert [b.calls for b in factory.created] == [1, 1, 1]
+        stats = pool.stats()
+        assert stats["idle"] == 3
+        assert stats["inferences"] == [0, 0, 0]
+        assert stats["recycled"] == 0
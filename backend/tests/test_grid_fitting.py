@@ -0,0 +1,135 @@
+"""
+grid_fitting 贴纸网格拟合测试
+
+验证旋转/透视变形下的格子对应、缺失格子与缺整行、多面批量处理，
+以及 fill_matrices 的矩阵填充。
+"""
+
+import numpy as np
+
+from grid_fitting import CELL_COORDS, fit_grids, fill_matrices, pack_stickers, confidence_matrix
+
+COLORS = ['white', 'yellow', 'red', 'orange', 'blue', 'green', 'white', 'red', 'blue']
+
+
+def lattice(angle_deg=0.0, pitch=100.0, center=(320.0, 320.0), persp=None):
+    """行优先 9 个格点在图像中的位置 (9, 2)"""
+    pts = np.c_[CELL_COORDS - 1, np.ones(9)]
+    if persp is not None:
+        pts = pts @ np.asarray(persp).T
+    pts = pts[:, :2] / pts[:, 2:3]
+    a = np.radians(angle_deg)
+    rot = np.array([[np.cos(a), -np.sin(a)], [np.sin(a), np.cos(a)]])
+    return pts @ rot.T * pitch + np.asarray(center)
+
+
+def stickers_at(points, cells, size=80):
+    return [{'x': float(x), 'y': float(y), 'color': COLORS[i], 'conf': 0.9,
+             'box': (int(x - size / 2), int(y - size / 2), int(x + size / 2), int(y + size / 2))}
+            for i, (x, y) in zip(cells, points)]
+
+
+def fit_one(points, image_size=(640, 640)):
+    centers = np.zeros((1, 9, 2))
+    mask = np.zeros((1, 9), dtype=bool)
+    centers[0, :len(points)] = points
+    mask[0, :len(points)] = True
+    return fit_grids(centers, mask, image_sizes=[image_size])
+
+
+class TestFitGrids:
+    """网格拟合测试类"""
+
+    def test_shuffled_clean_grid(self):
+        """测试正对的网格在点顺序打乱时也能正确对应"""
+        order = np.random.default_rng(0).permutation(9)
+        assignment, _ = fit_one(lattice()[order])
+
+        assert list(assignment[0]) == list(order)
+
+    def test_rotated_and_perspective_grid(self):
+        """测试旋转 + 透视变形（包围盒等分会错位）时的对应关系"""
+        persp = [[1, 0.12, 0], [-0.1, 1, 0], [0.07, -0.06, 1]]
+        points = lattice(angle_deg=22, persp=persp)
+        order = np.random.default_rng(1).permutation(9)
+
+        assignment, positions = fit_one(points[order])
+
+        assert list(assignment[0]) == list(order)
+        np.testing.assert_allclose(positions[0], points, atol=1e-6)
+
+    def test_missing_row_uses_image_center(self):
+        """测试缺一整行时按图像中心判断缺的是哪一行，并推断缺失格子的位置"""
+        points = lattice(angle_deg=10)
+        assignment, positions = fit_one(points[3:])
+
+        assert list(assignment[0, :6]) == list(range(3, 9))
+        assert list(assignment[0, 6:]) == [-1, -1, -1]
+        np.testing.assert_allclose(positions[0, :3], points[:3], atol=1.0)
+
+    def test_single_sticker_falls_in_center_cell(self):
+        """测试只有一个点时按贴纸框估计格距，落在图像中心所在的格子"""
+        centers = np.zeros((1, 9, 2))
+        centers[0, 0] = (320, 320)
+        mask = np.zeros((1, 9), dtype=bool)
+        mask[0, 0] = True
+        box_sizes = np.full((1, 9), 80.0)
+
+        assignment, _ = fit_grids(centers, mask, image_sizes=[(640, 640)], box_sizes=box_sizes)
+
+        assert assignment[0, 0] == 4
+
+    def test_batched_faces_are_independent(self):
+        """测试多面一次处理的结果与逐面处理一致，空面全部为 -1"""
+        faces = [lattice(angle_deg=-15)[::-1], lattice(pitch=70, center=(200, 260)), np.zeros((0, 2))]
+        centers = np.zeros((3, 9, 2))
+        mask = np.zeros((3, 9), dtype=bool)
+        for f, points in enumerate(faces):
+            centers[f, :len(points)] = points
+            mask[f, :len(points)] = True
+
+        assignment, positions = fit_grids(centers, mask)
+
+        assert assignment.shape == (3, 9) and positions.shape == (3, 9, 2)
+        assert list(assignment[0]) == list(range(8, -1, -1))
+        assert list(assignment[1]) == list(range(9))
+        assert (assignment[2] == -1).all()
+
+    def test_empty_batch(self):
+        """测试没有任何面时返回空数组"""
+        assignment, positions = fit_grids(np.zeros((0, 9, 2)), np.zeros((0, 9), dtype=bool))
+
+        assert assignment.shape == (0, 9) and positions.shape == (0, 9, 2)
+
+
+class TestFillMatrices:
+    """颜色矩阵填充测试类"""
+
+    def test_pack_stickers(self):
+        """测试打包为 (F, 9, 2) 中心与掩码"""
+        centers, mask, box_sizes = pack_stickers([stickers_at(lattice()[:2], [0, 1]), []])
+
+        assert centers.shape == (2, 9, 2)
+        assert mask.sum(axis=1).tolist() == [2, 0]
+        assert box_sizes[0, 0] == 80
+
+    def test_fills_colors_and_default(self):
+        """测试按格子填入颜色，未检测到的格子为默认值"""
+        points = lattice(angle_deg=18)
+        cells = [0, 1, 2, 3, 5, 6, 7, 8]
+        matrices = fill_matrices([stickers_at(points[cells], cells), []], [(640, 640), (640, 640)])
+
+        expected = [COLORS[0:3], COLORS[3:6], COLORS[6:9]]
+        expected[1][1] = 'black'
+        assert matrices[0] == expected
+        assert matrices[1] == [['black'] * 3] * 3
+
+    def test_confidence_matrix_follows_cells(self):
+        """测试置信度按拟合出的格子排列，未检测到的格子为 0"""
+        points = lattice(angle_deg=18)
+        cells = [0, 1, 2, 3, 5, 6, 7, 8]
+        stickers = stickers_at(points[cells], cells)
+        stickers[-1]['conf'] = 0.5
+        fill_matrices([stickers], [(640, 640)])
+
+        assert confidence_matrix(stickers) == [[0.9, 0.9, 0.9], [0.9, 0.0, 0.9], [0.9, 0.9, 0.5]]
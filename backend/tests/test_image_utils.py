@@ -16,6 +16,12 @@ from image_utils import (
     _safe_base64_decode,
     _resize_keep_ratio,
     save_base64_images,
+    decode_base64_images,
+    write_images,
+    persist_images_async,
+    read_image_header,
+    reduced_decode_flag,
+    decode_image_bytes,
     FACE_TO_FILENAME
 )
 
@@ -201,6 +207,99 @@ class TestSaveBase64Images:
         mock_imwrite.assert_called()
 
 
+class TestInMemoryDecode:
+    """内存解码与后台保存测试"""
+
+    def test_decode_without_touching_disk(self):
+        """测试解码结果为 BGR 数组，且不调用 imwrite"""
+        with patch('image_utils.cv2.imwrite') as mock_imwrite:
+            images = decode_base64_images({'U': create_test_image_base64('red'), 'X': create_test_image_base64()})
+
+        assert list(images) == ['U']
+        assert images['U'].shape == (10, 10, 3)
+        assert images['U'][0, 0].tolist() == [0, 0, 255]
+        mock_imwrite.assert_not_called()
+
+    def test_decode_skips_invalid_faces(self):
+        """测试解码失败的面被跳过"""
+        images = decode_base64_images({'U': 'invalid_base64_data!!!', 'F': create_test_image_base64('white')})
+        assert list(images) == ['F']
+
+    @pytest.mark.parametrize("image_format", ["jpg", "webp", "png"])
+    def test_write_images_formats(self, tmp_path, image_format):
+        """测试按配置的格式写入图片"""
+        images = decode_base64_images({'U': create_test_image_base64('white')})
+        result = write_images(images, str(tmp_path), image_format=image_format, quality=80)
+
+        assert result == {'U': True}
+        assert cv2.imread(str(tmp_path / f"white.{image_format}")) is not None
+
+    def test_write_images_rejects_unknown_format(self, tmp_path):
+        """测试不支持的格式抛出 ValueError"""
+        with pytest.raises(ValueError):
+            write_images({}, str(tmp_path), image_format="gif")
+
+    def test_persist_images_async(self, tmp_path):
+        """测试后台保存完成后文件存在"""
+        images = decode_base64_images({'U': create_test_image_base64('white')})
+        future = persist_images_async(images, output_dir=str(tmp_path))
+
+        assert future.result(timeout=5) == {'U': True}
+        assert os.listdir(tmp_path) == ["white.jpg"]
+
+
+class TestReducedDecode:
+    """文件头检查与缩小解码测试"""
+
+    @staticmethod
+    def encode(img, ext='.jpg'):
+        return cv2.imencode(ext, img)[1].tobytes()
+
+    def test_read_image_header(self):
+        """测试只读文件头即可得到格式与尺寸，无法识别时返回 None"""
+        img = np.zeros((30, 40, 3), np.uint8)
+        assert read_image_header(self.encode(img)) == ('JPEG', 40, 30)
+        assert read_image_header(self.encode(img, '.png')) == ('PNG', 40, 30)
+        assert read_image_header(b'not an image') is None
+
+    def test_reduced_flag_keeps_longest_side_above_target(self):
+        """测试 JPEG 选择缩小后最长边仍不小于目标尺寸的最大倍数，其他格式完整解码"""
+        assert reduced_decode_flag('JPEG', 4032, 3024, 640) == cv2.IMREAD_REDUCED_COLOR_4
+        assert reduced_decode_flag('JPEG', 6000, 4000, 640) == cv2.IMREAD_REDUCED_COLOR_8
+        assert reduced_decode_flag('JPEG', 1280, 960, 640) == cv2.IMREAD_REDUCED_COLOR_2
+        assert reduced_decode_flag('JPEG', 1000, 750, 640) == cv2.IMREAD_COLOR
+        assert reduced_decode_flag('PNG', 4032, 3024, 640) == cv2.IMREAD_COLOR
+
+    def test_large_jpeg_matches_full_decode(self):
+        """测试大图缩小解码后的尺寸与完整解码再缩放一致，颜色基本一致"""
+        img = np.zeros((2400, 3200, 3), np.uint8)
+        img[:, :1600] = (0, 0, 255)
+        img[:, 1600:] = (255, 255, 255)
+        data = self.encode(img)
+
+        with patch('image_utils.cv2.imdecode', wraps=cv2.imdecode) as mock_imdecode:
+            decoded = decode_image_bytes(data)
+
+        assert mock_imdecode.call_args.args[1] == cv2.IMREAD_REDUCED_COLOR_4
+        reference = _resize_keep_ratio(cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR), 640)
+        assert decoded.shape == reference.shape == (480, 640, 3)
+        assert np.abs(decoded.astype(int) - reference.astype(int)).mean() < 2
+
+    def test_rejects_absurd_dimensions_before_decoding(self):
+        """测试文件头尺寸超限时不调用解码"""
+        data = self.encode(np.zeros((20, 40, 3), np.uint8))
+
+        with patch('image_utils.MAX_UPLOAD_SIDE', 30), patch('image_utils.cv2.imdecode') as mock_imdecode:
+            assert decode_image_bytes(data) is None
+        with patch('image_utils.MAX_UPLOAD_PIXELS', 500), patch('image_utils.cv2.imdecode') as mock_imdecode:
+            assert decode_image_bytes(data) is None
+        mock_imdecode.assert_not_called()
+
+    def test_unrecognized_bytes_rejected(self):
+        """测试无法识别的字节直接返回 None"""
+        assert decode_image_bytes(b'\xff\xd8garbage') is None
+
+
 class TestFaceToFilenameMapping:
     """面名到文件名映射测试"""
 
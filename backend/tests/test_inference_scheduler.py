@@ -0,0 +1,178 @@
+"""
+InferenceScheduler 微批调度测试
+
+使用记录批次的假推理函数，验证跨请求组批、批大小上限、结果分发与统计。
+"""
+
+import threading
+import time
+
+import pytest
+
+from inference_scheduler import InferenceScheduler
+
+
+class RecordingInfer:
+    """记录每个批次的假推理函数，结果为输入值的两倍"""
+
+    def __init__(self, delay=0.0):
+        self.batches = []
+        self.delay = delay
+
+    def __call__(self, images):
+        self.batches.append(list(images))
+        time.sleep(self.delay)
+        return [image * 2 for image in images]
+
+
+@pytest.fixture
+def make_scheduler():
+    schedulers = []
+
+    def factory(infer, **kwargs):
+        scheduler = InferenceScheduler(infer, **kwargs)
+        schedulers.append(scheduler)
+        return scheduler
+
+    yield factory
+    for scheduler in schedulers:
+        scheduler.shutdown()
+
+
+class TestBatching:
+    """组批测试类"""
+
+    def test_concurrent_requests_share_one_batch(self, make_scheduler):
+        """测试等待窗口内多个请求的图片合并为一个批次，结果各自返回"""
+        infer = RecordingInfer()
+        scheduler = make_scheduler(infer, max_batch_size=32, max_wait_ms=200)
+        results = {}
+        start = threading.Barrier(4)
+
+        def client(i):
+            start.wait()
+            results[i] = scheduler.run([i * 10 + k for k in range(6)])
+
+        threads = [threading.Thread(target=client, args=(i,)) for i in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert len(infer.batches) == 1
+        assert len(infer.batches[0]) == 24
+        for i in range(4):
+            assert results[i] == [(i * 10 + k) * 2 for k in range(6)]
+
+    def test_respects_max_batch_size(self, make_scheduler):
+        """测试单批不超过 max_batch_size"""
+        infer = RecordingInfer()
+        scheduler = make_scheduler(infer, max_batch_size=4, max_wait_ms=50)
+
+        assert scheduler.run(list(range(10))) == [i * 2 for i in range(10)]
+        assert all(len(batch) <= 4 for batch in infer.batches)
+        assert sum(len(batch) for batch in infer.batches) == 10
+
+    def test_single_request_waits_at_most_max_wait(self, make_scheduler):
+        """测试单个请求最多等待 max_wait_ms 后即开始推理"""
+        scheduler = make_scheduler(RecordingInfer(), max_batch_size=64, max_wait_ms=20)
+
+        t0 = time.perf_counter()
+        scheduler.run([1])
+        assert time.perf_counter() - t0 < 1.0
+        assert scheduler.stats()["wait_ms"]["max"] < 500
+
+    def test_errors_propagate_to_all_callers(self, make_scheduler):
+        """测试推理失败时同批的所有请求都收到异常"""
+        def failing(images):
+            raise RuntimeError("boom")
+
+        scheduler = make_scheduler(failing, max_batch_size=8, max_wait_ms=1)
+        with pytest.raises(RuntimeError, match="boom"):
+            scheduler.run([1, 2])
+        assert scheduler.stats()["failed_batches"] >= 1
+
+    def test_short_results_fail_whole_batch(self, make_scheduler):
+        """测试推理结果少于批次图片数时整批失败，推理线程继续工作"""
+        calls = []
+
+        def short_once(images):
+            calls.append(len(images))
+            return [image * 2 for image in images][:-1] if len(calls) == 1 else [image * 2 for image in images]
+
+        scheduler = make_scheduler(short_once, max_batch_size=8, max_wait_ms=50, workers=1)
+        with pytest.raises(RuntimeError, match="不一致"):
+            scheduler.run([1, 2, 3], timeout=2)
+
+        assert scheduler.run([4], timeout=2) == [8]
+        assert scheduler.stats()["failed_batches"] == 1
+        assert all(thread.is_alive() for thread in scheduler._threads)
+
+    def test_cancelled_future_does_not_stop_worker(self, make_scheduler):
+        """测试分发结果时 set_result 失败（Future 已被取消）不影响同批其他请求和后续请求"""
+        release = threading.Event()
+
+        def blocking(images):
+            release.wait(2)
+            return [image * 2 for image in images]
+
+        scheduler = make_scheduler(blocking, max_batch_size=8, max_wait_ms=50, workers=1)
+        futures = [scheduler.submit(image) for image in (1, 2, 3)]
+        time.sleep(0.1)
+        futures[0].cancel()
+        release.set()
+
+        assert [f.result(timeout=2) for f in futures[1:]] == [4, 6]
+        assert scheduler.run([5], timeout=2) == [10]
+
+    def test_run_times_out(self, make_scheduler):
+        """测试推理迟迟不返回时 run() 在超时后抛出 TimeoutError"""
+        release = threading.Event()
+        scheduler = make_scheduler(lambda images: release.wait(2) and list(images), max_wait_ms=1, workers=1)
+
+        with pytest.raises(TimeoutError):
+            scheduler.run([1], timeout=0.1)
+        release.set()
+
+    def test_rejects_after_shutdown(self, make_scheduler):
+        """测试关闭后提交抛出异常"""
+        scheduler = make_scheduler(RecordingInfer())
+        scheduler.shutdown()
+        with pytest.raises(RuntimeError):
+            scheduler.submit(1)
+
+    def test_multiple_workers_infer_in_parallel(self, make_scheduler):
+        """测试多个推理线程各自组批并同时推理，关闭时全部退出"""
+        active, peak = [0], [0]
+        lock = threading.Lock()
+
+        def infer(images):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.05)
+            with lock:
+                active[0] -= 1
+            return list(images)
+
+        scheduler = make_scheduler(infer, max_batch_size=1, max_wait_ms=0, workers=3)
+        assert scheduler.run([1, 2, 3]) == [1, 2, 3]
+        assert peak[0] == 3
+
+        scheduler.shutdown()
+        assert not any(thread.is_alive() for thread in scheduler._threads)
+
+
+class TestStats:
+    """统计测试类"""
+
+    def test_histogram_and_counts(self, make_scheduler):
+        """测试批大小分布、图片数与队列深度"""
+        scheduler = make_scheduler(RecordingInfer(), max_batch_size=3, max_wait_ms=50)
+        scheduler.run(list(range(6)))
+
+        stats = scheduler.stats()
+        assert stats["images"] == 6
+        assert sum(size * count for size, count in stats["batch_size_histogram"].items()) == 6
+        assert stats["queue_depth"] == 0
+        assert stats["wait_ms"]["p95"] >= stats["wait_ms"]["p50"] >= 0
@@ -0,0 +1,164 @@
+"""
+quantize_detector 评估指标测试
+
+验证 mAP、颜色混淆矩阵、YOLO 标注读取与报告汇总；
+量化流程用一个小型卷积模型验证（需要 onnx 与 onnxruntime，未安装时跳过）。
+"""
+
+import cv2
+import numpy as np
+import pytest
+
+from quantize_detector import (
+    box_iou, mean_average_precision, color_confusion, load_yolo_labels, build_report, quantize_model,
+    COLOR_NAMES,
+)
+
+
+def gt(*rows):
+    return np.array(rows, dtype=np.float32).reshape(-1, 5)
+
+
+def pred(*rows):
+    return np.array(rows, dtype=np.float32).reshape(-1, 6)
+
+
+class TestMetrics:
+    """mAP 与混淆矩阵测试类"""
+
+    def test_box_iou(self):
+        """测试 IoU 矩阵"""
+        a = np.array([[0, 0, 10, 10]], dtype=np.float32)
+        b = np.array([[0, 0, 10, 10], [5, 0, 15, 10], [20, 20, 30, 30]], dtype=np.float32)
+        assert np.allclose(box_iou(a, b), [[1.0, 1 / 3, 0.0]], atol=1e-6)
+        assert box_iou(a, b[:0]).shape == (1, 0)
+
+    def test_perfect_predictions(self):
+        """测试完全一致的预测 mAP 接近 1"""
+        truths = [gt([0, 0, 10, 10, 0], [20, 0, 30, 10, 4])]
+        preds = [pred([0, 0, 10, 10, 0.9, 0], [20, 0, 30, 10, 0.8, 4])]
+        assert mean_average_precision(preds, truths) == pytest.approx(1.0, abs=0.01)
+        thresholds = np.arange(0.5, 0.96, 0.05)
+        assert mean_average_precision(preds, truths, iou_thresholds=thresholds) == pytest.approx(1.0, abs=0.01)
+
+    def test_wrong_color_and_missed(self):
+        """测试颜色错误与漏检拉低 mAP"""
+        truths = [gt([0, 0, 10, 10, 0], [20, 0, 30, 10, 4])]
+        preds = [pred([0, 0, 10, 10, 0.9, 1])]
+        assert mean_average_precision(preds, truths) == pytest.approx(0.0)
+
+    def test_duplicate_prediction_counts_once(self):
+        """测试同一真值的重复预测只有一个算命中"""
+        truths = [gt([0, 0, 10, 10, 2])]
+        preds = [pred([0, 0, 10, 10, 0.9, 2], [0, 0, 10, 10, 0.8, 2])]
+        assert mean_average_precision(preds, truths) == pytest.approx(1.0, abs=0.01)
+
+        preds = [pred([0, 0, 10, 10, 0.8, 2], [0, 0, 10, 10, 0.9, 5])]
+        truths = [gt([0, 0, 10, 10, 2])]
+        # 错误颜色不影响 cls=2 的 AP，cls=5 无真值不参与平均
+        assert mean_average_precision(preds, truths) == pytest.approx(1.0, abs=0.01)
+
+    def test_color_confusion(self):
+        """测试混淆矩阵的配对、漏检与多检"""
+        truths = [gt([0, 0, 10, 10, 0], [20, 0, 30, 10, 4], [40, 0, 50, 10, 5])]
+        preds = [pred([0, 0, 10, 10, 0.9, 0], [20, 0, 30, 10, 0.8, 5], [60, 0, 70, 10, 0.7, 3])]
+        matrix = color_confusion(preds, truths)
+        nc = len(COLOR_NAMES)
+
+        assert matrix.shape == (nc + 1, nc + 1)
+        assert matrix[0, 0] == 1
+        assert matrix[4, 5] == 1  # white 识别成 yellow
+        assert matrix[5, nc] == 1  # yellow 漏检
+        assert matrix[nc, 3] == 1  # 多检的 red
+        assert matrix.sum() == 4
+
+
+class TestReport:
+    """标注读取与报告汇总测试类"""
+
+    def test_load_yolo_labels(self, tmp_path):
+        """测试 YOLO 归一化标注转换为像素 xyxy"""
+        (tmp_path / "images").mkdir()
+        (tmp_path / "labels").mkdir()
+        (tmp_path / "labels" / "a.txt").write_text("4 0.5 0.5 0.2 0.4\n", encoding="utf-8")
+
+        labels = load_yolo_labels(str(tmp_path / "images" / "a.jpg"), (100, 200, 3))
+        assert np.allclose(labels, [[80, 30, 120, 70, 4]])
+        assert load_yolo_labels(str(tmp_path / "images" / "b.jpg"), (100, 200, 3)) is None
+
+    def test_build_report_uses_reference_as_ground_truth(self):
+        """测试无标注时以 best.pt 结果为真值"""
+        reference = [pred([0, 0, 10, 10, 0.9, 0], [20, 0, 30, 10, 0.9, 4])]
+        quantized = [pred([0, 0, 10, 10, 0.9, 0])]
+        report = build_report([None], None, reference, [40.0], quantized, [10.0])
+
+        assert report["ground_truth"] == "best.pt"
+        assert report["models"]["best.pt"]["map50"] == pytest.approx(1.0, abs=0.01)
+        assert report["models"]["int8"]["map50"] == pytest.approx(0.5, abs=0.01)
+        assert report["map50_drop"] == pytest.approx(0.5, abs=0.01)
+        assert report["speedup"] == pytest.approx(4.0)
+        assert report["models"]["int8"]["confusion"][4][len(COLOR_NAMES)] == 1
+
+
+def tiny_detector(path, imgsz):
+    """两层卷积的小模型，第二层节点名模拟 YOLOv8 检测头（/model.22/）"""
+    onnx = pytest.importorskip("onnx")
+    from onnx import TensorProto, helper, numpy_helper
+
+    rng = np.random.default_rng(0)
+    w1 = numpy_helper.from_array(rng.normal(0, 0.2, (8, 3, 3, 3)).astype(np.float32), "w1")
+    w2 = numpy_helper.from_array(rng.normal(0, 0.2, (10, 8, 1, 1)).astype(np.float32), "w2")
+    graph = helper.make_graph(
+        [helper.make_node("Conv", ["images", "w1"], ["h"], name="/model.0/conv/Conv", pads=[1, 1, 1, 1]),
+         helper.make_node("Relu", ["h"], ["r"], name="/model.0/act/Relu"),
+         helper.make_node("Conv", ["r", "w2"], ["output0"], name="/model.22/cv3/Conv")],
+        "tiny",
+        [helper.make_tensor_value_info("images", TensorProto.FLOAT, [1, 3, imgsz, imgsz])],
+        [helper.make_tensor_value_info("output0", TensorProto.FLOAT, None)],
+        initializer=[w1, w2],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 17)])
+    model.ir_version = 8
+    onnx.save(model, str(path))
+    return onnx
+
+
+class TestQuantizeModel:
+    """静态 INT8 量化流程测试类"""
+
+    def test_quantizes_and_keeps_head_float(self, tmp_path):
+        """测试输出 QDQ 模型：主干被量化，/model.22/ 检测头保持浮点，中间文件被删除，结果可推理"""
+        imgsz = 32
+        onnx = tiny_detector(tmp_path / "best.onnx", imgsz)
+        ort = pytest.importorskip("onnxruntime")
+        pytest.importorskip("onnxruntime.quantization")
+
+        calib = tmp_path / "calib"
+        calib.mkdir()
+        rng = np.random.default_rng(1)
+        for i in range(4):
+            cv2.imwrite(str(calib / f"{i}.jpg"), rng.integers(0, 256, (48, 64, 3), dtype=np.uint8))
+
+        target = quantize_model(str(calib), imgsz=imgsz, models_dir=str(tmp_path))
+
+        assert target == str(tmp_path / "best_int8.onnx")
+        assert not (tmp_path / "best_prep.onnx").exists()
+        nodes = onnx.load(target).graph.node
+        quantized_inputs = {i for n in nodes if n.op_type == "DequantizeLinear" for i in n.output}
+        convs = {n.name: n for n in nodes if n.op_type == "Conv"}
+        # 权重是 Conv 的第二个输入：主干为 INT8 反量化结果，检测头仍为浮点初始值
+        assert convs["/model.0/conv/Conv"].input[1] in quantized_inputs
+        assert convs["/model.22/cv3/Conv"].input[1] == "w2"
+
+        batch = np.random.default_rng(2).random((1, 3, imgsz, imgsz), dtype=np.float32)
+        reference = ort.InferenceSession(str(tmp_path / "best.onnx")).run(None, {"images": batch})[0]
+        quantized = ort.InferenceSession(target).run(None, {"images": batch})[0]
+        assert quantized.shape == reference.shape
+        assert np.abs(quantized - reference).max() < 0.2 * np.abs(reference).max()
+
+    def test_missing_source_model(self, tmp_path):
+        """测试缺少 best.onnx 时给出导出提示"""
+        pytest.importorskip("onnx")
+        pytest.importorskip("onnxruntime.quantization")
+        with pytest.raises(FileNotFoundError, match="export_detector"):
+            quantize_model(str(tmp_path), models_dir=str(tmp_path))
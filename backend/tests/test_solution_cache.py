@@ -0,0 +1,180 @@
+"""
+SolutionCache 解法缓存测试
+
+验证对称规约命中、解法变换回原朝向、LRU 淘汰与磁盘层持久化。
+"""
+
+import random
+
+from cube_geometry import SOLVED_STATE, MOVE_NAMES, apply_moves, invert_moves, conjugate_state
+from convert_cube_state import parse_solution_moves
+from solution_cache import SolutionCache, canonicalize, format_raw_solution
+
+
+def scramble(seed, length=20):
+    rng = random.Random(seed)
+    seq = [rng.choice(MOVE_NAMES) for _ in range(length)]
+    return apply_moves(SOLVED_STATE, seq), invert_moves(seq)
+
+
+def assert_solves(state, raw_solution):
+    assert apply_moves(state, parse_solution_moves(raw_solution)) == SOLVED_STATE
+
+
+class TestCanonicalize:
+    """规范代表测试类"""
+
+    def test_equivalent_states_share_canonical(self):
+        """测试对称变换和求逆后的状态规约到同一代表"""
+        state, solution = scramble(seed=1)
+        canonical = canonicalize(state)[0]
+
+        assert canonicalize(conjugate_state(state, 17))[0] == canonical
+        assert canonicalize(conjugate_state(state, 40))[0] == canonical
+        assert canonicalize(apply_moves(SOLVED_STATE, solution))[0] == canonical
+
+    def test_invalid_state_returns_none(self):
+        """测试无法分解的状态不参与缓存"""
+        assert canonicalize("U" * 54) is None
+
+
+class TestSolutionCache:
+    """SolutionCache 行为测试类"""
+
+    def test_miss_then_hit(self):
+        """测试未命中后写入，再次查询命中"""
+        cache = SolutionCache(max_size=8)
+        state, solution = scramble(seed=2)
+
+        assert cache.lookup(state) is None
+        cache.store(state, format_raw_solution(solution))
+
+        raw = cache.lookup(state)
+        assert_solves(state, raw)
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+
+    def test_symmetric_hit_is_reoriented(self):
+        """测试等价状态命中后，解法被变换到调用方的朝向"""
+        cache = SolutionCache(max_size=8)
+        state, solution = scramble(seed=3)
+        cache.store(state, format_raw_solution(solution))
+
+        for sym in (5, 23, 31, 47):
+            variant = conjugate_state(state, sym)
+            assert_solves(variant, cache.lookup(variant))
+
+        inverse_state = apply_moves(SOLVED_STATE, solution)
+        assert_solves(inverse_state, cache.lookup(inverse_state))
+
+    def test_accepts_twophase_raw_format(self):
+        """测试可直接写入 twophase 原始输出（含步数后缀）"""
+        cache = SolutionCache(max_size=8)
+        state = apply_moves(SOLVED_STATE, ["R1", "U1"])
+        cache.store(state, "U3 R3 (2f)")
+        assert cache.lookup(state) == "U3 R3 (2f)"
+
+    def test_lru_eviction(self):
+        """测试超过容量时淘汰最久未使用的条目"""
+        cache = SolutionCache(max_size=2)
+        states = [scramble(seed=10 + i) for i in range(3)]
+        for state, solution in states:
+            cache.store(state, format_raw_solution(solution))
+
+        assert cache.stats()["size"] == 2
+        assert cache.lookup(states[0][0]) is None
+        assert cache.lookup(states[2][0]) is not None
+
+    def test_disabled_cache(self):
+        """测试容量为 0 时不缓存"""
+        cache = SolutionCache(max_size=0)
+        state, solution = scramble(seed=4)
+        cache.store(state, format_raw_solution(solution))
+        assert cache.lookup(state) is None
+        assert cache.stats()["enabled"] is False
+
+    def test_disk_tier_survives_restart(self, tmp_path):
+        """测试磁盘层在重新创建缓存后仍然命中"""
+        db_path = str(tmp_path / "solutions.sqlite3")
+        state, solution = scramble(seed=5)
+
+        first = SolutionCache(max_size=8, db_path=db_path)
+        first.store(state, format_raw_solution(solution))
+        first.close()
+
+        second = SolutionCache(max_size=8, db_path=db_path)
+        assert_solves(state, second.lookup(state))
+        assert second.stats()["disk_hits"] == 1
+        assert_solves(state, second.lookup(state))
+        assert second.stats()["memory_hits"] == 1
+        second.close()
+
+    def test_disk_tier_keeps_exhausted_budget_and_migrates_old_files(self, tmp_path):
+        """测试磁盘层保存用完的时间预算，旧版本（无该列）的缓存文件自动升级"""
+        import sqlite3
+
+        db_path = str(tmp_path / "solutions.sqlite3")
+        old = sqlite3.connect(db_path)
+        old.execute("CREATE TABLE solutions (canonical TEXT PRIMARY KEY, moves TEXT NOT NULL)")
+        old.commit()
+        old.close()
+        state, solution = scramble(seed=9, length=12)
+
+        first = SolutionCache(max_size=8, db_path=db_path)
+        first.store(state, format_raw_solution(solution), max_length=len(solution) - 1, timeout=5.0)
+        first.close()
+
+        second = SolutionCache(max_size=8, db_path=db_path)
+        assert_solves(state, second.lookup(state, max_length=len(solution) - 1, timeout=5.0))
+        second.close()
+
+
+class TestLengthAwareCache:
+    """与求解档位配合的步数限制测试类"""
+
+    def test_longer_cached_solution_is_a_miss(self):
+        """测试缓存的解长于请求的目标步数时视为未命中"""
+        cache = SolutionCache(max_size=8)
+        state, solution = scramble(seed=6, length=12)
+        cache.store(state, format_raw_solution(solution))
+
+        assert cache.lookup(state, max_length=len(solution) - 1) is None
+        assert cache.lookup(state, max_length=len(solution)) is not None
+
+    def test_store_keeps_shorter_solution(self):
+        """测试已有更短的解时不被更长的解覆盖"""
+        cache = SolutionCache(max_size=8)
+        state = apply_moves(SOLVED_STATE, ["R1", "U1"])
+        cache.store(state, "U3 R3 (2f)")
+        cache.store(state, "U3 R1 R1 R1 R1 R3 (6f)")
+        assert cache.lookup(state) == "U3 R3 (2f)"
+
+    def test_exhausted_budget_accepts_longer_solution(self):
+        """测试超时返回的长解：时间预算不超过已用完的预算时命中，更长的预算仍重新搜索"""
+        cache = SolutionCache(max_size=8)
+        state, solution = scramble(seed=7, length=12)
+        target = len(solution) - 1
+        cache.store(state, format_raw_solution(solution), max_length=target, timeout=5.0)
+
+        assert cache.lookup(state, max_length=target) is None
+        assert_solves(state, cache.lookup(state, max_length=target, timeout=5.0))
+        assert_solves(state, cache.lookup(state, max_length=target - 3, timeout=1.0))
+        assert cache.lookup(state, max_length=target, timeout=10.0) is None
+
+    def test_reached_target_records_no_budget(self):
+        """测试在目标步数内找到的解不记录时间预算（搜索并未超时）"""
+        cache = SolutionCache(max_size=8)
+        state, solution = scramble(seed=8, length=12)
+        cache.store(state, format_raw_solution(solution), max_length=len(solution), timeout=5.0)
+
+        assert cache.lookup(state, max_length=len(solution) - 1, timeout=0.5) is None
+
+    def test_exhausted_budget_kept_with_shorter_solution(self):
+        """测试更长的超时解不覆盖已有的短解，但记录其用完的时间预算"""
+        cache = SolutionCache(max_size=8)
+        state = apply_moves(SOLVED_STATE, ["R1", "U1"])
+        cache.store(state, "U3 R3 (2f)", max_length=25, timeout=0.5)
+        cache.store(state, "U3 R1 R1 R1 R1 R3 (6f)", max_length=1, timeout=5.0)
+
+        assert cache.lookup(state, max_length=1, timeout=5.0) == "U3 R3 (2f)"
@@ -0,0 +1,174 @@
+"""
+SolverPool 求解进程池测试
+
+使用线程模式（size=0）并替换搜索函数，验证任务分发、排队上限、超时与统计。
+"""
+
+import asyncio
+import threading
+import time
+import pytest
+from unittest.mock import patch
+
+from solver_pool import SolverPool, SolverBusyError, SolverTimeoutError, SOLVER_PROFILES, resolve_search_params
+
+
+def wait_idle(pool, timeout=1.0):
+    """等待完成回调归还全部名额"""
+    deadline = time.monotonic() + timeout
+    while pool.stats()["pending"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def pool():
+    """线程模式的求解池，测试结束后关闭"""
+    p = SolverPool(size=0, job_timeout=1.0, queue_depth=2)
+    yield p
+    p.shutdown()
+
+
+class TestSolverPool:
+    """SolverPool 行为测试类"""
+
+    def test_solve_returns_search_result(self, pool):
+        """测试求解结果与工作进程内的搜索耗时原样返回，并透传搜索参数"""
+        with patch('solver_pool.run_twophase_search_timed', return_value=("R1 U1 (2f)", 0.1)) as mock_search:
+            result = asyncio.run(pool.solve("X" * 54, 22, 0.5))
+
+        assert result == ("R1 U1 (2f)", 0.1)
+        mock_search.assert_called_once_with("X" * 54, 22, 0.5)
+
+    def test_search_error_propagates(self, pool):
+        """测试搜索异常传递给调用方"""
+        with patch('solver_pool.run_twophase_search_timed', side_effect=RuntimeError("Error: 非法状态")):
+            with pytest.raises(RuntimeError) as exc_info:
+                asyncio.run(pool.solve("X" * 54))
+        assert "非法状态" in str(exc_info.value)
+
+    def test_rejects_when_queue_full(self, pool):
+        """测试排队任务达到上限时拒绝新任务"""
+        release = threading.Event()
+        futures = [pool.submit(release.wait) for _ in range(2)]
+
+        with pytest.raises(SolverBusyError):
+            pool.submit(release.wait)
+
+        release.set()
+        for f in futures:
+            f.result(timeout=1)
+        wait_idle(pool)
+
+        assert pool.stats()["rejected"] == 1
+        assert pool.stats()["pending"] == 0
+        pool.submit(lambda: None).result(timeout=1)
+
+    def test_job_timeout(self):
+        """测试超过 job_timeout 时抛出 SolverTimeoutError"""
+        release = threading.Event()
+        p = SolverPool(size=0, job_timeout=0.05, queue_depth=2)
+        try:
+            with pytest.raises(SolverTimeoutError):
+                asyncio.run(p.run(release.wait))
+            assert p.stats()["timeouts"] == 1
+        finally:
+            release.set()
+            p.shutdown()
+
+    def test_warm_up_runs_one_search_per_worker(self, pool):
+        """测试预热在工作进程中完成一次求解，且不占用排队名额、不计入统计"""
+        with patch('solver_pool.run_twophase_search', return_value="(0f)") as mock_search:
+            elapsed = pool.warm_up()
+
+        assert elapsed >= 0
+        assert mock_search.call_count == 1
+        stats = pool.stats()
+        assert stats["started"] is True
+        assert stats["completed"] == 0
+
+    def test_stats_counts_completed_jobs(self, pool):
+        """测试统计信息记录已完成任务"""
+        assert pool.stats()["started"] is False
+
+        with patch('solver_pool.run_twophase_search_timed', return_value=("(0f)", 0.0)):
+            asyncio.run(pool.solve("X" * 54))
+        wait_idle(pool)
+
+        stats = pool.stats()
+        assert stats["started"] is True
+        assert stats["completed"] == 1
+        assert stats["pending"] == 0
+
+
+def _report_twice(value, progress):
+    """测试用任务：汇报两次进度后返回"""
+    progress.put({"step": 1})
+    progress.put({"step": 2})
+    return value * 2
+
+
+class TestRunWithProgress:
+    """run_with_progress 进度推送测试类"""
+
+    def test_yields_progress_then_result(self, pool):
+        """测试按顺序产出全部进度项，最后产出返回值"""
+        async def collect():
+            return [item async for item in pool.run_with_progress(_report_twice, 21)]
+
+        items = asyncio.run(collect())
+        assert items == [("progress", {"step": 1}), ("progress", {"step": 2}), ("result", 42)]
+
+    def test_error_raised_after_progress(self, pool):
+        """测试任务异常在进度之后抛出"""
+        def fail(progress):
+            progress.put({"step": 1})
+            raise RuntimeError("Error: 非法状态")
+
+        async def collect():
+            return [item async for item in pool.run_with_progress(fail)]
+
+        with pytest.raises(RuntimeError):
+            asyncio.run(collect())
+
+    def test_timeout_while_waiting_for_progress(self):
+        """测试任务一直没有结束时，等待进度超过 job_timeout 抛出 SolverTimeoutError"""
+        release = threading.Event()
+        p = SolverPool(size=0, job_timeout=0.05, queue_depth=2)
+
+        def hang(progress):
+            progress.put({"step": 1})
+            release.wait()
+
+        async def collect():
+            items = []
+            with pytest.raises(SolverTimeoutError):
+                async for item in p.run_with_progress(hang):
+                    items.append(item)
+            return items
+
+        try:
+            assert asyncio.run(collect()) == [("progress", {"step": 1})]
+            assert p.stats()["timeouts"] == 1
+        finally:
+            release.set()
+            p.shutdown()
+
+
+class TestResolveSearchParams:
+    """请求参数收紧测试类"""
+
+    def test_overrides_clamped_to_profile(self):
+        """测试时间预算不超过档位、目标步数不小于档位，未给出时使用档位参数"""
+        short = SOLVER_PROFILES["short"]
+
+        assert resolve_search_params("short") == ("short", short["max_length"], short["timeout"])
+        assert resolve_search_params("short", max_length=10, timeout=3600) == \
+            ("short", short["max_length"], short["timeout"])
+        assert resolve_search_params("short", max_length="30", timeout="0.5") == ("short", 30, 0.5)
+
+    def test_invalid_values_rejected(self):
+        """测试非数字或非正数的参数抛出 ValueError"""
+        for kwargs in ({"timeout": "abc"}, {"max_length": [1]}, {"timeout": 0}, {"max_length": -1},
+                       {"timeout": float("nan")}):
+            with pytest.raises(ValueError):
+                resolve_search_params("fast", **kwargs)
@@ -0,0 +1,136 @@
+"""
+twophase_tables 表加载器测试
+
+验证内存映射占位对象与原始 array.fromfile 读出的数据一致，
+以及在完整的表目录上通过 load_twophase 导入后模块里不再残留占位对象。
+"""
+
+import array
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from twophase_tables import TABLES_DIR, _MappedTable, _mapped_array
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# twophase 导入时读取的全部表文件；缺少任何一个时 twophase 会现场生成（耗时很长）
+TABLE_FILES = (
+    "conj_twist", "conj_ud_edges", "fs_classidx", "fs_sym", "fs_rep", "co_classidx", "co_sym", "co_rep",
+    "move_twist", "move_flip", "move_slice_sorted", "move_u_edges", "move_d_edges", "move_ud_edges",
+    "move_corners", "phase1_prun", "phase2_prun", "phase2_cornsliceprun", "phase2_edgemerge",
+)
+
+# 各模块中由表文件加载的属性
+TABLE_ATTRS = {
+    "twophase.symmetries": ("twist_conj", "ud_edges_conj", "flipslice_classidx", "flipslice_sym",
+                            "flipslice_rep", "corner_classidx", "corner_sym", "corner_rep"),
+    "twophase.moves": ("twist_move", "flip_move", "slice_sorted_move", "u_edges_move", "d_edges_move",
+                       "ud_edges_move", "corners_move"),
+    "twophase.pruning": ("flipslice_twist_depth3", "corners_ud_edges_depth3", "cornslice_depth"),
+    "twophase.coord": ("u_edges_plus_d_edges_to_ud_edges",),
+}
+
+# 在子进程中导入（twophase 的导入是进程级的，其他测试会在 sys.modules 中放入桩模块）
+_INSPECT_SCRIPT = """
+import array, json, sys
+from twophase_tables import _TABLE_MODULES, load_twophase
+load_twophase(sys.argv[1], use_mmap=True)
+print(json.dumps({
+    name: {"types": {attr: type(value).__name__ for attr, value in vars(sys.modules[name]).items()},
+           "ar": sys.modules[name].ar is array}
+    for name in _TABLE_MODULES
+}))
+"""
+
+
+@pytest.fixture
+def table_file(tmp_path):
+    """写入一张 'H' 类型的测试表"""
+    data = array.array('H', range(1000))
+    path = tmp_path / "move_test"
+    with open(path, "wb") as fh:
+        data.tofile(fh)
+    return path, data
+
+
+class TestMappedTable:
+    """_MappedTable 测试类"""
+
+    def test_matches_fromfile(self, table_file):
+        """测试映射结果与 array.fromfile 逐项一致"""
+        path, data = table_file
+        table = _MappedTable('H')
+        with open(path, "rb") as fh:
+            table.fromfile(fh, len(data))
+
+        assert len(table) == len(data)
+        assert list(table.view) == list(data)
+        assert table[123] == 123
+
+    def test_view_is_read_only(self, table_file):
+        """测试映射视图只读"""
+        path, data = table_file
+        table = _MappedTable('H')
+        with open(path, "rb") as fh:
+            table.fromfile(fh, len(data))
+
+        assert table.view.readonly
+        with pytest.raises(TypeError):
+            table.view[0] = 1
+
+    def test_reads_prefix_only(self, table_file):
+        """测试只映射请求的条目数"""
+        path, _ = table_file
+        table = _MappedTable('H')
+        with open(path, "rb") as fh:
+            table.fromfile(fh, 10)
+        assert len(table) == 10
+
+    def test_short_file_raises(self, table_file):
+        """测试文件长度不足时与 fromfile 一样抛出 EOFError"""
+        path, data = table_file
+        table = _MappedTable('H')
+        with open(path, "rb") as fh:
+            with pytest.raises(EOFError):
+                table.fromfile(fh, len(data) + 1)
+
+    def test_itemsize_matches_array(self):
+        """测试 itemsize 与 array 一致（twophase 用它判断 uint32 类型码）"""
+        assert _MappedTable('I').itemsize == array.array('I').itemsize
+
+
+class TestMappedArrayFactory:
+    """_mapped_array 工厂函数测试"""
+
+    def test_with_initializer_returns_real_array(self):
+        """测试带初始值时返回真正的 array（twophase 生成新表时使用）"""
+        result = _mapped_array('b', [0, 1, 2])
+        assert isinstance(result, array.array)
+        assert list(result) == [0, 1, 2]
+
+    def test_without_initializer_returns_placeholder(self):
+        """测试不带初始值时返回映射占位对象"""
+        assert isinstance(_mapped_array('H'), _MappedTable)
+
+
+@pytest.mark.skipif(not all(os.path.exists(os.path.join(TABLES_DIR, name)) for name in TABLE_FILES),
+                    reason="twophase 表不完整")
+class TestLoadTwophase:
+    """load_twophase 在真实表上的导入测试"""
+
+    def test_tables_mapped_and_array_restored(self):
+        """测试导入后每张表都是 memoryview，没有残留的占位对象，模块的 ar 恢复为真正的 array"""
+        output = subprocess.run([sys.executable, "-c", _INSPECT_SCRIPT, TABLES_DIR], cwd=BACKEND_DIR,
+                                capture_output=True, text=True, check=True, timeout=300).stdout
+        modules = json.loads(output.strip().splitlines()[-1])
+
+        for name, attrs in TABLE_ATTRS.items():
+            types = modules[name]["types"]
+            assert "_MappedTable" not in types.values(), name
+            assert modules[name]["ar"], name
+            for attr in attrs:
+                assert types[attr] == "memoryview", f"{name}.{attr}"
@@ -0,0 +1,99 @@
+"""
+upload_stream 二进制上传流式解析测试
+
+手工构造 multipart 请求体并按小块送入解析器，验证各面解码、文本字段、
+未知字段丢弃、字节上限与格式错误。
+"""
+
+import asyncio
+
+import cv2
+import numpy as np
+import pytest
+
+from upload_stream import read_face_uploads, UploadTooLargeError, UploadFormatError
+
+BOUNDARY = "cubeboundary"
+CONTENT_TYPE = f"multipart/form-data; boundary={BOUNDARY}"
+
+
+def jpeg_bytes(color, size=(40, 60)):
+    img = np.full((size[0], size[1], 3), color, np.uint8)
+    return cv2.imencode(".jpg", img)[1].tobytes()
+
+
+def multipart_body(parts):
+    """parts: [(name, bytes, filename 或 None)]"""
+    body = b""
+    for name, data, filename in parts:
+        disposition = f'form-data; name="{name}"'
+        if filename:
+            disposition += f'; filename="{filename}"'
+        body += f"--{BOUNDARY}\r\nContent-Disposition: {disposition}\r\n\r\n".encode() + data + b"\r\n"
+    return body + f"--{BOUNDARY}--\r\n".encode()
+
+
+async def chunked(body, size=1000):
+    for start in range(0, len(body), size):
+        yield body[start:start + size]
+
+
+def read(body, chunk_size=1000, **kwargs):
+    return asyncio.run(read_face_uploads(CONTENT_TYPE, chunked(body, chunk_size), **kwargs))
+
+
+class TestReadFaceUploads:
+    """流式解析测试类"""
+
+    def test_faces_decoded_from_chunked_stream(self):
+        """测试按小块接收的请求体中各面图片被解码，session_id 作为文本字段返回"""
+        body = multipart_body([
+            ("U", jpeg_bytes(255), "u.jpg"),
+            ("session_id", b"abc-123", None),
+            ("F", jpeg_bytes(0), "f.jpg"),
+        ])
+
+        images, fields = read(body, chunk_size=97)
+
+        assert set(images) == {"U", "F"}
+        assert images["U"].shape == (40, 60, 3)
+        assert images["U"].mean() > 240 and images["F"].mean() < 15
+        assert fields == {"session_id": "abc-123"}
+
+    def test_unknown_fields_and_bad_images_dropped(self):
+        """测试未知字段被丢弃，无法解码的面不出现在结果中"""
+        body = multipart_body([
+            ("X", jpeg_bytes(128), "x.jpg"),
+            ("R", b"not an image", "r.jpg"),
+            ("L", jpeg_bytes(128), "l.jpg"),
+        ])
+
+        images, fields = read(body)
+
+        assert set(images) == {"L"}
+        assert fields == {}
+
+    def test_stream_over_limit_rejected(self):
+        """测试累计接收字节数超过上限时中止"""
+        body = multipart_body([("U", jpeg_bytes(255, (200, 200)), "u.jpg")])
+
+        with pytest.raises(UploadTooLargeError):
+            read(body, max_bytes=len(body) - 1)
+
+    def test_declared_length_over_limit_rejected_without_reading(self):
+        """测试 Content-Length 超过上限时不读取请求体"""
+        async def never():
+            raise AssertionError("请求体不应被读取")
+            yield b""
+
+        with pytest.raises(UploadTooLargeError):
+            asyncio.run(read_face_uploads(CONTENT_TYPE, never(), content_length=100, max_bytes=10))
+
+    def test_invalid_requests_rejected(self):
+        """测试非 multipart 请求、缺少 boundary、过长的文本字段"""
+        with pytest.raises(UploadFormatError):
+            asyncio.run(read_face_uploads("application/json", chunked(b"{}")))
+        with pytest.raises(UploadFormatError):
+            asyncio.run(read_face_uploads("multipart/form-data", chunked(b"")))
+        with pytest.raises(UploadFormatError):
+            read(multipart_body([("session_id", b"x" * 5000, None)]))
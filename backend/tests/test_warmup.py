@@ -0,0 +1,105 @@
+"""
+warmup 启动预热与就绪状态测试
+
+替换检测器与求解进程池，验证状态流转、失败记录、关闭预热与后台线程。
+"""
+
+from unittest.mock import MagicMock, patch
+
+from warmup import Readiness, run_warmup, start_background_warmup
+
+
+def fake_detector():
+    detector = MagicMock()
+    detector.warm_up.return_value = {320: [12.0, 15.5], 640: [40.25]}
+    return detector
+
+
+class TestReadiness:
+    """就绪状态测试类"""
+
+    def test_initially_not_ready(self):
+        """测试初始状态为 pending，未就绪"""
+        snapshot = Readiness().snapshot()
+
+        assert snapshot["ready"] is False
+        assert snapshot["components"]["detector"]["state"] == "pending"
+        assert snapshot["components"]["solver"]["loaded"] is False
+
+    def test_ready_and_skipped_count_as_ready(self):
+        """测试 ready 与 skipped 都算就绪"""
+        readiness = Readiness()
+        readiness.update("detector", state="ready")
+        assert readiness.is_ready() is False
+
+        readiness.update("solver", state="skipped")
+        assert readiness.is_ready() is True
+        assert readiness.snapshot()["ready"] is True
+
+
+class TestRunWarmup:
+    """预热流程测试类"""
+
+    def test_detector_and_solver_warmed(self):
+        """测试依次预热检测模型与求解进程池，记录每个推理尺寸最慢副本的耗时"""
+        readiness = Readiness()
+        detector = fake_detector()
+        with patch("cube_service.get_detector", return_value=detector), \
+                patch("solver_pool.get_solver_pool") as mock_pool:
+            mock_pool.return_value.warm_up.return_value = 1.23456
+            run_warmup(readiness, solver=True)
+
+        snapshot = readiness.snapshot()
+        assert snapshot["ready"] is True
+        assert snapshot["components"]["detector"]["warmup_ms"] == {"320": 15.5, "640": 40.25}
+        assert snapshot["components"]["solver"]["load_s"] == 1.235
+        assert snapshot["components"]["solver"]["loaded"] is True
+
+    def test_detector_failure_is_recorded(self):
+        """测试模型加载失败时记录错误，服务不就绪，求解进程池照常预热"""
+        readiness = Readiness()
+        with patch("cube_service.get_detector", side_effect=FileNotFoundError("缺少 best.pt")), \
+                patch("solver_pool.get_solver_pool") as mock_pool:
+            mock_pool.return_value.warm_up.return_value = 0.5
+            run_warmup(readiness, solver=True)
+
+        detector = readiness.get("detector")
+        assert detector["state"] == "failed"
+        assert "best.pt" in detector["error"]
+        assert readiness.get("solver")["state"] == "ready"
+        assert readiness.is_ready() is False
+
+    def test_solver_warmup_can_be_skipped(self):
+        """测试关闭求解进程池预热时标记为 skipped"""
+        readiness = Readiness()
+        with patch("cube_service.get_detector", return_value=fake_detector()), \
+                patch("solver_pool.get_solver_pool") as mock_pool:
+            run_warmup(readiness, solver=False)
+
+        mock_pool.assert_not_called()
+        assert readiness.get("solver")["state"] == "skipped"
+        assert readiness.is_ready() is True
+
+
+class TestBackgroundWarmup:
+    """后台预热测试类"""
+
+    def test_disabled_marks_components_skipped(self):
+        """测试关闭预热时不启动线程，各组件按需加载"""
+        readiness = Readiness()
+        with patch("warmup.get_readiness", return_value=readiness):
+            thread = start_background_warmup(enabled=False)
+
+        assert thread is None
+        assert readiness.is_ready() is True
+
+    def test_runs_in_background_thread(self):
+        """测试预热在后台线程中执行，不阻塞调用方"""
+        readiness = Readiness()
+        with patch("warmup.get_readiness", return_value=readiness), \
+                patch("warmup.run_warmup") as mock_run:
+            thread = start_background_warmup(enabled=True)
+            thread.join(1)
+
+        assert thread.daemon is True
+        mock_run.assert_called_once_with(readiness)
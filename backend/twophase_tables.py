@@ -0,0 +1,122 @@
+"""
+twophase 表加载器
+
+twophase 在导入时用 array.fromfile 把 backend/twophase/ 下的移动表和剪枝表
+整份读入进程私有内存。每个 uvicorn worker 和求解进程都各自持有一份拷贝，
+启动时也要逐个读取、解析这些文件。
+
+本模块改为以只读内存映射的方式加载这些表:
+  - 导入 twophase 期间临时替换其使用的 array 模块，fromfile 不再拷贝数据，
+    而是对文件做 mmap(ACCESS_READ)，得到按原类型码解释的 memoryview
+  - 导入完成后把模块里的占位对象替换为 memoryview，求解热路径仍是 C 级下标访问
+  - 同一主机上的所有进程共享一份页缓存，新进程启动几乎不读盘
+
+配置（环境变量）:
+  CUBE_TWOPHASE_MMAP  1 使用内存映射（默认），0 使用 twophase 原始加载方式
+"""
+
+import array
+import mmap
+import os
+import sys
+import threading
+import types
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# ================= 配置区 =================
+
+TABLES_DIR = os.path.join(BASE_DIR, "twophase")
+USE_MMAP = os.environ.get("CUBE_TWOPHASE_MMAP", "1") != "0"
+
+# 导入时会加载表的 twophase 子模块
+_TABLE_MODULES = ("twophase.symmetries", "twophase.moves", "twophase.pruning", "twophase.coord")
+
+_load_lock = threading.Lock()
+
+
+class _MappedTable:
+    """twophase 导入期间 array.array(typecode) 的替身。
+
+    fromfile 时对文件做只读 mmap，而不是把内容拷贝进进程内存。
+    导入结束后会被替换为其底层的 memoryview。
+    """
+
+    def __init__(self, typecode):
+        self.typecode = typecode
+        self.itemsize = array.array(typecode).itemsize
+        self.view = None
+
+    def fromfile(self, fh, n):
+        nbytes = n * self.itemsize
+        mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(mm) < nbytes:
+            size = len(mm)
+            mm.close()
+            raise EOFError(f"{fh.name}: 需要 {nbytes} 字节，文件只有 {size} 字节")
+        self.view = memoryview(mm)[:nbytes].cast(self.typecode)
+
+    def __getitem__(self, index):
+        return self.view[index]
+
+    def __len__(self):
+        return len(self.view)
+
+
+def _mapped_array(typecode, *args):
+    """带初始值时返回真正的 array（twophase 自己生成的表），否则返回可映射的占位对象。"""
+    if args:
+        return array.array(typecode, *args)
+    return _MappedTable(typecode)
+
+
+def _make_array_shim():
+    shim = types.ModuleType("array")
+    shim.__dict__.update({k: v for k, v in vars(array).items() if not k.startswith("__")})
+    shim.array = _mapped_array
+    return shim
+
+
+def _import_mapped():
+    real_array = sys.modules.get("array", array)
+    shim = _make_array_shim()
+    sys.modules["array"] = shim
+    try:
+        import twophase.solver  # noqa: F401
+    finally:
+        sys.modules["array"] = real_array
+
+    for name in _TABLE_MODULES:
+        module = sys.modules[name]
+        for attr, value in list(vars(module).items()):
+            if isinstance(value, _MappedTable):
+                table = value.view if value.view is not None else array.array(value.typecode)
+                setattr(module, attr, table)
+            elif value is shim:
+                # 模块里的 `import array as ar` 仍指向替身，恢复为真正的 array 模块
+                setattr(module, attr, real_array)
+
+
+def load_twophase(tables_dir: str = TABLES_DIR, use_mmap: bool = USE_MMAP):
+    """导入 twophase 求解器并加载全部表（每个进程只执行一次）。
+
+    Args:
+        tables_dir: 表文件目录，缺失的表会由 twophase 在此生成
+        use_mmap: 是否以内存映射方式加载
+
+    Returns:
+        module: twophase.solver 模块
+    """
+    with _load_lock:
+        if "twophase.solver" in sys.modules:
+            return sys.modules["twophase.solver"]
+
+        import twophase.defs as defs
+        defs.FOLDER = tables_dir
+
+        if use_mmap:
+            _import_mapped()
+        else:
+            import twophase.solver  # noqa: F401
+
+        return sys.modules["twophase.solver"]
@@ -0,0 +1,161 @@
+"""
+识别接口的二进制图片上传（multipart/form-data 流式解析）
+
+/api/recognize 的请求体是 JSON 里的 base64 字符串：Starlette 先读完整个请求体，
+json.loads 生成字符串，再逐面 b64decode，同一份图片数据在内存中同时存在 3 份以上，
+且体积比原图大 1/3。/api/recognize/upload 改为 multipart/form-data，每个面一个二进制部分:
+  - 字段名为面标识 U / R / F / D / L / B，值为原始图片字节（JPEG / PNG / WebP）
+  - 可选文本字段 session_id
+  - 请求体边接收边解析，每个面的数据只写入一个 bytearray；
+    某个面接收完成后立即在线程池中解码（与后续面的接收重叠），解码后释放原始字节
+  - 累计接收字节数超过上限时立即中止（413），不会先把整个请求体读进内存
+
+配置（环境变量）:
+  CUBE_MAX_UPLOAD_BYTES  单次上传请求的字节上限，默认 40MB（六张手机照片）
+"""
+
+import asyncio
+import os
+
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+from image_utils import FACE_TO_FILENAME, decode_image_bytes
+
+# ================= 配置区 =================
+
+MAX_UPLOAD_BYTES = int(os.environ.get("CUBE_MAX_UPLOAD_BYTES", 40 * 2 ** 20))
+
+# 文本字段（session_id）的长度上限
+MAX_FIELD_BYTES = 1024
+
+TEXT_FIELDS = ("session_id",)
+
+
+class UploadTooLargeError(ValueError):
+    """请求体超过 MAX_UPLOAD_BYTES"""
+
+
+class UploadFormatError(ValueError):
+    """请求不是合法的 multipart/form-data"""
+
+
+class _FacePartsParser:
+    """python-multipart 回调：按字段名把各部分写入各自的缓冲区，未知字段直接丢弃"""
+
+    def __init__(self, boundary: bytes):
+        self.completed = []  # [(name, bytearray)]，已接收完整的部分，等待调用方取走
+        self._name = None
+        self._buffer = None
+        self._header_field = b""
+        self._header_value = b""
+        self._disposition = b""
+        self.parser = MultipartParser(boundary, callbacks={
+            "on_part_begin": self.on_part_begin,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+        })
+
+    def on_part_begin(self):
+        self._name, self._buffer, self._disposition = None, None, b""
+
+    def on_header_field(self, data, start, end):
+        self._header_field += data[start:end]
+
+    def on_header_value(self, data, start, end):
+        self._header_value += data[start:end]
+
+    def on_header_end(self):
+        if self._header_field.lower() == b"content-disposition":
+            self._disposition = self._header_value
+        self._header_field, self._header_value = b"", b""
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self._disposition)
+        name = options.get(b"name", b"").decode("latin-1")
+        if name in FACE_TO_FILENAME or name in TEXT_FIELDS:
+            self._name, self._buffer = name, bytearray()
+
+    def on_part_data(self, data, start, end):
+        if self._buffer is None:
+            return
+        if self._name in TEXT_FIELDS and len(self._buffer) + end - start > MAX_FIELD_BYTES:
+            raise UploadFormatError(f"字段 {self._name} 过长")
+        self._buffer += data[start:end]
+
+    def on_part_end(self):
+        if self._buffer is not None:
+            self.completed.append((self._name, self._buffer))
+        self._name, self._buffer = None, None
+
+
+def multipart_boundary(content_type: str) -> bytes:
+    """从 Content-Type 中取出 multipart 边界，不是 multipart/form-data 时抛出 UploadFormatError"""
+    media_type, options = parse_options_header(content_type or "")
+    if media_type != b"multipart/form-data" or not options.get(b"boundary"):
+        raise UploadFormatError("请求必须是带 boundary 的 multipart/form-data")
+    return options[b"boundary"]
+
+
+async def read_face_uploads(content_type: str, stream, content_length: int = None,
+                            max_bytes: int = None) -> tuple:
+    """
+    流式解析上传请求，各面接收完成后立即在线程池中解码
+
+    Args:
+        content_type: 请求的 Content-Type
+        stream: 请求体的异步字节块迭代器（Request.stream()）
+        content_length: 请求头声明的长度，超过上限时不读取请求体直接拒绝
+        max_bytes: 累计接收字节数上限，默认 MAX_UPLOAD_BYTES
+
+    Returns:
+        tuple: (images, fields)，images 为 { 'U': ndarray, ... }（只包含解码成功的面），
+               fields 为文本字段 { 'session_id': str }；同一个面上传多次时以最后一次为准
+
+    Raises:
+        UploadTooLargeError: 请求体超过 max_bytes
+        UploadFormatError: Content-Type 或 multipart 结构不合法
+    """
+    max_bytes = MAX_UPLOAD_BYTES if max_bytes is None else max_bytes
+    if content_length is not None and content_length > max_bytes:
+        raise UploadTooLargeError(f"请求体过大: {content_length} > {max_bytes} 字节")
+
+    parts = _FacePartsParser(multipart_boundary(content_type))
+    decoding, fields = {}, {}
+    received = 0
+
+    def drain():
+        for name, data in parts.completed:
+            if name in TEXT_FIELDS:
+                fields[name] = data.decode("utf-8", errors="replace")
+            else:
+                decoding[name] = asyncio.create_task(asyncio.to_thread(decode_image_bytes, data))
+        parts.completed.clear()
+
+    try:
+        async for chunk in stream:
+            received += len(chunk)
+            if received > max_bytes:
+                raise UploadTooLargeError(f"请求体超过 {max_bytes} 字节")
+            parts.parser.write(chunk)
+            drain()
+        parts.parser.finalize()
+        drain()
+    except MultipartParseError as e:
+        raise UploadFormatError(f"multipart 解析失败: {e}") from e
+    finally:
+        # 出错时也等待已提交的解码结束，不留下后台任务
+        await asyncio.gather(*decoding.values(), return_exceptions=True)
+
+    images = {}
+    for face_key, task in decoding.items():
+        img = task.result()
+        if img is None:
+            print(f"  ❌ 图像解码失败: {face_key}")
+            continue
+        images[face_key] = img
+    return images, fields
@@ -0,0 +1,132 @@
+"""
+启动预热与就绪状态
+
+检测模型和 twophase 表原先都在第一个用到它们的请求中同步加载（数秒），
+健康检查也会触发模型加载。服务启动后改为在后台线程中依次:
+  1. detector: 加载检测模型（cube_service.get_detector），每个模型副本用灰色图片推理一次
+  2. solver:   启动求解进程池的全部工作进程，各完成一次求解（加载 twophase 表）
+
+各组件的状态只在本模块中记录，探针读取缓存的状态，不会触发任何加载:
+  pending -> loading -> warming -> ready / failed；关闭预热的组件为 skipped（按需加载）
+  - GET /api/health/live   进程存活即返回 200
+  - GET /api/health/ready  全部组件为 ready / skipped 时返回 200，否则 503；附带加载与预热耗时
+
+配置（环境变量）:
+  CUBE_WARMUP         启动时是否在后台预热，默认 1
+  CUBE_WARMUP_SOLVER  是否预热求解进程池，默认 1
+"""
+
+import os
+import threading
+import time
+
+# ================= 配置区 =================
+
+WARMUP_ENABLED = os.environ.get("CUBE_WARMUP", "1") == "1"
+WARMUP_SOLVER = os.environ.get("CUBE_WARMUP_SOLVER", "1") == "1"
+
+COMPONENTS = ("detector", "solver")
+READY_STATES = ("ready", "skipped")
+
+_readiness = None
+_readiness_lock = threading.Lock()
+
+
+class Readiness:
+    """各组件的加载 / 预热状态（线程安全）"""
+
+    def __init__(self, components=COMPONENTS):
+        self.started_at = time.time()
+        self._components = {name: {"state": "pending", "loaded": False, "load_s": None,
+                                   "warmup_ms": None, "error": None} for name in components}
+        self._lock = threading.Lock()
+
+    def update(self, name: str, **fields):
+        with self._lock:
+            self._components[name].update(fields)
+
+    def get(self, name: str) -> dict:
+        with self._lock:
+            return dict(self._components[name])
+
+    def is_ready(self) -> bool:
+        with self._lock:
+            return all(c["state"] in READY_STATES for c in self._components.values())
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            components = {name: dict(c) for name, c in self._components.items()}
+        return {
+            "ready": all(c["state"] in READY_STATES for c in components.values()),
+            "uptime_s": round(time.time() - self.started_at, 3),
+            "components": components,
+        }
+
+
+def get_readiness() -> Readiness:
+    """获取全局就绪状态（延迟初始化）"""
+    global _readiness
+    with _readiness_lock:
+        if _readiness is None:
+            _readiness = Readiness()
+        return _readiness
+
+
+def warm_detector(readiness: Readiness):
+    """加载检测模型并让每个副本推理一次；模型的加载耗时由 get_detector 记录"""
+    from cube_service import get_detector
+
+    readiness.update("detector", state="loading")
+    try:
+        detector = get_detector()
+        readiness.update("detector", state="warming")
+        latencies = detector.warm_up()
+    except Exception as e:
+        readiness.update("detector", state="failed", error=f"{type(e).__name__}: {e}")
+        print(f"⚠️ 检测模型预热失败: {e}")
+        return
+    warmup_ms = {str(size): round(max(values), 3) for size, values in latencies.items()}
+    readiness.update("detector", state="ready", warmup_ms=warmup_ms, error=None)
+    print(f"🔥 检测模型预热完成: {warmup_ms} ms")
+
+
+def warm_solver(readiness: Readiness):
+    """启动求解进程池的全部工作进程，各完成一次求解"""
+    from solver_pool import get_solver_pool
+
+    readiness.update("solver", state="loading")
+    try:
+        elapsed = get_solver_pool().warm_up()
+    except Exception as e:
+        readiness.update("solver", state="failed", error=f"{type(e).__name__}: {e}")
+        print(f"⚠️ 求解进程池预热失败: {e}")
+        return
+    readiness.update("solver", state="ready", loaded=True, load_s=round(elapsed, 3), error=None)
+    print(f"🔥 求解进程池预热完成: {elapsed:.2f}s")
+
+
+def run_warmup(readiness: Readiness = None, solver: bool = WARMUP_SOLVER):
+    """依次预热检测模型与求解进程池（阻塞）"""
+    readiness = readiness or get_readiness()
+    warm_detector(readiness)
+    if solver:
+        warm_solver(readiness)
+    else:
+        readiness.update("solver", state="skipped")
+
+
+def start_background_warmup(enabled: bool = WARMUP_ENABLED):
+    """服务启动时调用：在后台线程中预热，不阻塞启动；关闭预热时各组件标记为 skipped
+
+    Returns:
+        threading.Thread | None: 预热线程
+    """
+    readiness = get_readiness()
+    if not enabled:
+        for name in COMPONENTS:
+            readiness.update(name, state="skipped")
+        return None
+
+    thread = threading.Thread(target=run_warmup, args=(readiness,), name="warmup", daemon=True)
+    thread.start()
+    return thread